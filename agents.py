@@ -2,10 +2,10 @@ try:
     from crewai import Agent
     from textwrap import dedent
     from langchain.llms.base import LLM
-    from langchain_community.tools import DuckDuckGoSearchRun
     from decouple import config
     import json
-    import google.generativeai as genai
+    from gemini_client import default_api_key, GeminiError
+    from model_router import model_router
     from typing import Any, List, Optional, Dict, Mapping
     from pydantic import Field, BaseModel
     import os
@@ -24,13 +24,19 @@ except ImportError as e:
 
 # Forcer l'utilisation de l'API directe et non Vertex AI
 os.environ["GOOGLE_AUTH_NO_IMPLICIT"] = "true"
-API_KEY = config("GOOGLE_API_KEY")
-genai.configure(api_key=API_KEY)
+# Gemini est configuré au premier appel au modèle, pas à l'importation
+API_KEY = default_api_key()
+
+# Modèles de repli des agents lorsque le modèle principal est saturé ou trop lent
+AGENT_FALLBACK_MODELS = [name.strip() for name in
+                         config("AGENT_FALLBACK_MODELS", default="gemini-pro,gemini-1.5-flash").split(",")
+                         if name.strip()]
 
 # Définition d'une classe LLM personnalisée pour Gemini qui n'utilise pas LiteLLM
 class GeminiLLM(LLM, BaseModel):
     model_name: str = Field("gemini-2.0-pro-exp-02-05")  # Utiliser gemini-2.0-pro-exp-02-05 qui est plus stable
     temperature: float = Field(0.7)
+    fallback_models: List[str] = Field(default_factory=lambda: list(AGENT_FALLBACK_MODELS))
     api_key: Optional[str] = None
     
     class Config:
@@ -43,24 +49,20 @@ class GeminiLLM(LLM, BaseModel):
         
     def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs) -> str:
         try:
-            # Créer directement un modèle Gemini
-            model = genai.GenerativeModel(self.model_name)
-            
-            # Générer du contenu avec la configuration spécifiée
-            response = model.generate_content(
+            # Réutiliser le modèle Gemini partagé pour cette configuration; le routeur
+            # bascule sur les modèles de repli si le modèle principal est saturé ou trop lent
+            models = [self.model_name] + [name for name in self.fallback_models if name != self.model_name]
+            return model_router.generate(
+                "agent",
                 prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=self.temperature
-                )
+                {"temperature": self.temperature},
+                models=models
             )
-            
-            # Retourner le texte généré
-            return response.text
-        except Exception as e:
-            # Afficher une erreur détaillée pour faciliter le débogage
+        except GeminiError as e:
+            # Afficher une erreur détaillée pour faciliter le débogage, puis la propager:
+            # un message d'erreur renvoyé comme texte serait traité comme une réponse par l'agent
             print(f"Error with Gemini API: {str(e)}")
-            # Retourner un message d'erreur au lieu de lever une exception
-            return f"Une erreur s'est produite lors de la génération de texte: {str(e)}"
+            raise
     
     @property
     def _llm_type(self) -> str:
@@ -89,7 +91,8 @@ class CustomAgents:
             temperature=0.9
         )
         
-        # Initialiser le tool de recherche web
+        # Initialiser le tool de recherche web (importé ici: son chargement est coûteux)
+        from langchain_community.tools import DuckDuckGoSearchRun
         self.search_tool = DuckDuckGoSearchRun()
 
     def agent_scraping_parcoursup(self):
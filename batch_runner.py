@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Génération de lettres de motivation en lot, sans interaction.
+
+Chaque travail décrit un étudiant (réponses d'entretien ou profil déjà rédigé)
+et les deux URLs du programme visé. Le pipeline habituel (récupération,
+enrichissement, brouillons, fusion) est exécuté pour tous les travaux avec
+une concurrence bornée:
+- un même programme n'est récupéré et enrichi qu'une seule fois pour tout le lot
+- chaque étape terminée est enregistrée: un lot interrompu reprend là où il
+  s'était arrêté, sans refaire les appels au modèle
+- les résultats et les durées de chaque étape sont écrits au fil de l'eau
+
+Formats d'entrée:
+- JSONL: un objet par ligne avec 'parcoursup_url', 'etablissement_url' et
+  'interview_responses' (liste de {question, answer}), 'answers' (liste de
+  réponses dans l'ordre des questions de l'entretien) ou 'student_info'.
+  Champs facultatifs: 'job_id', 'personal_info'.
+- CSV: colonnes 'parcoursup_url', 'etablissement_url', 'answer_1' à 'answer_8'
+  (ou 'student_info'), et facultativement 'job_id', 'name', 'email', 'phone', 'address'.
+
+Usage:
+    python batch_runner.py travaux.jsonl --output resultats.jsonl --concurrency 4
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    from decouple import config
+    from checkpoints import StageCheckpoint, fingerprint
+    from llm_scheduler import scheduling
+    from tools.http_cache import canonical_url
+    from direct_approach import (
+        ACQUISITION_FALLBACKS, INTERVIEW_QUESTIONS, build_student_info, clean_letter_text,
+        extract_institution_name, extract_program_name, fusion_letters, generate_creative_letter,
+        generate_formal_letter, is_usable_info, is_usable_letter, prepare_models,
+        scrape_etablissement, scrape_parcoursup,
+    )
+    from gemini_client import CircuitOpenError
+except ImportError as e:
+    module_name = str(e).split("'")[-2]
+    print(f"\n❌ ERROR: The '{module_name}' module is not installed.")
+    print("Please install all dependencies using one of the following commands:")
+    print("    pip install -r requirements.txt")
+    print("    or")
+    print("    poetry install\n")
+    sys.exit(1)
+
+# Dossier des points de reprise des lots
+BATCH_CHECKPOINT_DIR = "batch_checkpoints"
+
+# Nombre de travaux traités simultanément
+BATCH_CONCURRENCY = config("BATCH_CONCURRENCY", default=4, cast=int)
+
+# Chaînes d'acquisition (récupération et enrichissement) par source
+ACQUIRERS = {
+    "parcoursup": scrape_parcoursup,
+    "etablissement": scrape_etablissement,
+}
+
+PERSONAL_FIELDS = ("name", "email", "phone", "address")
+
+
+class JobError(Exception):
+    """Travail invalide ou étape impossible à terminer"""
+
+
+def _safe_name(job_id: str) -> str:
+    return re.sub(r"[^\w.-]", "_", job_id)
+
+
+def read_jobs(path: str) -> Iterator[Dict[str, Any]]:
+    """Lit les travaux bruts d'un fichier JSONL ou CSV"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            yield from csv.DictReader(f)
+            return
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield {"_error": f"Ligne {line_number} invalide: {e}"}
+
+
+def normalize_job(raw: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """
+    Convertit un travail brut (JSONL ou CSV) en travail prêt à exécuter.
+
+    Returns:
+        dict: {'job_id', 'parcoursup_url', 'etablissement_url', 'personal_info',
+               'interview_responses', 'student_info', 'error'}
+    """
+    job_id = str(raw.get("job_id") or raw.get("id") or f"job_{index:04d}")
+    job = {
+        "job_id": job_id,
+        "parcoursup_url": (raw.get("parcoursup_url") or "").strip(),
+        "etablissement_url": (raw.get("etablissement_url") or "").strip(),
+        "personal_info": raw.get("personal_info") or {
+            field: raw[field].strip() for field in PERSONAL_FIELDS if raw.get(field)
+        },
+        "interview_responses": [],
+        "student_info": (raw.get("student_info") or "").strip(),
+        "error": raw.get("_error"),
+    }
+
+    responses = raw.get("interview_responses")
+    answers = raw.get("answers")
+    if responses:
+        job["interview_responses"] = [{"question": r["question"], "answer": r["answer"]} for r in responses]
+    elif isinstance(answers, dict):
+        job["interview_responses"] = [{"question": q, "answer": a} for q, a in answers.items()]
+    else:
+        if answers is None:
+            answers = [raw.get(f"answer_{i}") for i in range(1, len(INTERVIEW_QUESTIONS) + 1)]
+        job["interview_responses"] = [
+            {"question": question, "answer": answer.strip()}
+            for question, answer in zip(INTERVIEW_QUESTIONS, answers) if answer and answer.strip()
+        ]
+
+    if not job["student_info"] and job["interview_responses"]:
+        job["student_info"] = build_student_info(job["interview_responses"])
+
+    if job["error"] is None:
+        if not job["parcoursup_url"] or not job["etablissement_url"]:
+            job["error"] = "URL Parcoursup ou URL de l'établissement manquante"
+        elif not job["student_info"]:
+            job["error"] = "Profil étudiant manquant (réponses d'entretien ou student_info)"
+    return job
+
+
+class BatchRunner:
+    """
+    Exécute un lot de travaux avec une concurrence bornée.
+    - Les acquisitions sont partagées entre travaux (clé: source + URL canonique)
+    - Chaque travail a ses propres points de reprise (brouillons, fusion)
+    - Les résultats sont écrits dans le fichier de sortie dès qu'un travail se termine
+    """
+
+    def __init__(self, checkpoint_dir: str = BATCH_CHECKPOINT_DIR,
+                 concurrency: Optional[int] = None):
+        """
+        Initialise le lot.
+
+        Args:
+            checkpoint_dir: Dossier des points de reprise
+            concurrency: Nombre de travaux traités simultanément
+        """
+        self.checkpoint_dir = checkpoint_dir
+        self.concurrency = max(1, concurrency or BATCH_CONCURRENCY)
+        self.acquisitions = StageCheckpoint("acquisitions", checkpoint_dir)
+        self._acquisition_locks: Dict[str, threading.Lock] = {}
+        # Résultat de chaque acquisition pendant ce lot, qu'il ait été enregistré ou non
+        self._acquired: Dict[str, str] = {}
+        self._locks_guard = threading.Lock()
+        self._output_lock = threading.Lock()
+
+    def acquire(self, source: str, url: str) -> str:
+        """
+        Récupère et enrichit les informations d'une source, une seule fois par lot.
+        Les travaux qui visent le même programme attendent la première acquisition
+        puis réutilisent son résultat. Un résultat non enrichi n'est pas enregistré:
+        il sert à tout le lot mais sera recalculé au prochain lancement.
+        """
+        key = f"{source}:{canonical_url(url)}"
+        with self._locks_guard:
+            lock = self._acquisition_locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._acquired:
+                self._acquired[key] = self.acquisitions.run(key, ACQUIRERS[source], url, accept=is_usable_info)
+            return self._acquired[key]
+
+    def _stage(self, checkpoint: StageCheckpoint, timings: Dict[str, Any], stage: str,
+               func, *args, inputs: Optional[str] = None, accept=None) -> Any:
+        """Exécute une étape d'un travail (ou la reprend) et note sa durée"""
+        resumed = checkpoint.get(stage, inputs) is not None
+        started = time.monotonic()
+        output = checkpoint.run(stage, func, *args, inputs=inputs, accept=accept)
+        seconds = checkpoint.seconds(stage) if resumed else round(time.monotonic() - started, 3)
+        timings[stage] = {"seconds": seconds, "resumed": resumed}
+        return output
+
+    def run_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Exécute le pipeline complet pour un travail et retourne son résultat"""
+        job_id = job["job_id"]
+        result = {
+            "job_id": job_id,
+            "status": "error",
+            "error": job["error"],
+            "parcoursup_url": job["parcoursup_url"],
+            "etablissement_url": job["etablissement_url"],
+            "personal_info": job["personal_info"],
+            "timings": {},
+        }
+        if job["error"]:
+            print(f"[{job_id}] ❌ Travail ignoré: {job['error']}")
+            return result
+
+        started = time.monotonic()
+        timings = result["timings"]
+        checkpoint = StageCheckpoint(f"job_{_safe_name(job_id)}", self.checkpoint_dir)
+        try:
+            print(f"[{job_id}] Recherche d'informations sur le programme...")
+            acquisition_started = time.monotonic()
+            parcoursup_info = self.acquire("parcoursup", job["parcoursup_url"])
+            etablissement_info = self.acquire("etablissement", job["etablissement_url"])
+            timings["acquisition"] = {"seconds": round(time.monotonic() - acquisition_started, 3)}
+            result["warnings"] = [
+                f"Informations {source} indisponibles" if info in ACQUISITION_FALLBACKS.values()
+                else f"Informations {source} non enrichies (seront reprises au prochain lancement)"
+                for source, info in (("parcoursup", parcoursup_info), ("etablissement", etablissement_info))
+                if not is_usable_info(info)
+            ]
+
+            draft_inputs = fingerprint(parcoursup_info, etablissement_info, job["student_info"])
+            print(f"[{job_id}] Génération des brouillons...")
+            letter1 = self._stage(checkpoint, timings, "formal", generate_formal_letter,
+                                  parcoursup_info, etablissement_info, job["student_info"],
+                                  inputs=draft_inputs, accept=is_usable_letter)
+            if not is_usable_letter(letter1):
+                raise JobError("Lettre formelle vide")
+            letter2 = self._stage(checkpoint, timings, "creative", generate_creative_letter,
+                                  parcoursup_info, etablissement_info, job["student_info"],
+                                  inputs=draft_inputs, accept=is_usable_letter)
+            if not is_usable_letter(letter2):
+                raise JobError("Lettre créative vide")
+
+            print(f"[{job_id}] Fusion des lettres...")
+            final_letter = self._stage(checkpoint, timings, "fusion", fusion_letters, letter1, letter2,
+                                       inputs=fingerprint(letter1, letter2), accept=is_usable_letter)
+            if not is_usable_letter(final_letter):
+                raise JobError("Lettre fusionnée vide")
+
+            cleaned_letter = clean_letter_text(final_letter)
+            result.update({
+                "status": "ok",
+                "error": None,
+                "program": extract_program_name(parcoursup_info),
+                "institution": extract_institution_name(etablissement_info),
+                "letter1": letter1,
+                "letter2": letter2,
+                "final_letter": cleaned_letter,
+                "length": len(cleaned_letter),
+            })
+            print(f"[{job_id}] ✓ Lettre finale: {len(cleaned_letter)} caractères")
+        except CircuitOpenError as e:
+            # API indisponible: les étapes terminées sont conservées, le travail sera repris au prochain lancement
+            result.update({"status": "deferred", "error": str(e)})
+            print(f"[{job_id}] ⏸ Travail reporté: {e}")
+        except Exception as e:
+            result["error"] = str(e)
+            print(f"[{job_id}] ❌ {e}")
+        result["total_seconds"] = round(time.monotonic() - started, 3)
+        return result
+
+    def _write_result(self, output, result: Dict[str, Any]) -> None:
+        with self._output_lock:
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+
+    def run(self, jobs: List[Dict[str, Any]], output_path: str) -> List[Dict[str, Any]]:
+        """
+        Exécute tous les travaux et écrit un résultat (JSON) par ligne dans output_path.
+
+        Returns:
+            list: Résultats dans l'ordre des travaux
+        """
+        prepare_models()
+        print(f"Lot de {len(jobs)} travaux, {self.concurrency} en parallèle.")
+
+        with open(output_path, "w", encoding="utf-8") as output:
+            def run_and_write(job):
+                # Les appels des lots passent après ceux des sessions interactives,
+                # et les travaux du lot sont servis à tour de rôle
+                with scheduling("batch", owner=f"lot:{job['job_id']}"):
+                    result = self.run_job(job)
+                self._write_result(output, result)
+                return result
+
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="lot") as executor:
+                results = list(executor.map(run_and_write, jobs))
+
+        succeeded = sum(1 for result in results if result["status"] == "ok")
+        print(f"\nLot terminé: {succeeded}/{len(results)} lettres générées. Résultats: {output_path}")
+        deferred = sum(1 for result in results if result["status"] == "deferred")
+        if deferred:
+            print(f"{deferred} travail(aux) reporté(s): relancez le lot pour les reprendre.")
+        return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Génération de lettres de motivation en lot")
+    parser.add_argument("jobs", help="Fichier des travaux (.jsonl ou .csv)")
+    parser.add_argument("-o", "--output", help="Fichier de résultats JSONL (par défaut: <travaux>_resultats.jsonl)")
+    parser.add_argument("-c", "--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help="Nombre de travaux traités simultanément")
+    parser.add_argument("--checkpoint-dir", default=BATCH_CHECKPOINT_DIR,
+                        help="Dossier des points de reprise")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignorer les points de reprise existants et tout recalculer")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.jobs):
+        print(f"❌ Fichier introuvable: {args.jobs}")
+        return 1
+
+    jobs = [normalize_job(raw, index) for index, raw in enumerate(read_jobs(args.jobs), 1)]
+    if not jobs:
+        print("Aucun travail à traiter.")
+        return 0
+
+    duplicates = len(jobs) - len({job["job_id"] for job in jobs})
+    if duplicates:
+        print(f"❌ {duplicates} identifiant(s) de travail en double: chaque 'job_id' doit être unique.")
+        return 1
+
+    if args.restart and os.path.isdir(args.checkpoint_dir):
+        for filename in os.listdir(args.checkpoint_dir):
+            if filename.endswith(".json"):
+                os.remove(os.path.join(args.checkpoint_dir, filename))
+
+    output_path = args.output or os.path.splitext(args.jobs)[0] + "_resultats.jsonl"
+    results = BatchRunner(args.checkpoint_dir, args.concurrency).run(jobs, output_path)
+    return 0 if all(result["status"] == "ok" for result in results) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Stockage adressé par contenu des textes volumineux des sessions.
+Les informations du programme et de l'établissement (enrichissement compris)
+et les lettres sont enregistrées une seule fois, compressées (zlib), sous
+l'empreinte SHA-256 de leur contenu; les sessions n'en gardent que la référence.
+Deux étudiants qui visent le même programme partagent donc les mêmes fichiers.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Set
+
+from decouple import config
+
+# Dossier du stockage partagé
+BLOB_DIR = "session_blobs"
+
+# Champs des sessions externalisés lorsqu'ils sont assez longs
+LARGE_FIELDS = ("parcoursup_info", "etablissement_info", "student_info", "letter1", "letter2", "final_letter")
+
+# Taille minimale (en caractères) d'un texte externalisé
+BLOB_MIN_SIZE = 512
+
+# Clé qui identifie une référence dans une session: {"$blob": "<empreinte>"}
+BLOB_REF = "$blob"
+
+
+class BlobStore:
+    """
+    Stockage de textes adressé par contenu.
+    - Un fichier compressé par contenu distinct (dossier à deux niveaux: ab/abcdef...)
+    - Écriture atomique, ignorée si le contenu est déjà présent
+    - Petit cache des textes décompressés pour les relectures
+    - Nettoyage des contenus qu'aucune session ne référence plus
+    """
+
+    def __init__(self, directory: str = BLOB_DIR, min_size: int = BLOB_MIN_SIZE,
+                 compression_level: int = 6, cache_entries: int = 128):
+        """
+        Args:
+            directory: Dossier du stockage
+            min_size: Taille minimale d'un texte externalisé
+            compression_level: Niveau de compression zlib (1-9)
+            cache_entries: Nombre de textes décompressés gardés en mémoire
+        """
+        self.directory = directory
+        self.min_size = min_size
+        self.compression_level = compression_level
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest[2:] + ".z")
+
+    def _remember(self, digest: str, text: str) -> None:
+        with self._lock:
+            self._cache[digest] = text
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def put(self, text: str) -> str:
+        """
+        Enregistre un texte (une seule fois par contenu).
+
+        Returns:
+            str: Empreinte SHA-256 du texte
+        """
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        try:
+            # Déjà présent: rafraîchir la date (le nettoyage épargne les contenus récents)
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(zlib.compress(data, self.compression_level))
+            os.replace(tmp_path, path)
+        self._remember(digest, text)
+        return digest
+
+    def get(self, digest: str) -> str:
+        """
+        Relit un texte à partir de son empreinte.
+
+        Raises:
+            KeyError: Contenu absent du stockage
+        """
+        with self._lock:
+            text = self._cache.get(digest)
+        if text is not None:
+            return text
+        try:
+            with open(self._path(digest), "rb") as f:
+                text = zlib.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            raise KeyError(f"Contenu introuvable dans le stockage: {digest}")
+        self._remember(digest, text)
+        return text
+
+    def dehydrate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Copie d'une session où les textes volumineux sont remplacés par leur référence
+        (candidatures multiples comprises).
+        """
+        stored = dict(data)
+        for field in LARGE_FIELDS:
+            value = stored.get(field)
+            if isinstance(value, str) and len(value) >= self.min_size:
+                stored[field] = {BLOB_REF: self.put(value)}
+        if isinstance(stored.get("applications"), list):
+            stored["applications"] = [self.dehydrate(application) if isinstance(application, dict) else application
+                                      for application in stored["applications"]]
+        return stored
+
+    def rehydrate(self, stored: Dict[str, Any]) -> Dict[str, Any]:
+        """Session complète: chaque référence est remplacée par le texte correspondant"""
+        data = dict(stored)
+        for field, value in stored.items():
+            if isinstance(value, dict) and set(value) == {BLOB_REF}:
+                data[field] = self.get(value[BLOB_REF])
+        if isinstance(data.get("applications"), list):
+            data["applications"] = [self.rehydrate(application) if isinstance(application, dict) else application
+                                    for application in data["applications"]]
+        return data
+
+    @staticmethod
+    def references(stored: Dict[str, Any]) -> Set[str]:
+        """Empreintes référencées par une session enregistrée"""
+        digests = {value[BLOB_REF] for value in stored.values()
+                   if isinstance(value, dict) and set(value) == {BLOB_REF}}
+        for application in stored.get("applications") or ():
+            if isinstance(application, dict):
+                digests |= BlobStore.references(application)
+        return digests
+
+    def collect_garbage(self, referenced: Iterable[str], grace_period: float = 3600.0) -> Dict[str, int]:
+        """
+        Supprime les contenus qu'aucune session ne référence.
+
+        Args:
+            referenced: Empreintes encore utilisées
+            grace_period: Âge minimal (en secondes) d'un contenu supprimé, pour épargner
+                          ceux dont la session est en cours d'enregistrement
+
+        Returns:
+            dict: Nombre de contenus conservés et supprimés, octets libérés
+        """
+        referenced = set(referenced)
+        result = {"kept": 0, "removed": 0, "freed_bytes": 0}
+        if not os.path.isdir(self.directory):
+            return result
+        cutoff = time.time() - grace_period
+        for prefix in os.listdir(self.directory):
+            prefix_dir = os.path.join(self.directory, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for filename in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, filename)
+                digest = prefix + filename.split(".")[0]
+                try:
+                    stat = os.stat(path)
+                    if filename.endswith(".z") and (digest in referenced or stat.st_mtime > cutoff):
+                        result["kept"] += 1
+                        continue
+                    if stat.st_mtime > cutoff:
+                        continue
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                with self._lock:
+                    self._cache.pop(digest, None)
+                result["removed"] += 1
+                result["freed_bytes"] += stat.st_size
+        return result
+
+    def disk_usage(self) -> Dict[str, int]:
+        """Nombre de contenus stockés et taille totale (en octets)"""
+        count = size = 0
+        if os.path.isdir(self.directory):
+            for root, _, filenames in os.walk(self.directory):
+                for filename in filenames:
+                    if filename.endswith(".z"):
+                        count += 1
+                        size += os.path.getsize(os.path.join(root, filename))
+        return {"blobs": count, "bytes": size}
+
+
+# Instance globale pour faciliter l'importation
+blob_store = BlobStore(
+    directory=config("BLOB_DIR", default=BLOB_DIR),
+    min_size=config("BLOB_MIN_SIZE", default=BLOB_MIN_SIZE, cast=int),
+)
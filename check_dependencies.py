@@ -46,7 +46,7 @@ def check_env_file():
     
     try:
         from decouple import config
-        api_key = config("GOOGLE_API_KEY", default=None)
+        api_key = config("GOOGLE_API_KEY", default=None) or config("GOOGLE_API_KEYS", default=None)
         if not api_key:
             print(f"{YELLOW}⚠️ GOOGLE_API_KEY not found in .env file!{RESET}")
             return False
@@ -50,7 +50,33 @@ def display_report():
                 print(f"\nErreur lors de l'analyse de la date de dernière erreur: {e}")
         else:
             print("\n✅ Aucune erreur de quota n'a été enregistrée jusqu'à présent.")
-        
+
+        # Afficher les modèles utilisés par étape et les replis
+        routing = report.get('routing') or {}
+        if routing.get('by_stage'):
+            print("\nModèles utilisés par étape:")
+            for stage, models in sorted(routing['by_stage'].items()):
+                details = ", ".join(f"{name}: {count}" for name, count in sorted(models.items()))
+                print(f"- {stage}: {details}")
+            fallbacks = routing.get('fallbacks', {})
+            if fallbacks:
+                details = ", ".join(f"{reason}: {count}" for reason, count in sorted(fallbacks.items()))
+                print(f"- Replis sur un autre modèle: {details}")
+
+        # Afficher la limite adaptative d'appels simultanés et ses derniers changements
+        concurrency = report.get('concurrency', {})
+        history = report.get('concurrency_history', [])
+        if concurrency:
+            # La limite repart de sa valeur initiale à chaque processus: afficher la dernière atteinte
+            limit = history[-1]['limit'] if history else concurrency['limit']
+            print(f"\nAppels simultanés autorisés: {limit} "
+                  f"(entre {concurrency['min']} et {concurrency['max']})")
+        if history:
+            print("Derniers ajustements de la limite:")
+            for change in history[-10:]:
+                change_time = datetime.fromisoformat(change['time']).strftime('%d/%m/%Y %H:%M:%S')
+                print(f"- {change_time}: {change['limit']} ({change['reason']})")
+
         print("\n===== CONSEILS D'UTILISATION =====")
         print("- Les quotas Google Gemini sont généralement basés sur des périodes de 24h et 60s")
         print("- Pour éviter les erreurs, espacez vos générations de plusieurs minutes")
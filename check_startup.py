@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Vérifie le temps de démarrage à froid des outils en ligne de commande.
+Chaque scénario est lancé dans un nouvel interpréteur; le script échoue si la
+durée médiane dépasse le budget, ou si un module lourd (SDK Gemini, crewai, LangChain,
+scraping) est chargé alors qu'aucun appel au modèle n'a encore eu lieu.
+
+Scénarios:
+- check_quota: rapport complet de `python check_quota.py`
+- launcher: lanceur jusqu'à sa première question à l'utilisateur
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Sequence
+
+from decouple import config
+
+# Budget (en secondes) d'un démarrage à froid, interpréteur compris
+STARTUP_BUDGET = config("STARTUP_BUDGET", default=1.0, cast=float)
+
+# Modules qui ne doivent être chargés qu'au premier vrai appel (modèle ou scraping)
+HEAVY_MODULES = (
+    "google.generativeai",
+    "google.ai.generativelanguage",
+    "crewai",
+    "langchain",
+    "langchain_community",
+    "bs4",
+    "lxml",
+    "requests",
+    # Modules internes qui initialisent client, quotas et cache à l'importation
+    "direct_approach",
+    "gemini_client",
+    "llm_cache",
+    "model_router",
+    "llm_scheduler",
+    "quota_manager",
+)
+
+# Exécuté dans l'interpréteur mesuré: lance l'outil, s'arrête à sa première
+# question et enregistre les modules chargés à ce moment-là
+PROBE = """
+import builtins, json, sys
+sys.argv = [{script!r}]
+
+def report():
+    with open({output!r}, "w") as f:
+        json.dump(sorted(sys.modules), f)
+
+def first_prompt(prompt=""):
+    report()
+    raise SystemExit(0)
+
+builtins.input = first_prompt
+import {module}
+{module}.main()
+report()
+"""
+
+# Scénario -> (module lancé, modules lourds qu'il a le droit de charger)
+SCENARIOS = {
+    # Le rapport de quota est la raison d'être de check_quota
+    "check_quota": ("check_quota", ("quota_manager",)),
+    "launcher": ("launcher", ()),
+}
+
+
+def run_scenario(module: str) -> Dict[str, Any]:
+    """
+    Lance un scénario dans un nouvel interpréteur.
+
+    Returns:
+        dict: Durée (secondes), modules chargés et code de retour
+    """
+    fd, output = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        code = PROBE.format(script=f"{module}.py", output=output, module=module)
+        started = time.perf_counter()
+        process = subprocess.run([sys.executable, "-c", code], stdin=subprocess.DEVNULL,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                 cwd=os.path.dirname(os.path.abspath(__file__)))
+        seconds = time.perf_counter() - started
+        with open(output) as f:
+            content = f.read()
+        modules = json.loads(content) if content else None
+    finally:
+        os.remove(output)
+    return {"seconds": seconds, "modules": modules, "returncode": process.returncode,
+            "stderr": process.stderr.decode("utf-8", "replace").strip()}
+
+
+def heavy_modules(modules: List[str], allowed: Sequence[str] = ()) -> List[str]:
+    """Modules lourds présents parmi les modules chargés (hors modules autorisés)"""
+    return [name for name in HEAVY_MODULES if name in modules and name not in allowed]
+
+
+def check(name: str, repeat: int, budget: float) -> bool:
+    """Mesure un scénario et affiche le résultat; retourne True s'il respecte le budget"""
+    module, allowed = SCENARIOS[name]
+    runs = [run_scenario(module) for _ in range(repeat)]
+    last = runs[-1]
+    if last["modules"] is None:
+        print(f"❌ {name}: l'outil s'est arrêté avant sa première question (code {last['returncode']})")
+        if last["stderr"]:
+            print(last["stderr"])
+        return False
+
+    median = statistics.median(run["seconds"] for run in runs)
+    loaded = heavy_modules(last["modules"], allowed)
+    ok = median <= budget and not loaded
+    status = "✅" if ok else "❌"
+    print(f"{status} {name}: {median:.3f}s (médiane de {repeat}, premier lancement {runs[0]['seconds']:.3f}s, "
+          f"budget {budget:.3f}s)")
+    if loaded:
+        print(f"   Modules chargés trop tôt: {', '.join(loaded)}")
+    return ok
+
+
+def main():
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Vérifie le temps de démarrage à froid des outils")
+    parser.add_argument("--repeat", type=int, default=5, help="Nombre de lancements par scénario")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET,
+                        help="Durée maximale (en secondes) d'un démarrage à froid")
+    parser.add_argument("scenarios", nargs="*",
+                        help=f"Scénarios à vérifier parmi {', '.join(SCENARIOS)} (tous par défaut)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Scénario inconnu: {', '.join(unknown)}")
+    names = args.scenarios or list(SCENARIOS)
+    results = [check(name, max(1, args.repeat), args.budget) for name in names]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
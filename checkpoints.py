@@ -0,0 +1,136 @@
+"""
+Points de reprise des traitements longs.
+Le résultat de chaque étape terminée est enregistré sur disque avec l'empreinte
+de ses entrées, pour qu'une exécution interrompue reprenne sans refaire les
+appels au modèle déjà effectués.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Dossier de stockage des points de reprise
+CHECKPOINT_DIR = "checkpoints"
+
+
+def fingerprint(*parts: Any) -> str:
+    """Calcule l'empreinte (SHA-256) d'un ensemble d'entrées sérialisables en JSON"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StageCheckpoint:
+    """
+    Points de reprise d'un traitement découpé en étapes.
+    - Un fichier JSON par traitement, réécrit de façon atomique après chaque étape
+    - Chaque étape conserve son résultat, sa durée et l'empreinte de ses entrées
+    - Une étape dont les entrées ont changé est recalculée
+    """
+
+    def __init__(self, name: str, directory: str = CHECKPOINT_DIR):
+        """
+        Charge les points de reprise d'un traitement.
+
+        Args:
+            name: Identifiant du traitement (nom du fichier)
+            directory: Dossier de stockage
+        """
+        self.name = name
+        self.directory = directory
+        self.path = os.path.join(directory, f"{name}.json")
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("stages", {})
+        except (OSError, ValueError) as e:
+            print(f"Point de reprise illisible ({self.path}), il sera recréé: {e}")
+            return {}
+
+    def _save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"name": self.name, "stages": self._stages}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, stage: str, inputs: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Retourne l'enregistrement d'une étape terminée.
+
+        Args:
+            stage: Nom de l'étape
+            inputs: Empreinte des entrées attendues (None: ne pas vérifier)
+
+        Returns:
+            dict or None: Enregistrement {'output', 'seconds', 'inputs', 'completed_at'}
+        """
+        with self._lock:
+            record = self._stages.get(stage)
+        if record is None or (inputs is not None and record.get("inputs") != inputs):
+            return None
+        return record
+
+    def record(self, stage: str, output: Any, seconds: float = 0.0, inputs: Optional[str] = None) -> None:
+        """Enregistre le résultat d'une étape terminée"""
+        with self._lock:
+            self._stages[stage] = {
+                "output": output,
+                "seconds": round(seconds, 3),
+                "inputs": inputs,
+                "completed_at": time.time(),
+            }
+            self._save()
+
+    def run(self, stage: str, func: Callable[..., Any], *args, inputs: Optional[str] = None,
+            accept: Optional[Callable[[Any], bool]] = None, **kwargs) -> Any:
+        """
+        Exécute une étape, ou réutilise son résultat si elle est déjà terminée.
+
+        Args:
+            stage: Nom de l'étape
+            func: Fonction qui calcule le résultat de l'étape
+            inputs: Empreinte des entrées de l'étape
+            accept: Prédicat indiquant si le résultat peut être enregistré
+                    (un résultat refusé est renvoyé mais sera recalculé à la reprise)
+        """
+        record = self.get(stage, inputs)
+        if record is not None:
+            return record["output"]
+
+        started = time.monotonic()
+        output = func(*args, **kwargs)
+        if accept is None or accept(output):
+            self.record(stage, output, time.monotonic() - started, inputs)
+        return output
+
+    def seconds(self, stage: str) -> Optional[float]:
+        """Durée d'exécution enregistrée pour une étape"""
+        with self._lock:
+            record = self._stages.get(stage)
+        return record["seconds"] if record else None
+
+    def invalidate(self, stage: Optional[str] = None) -> None:
+        """Oublie une étape (ou toutes)"""
+        with self._lock:
+            if stage is None:
+                self._stages.clear()
+            else:
+                self._stages.pop(stage, None)
+            self._save()
+
+    def discard(self) -> None:
+        """Supprime les points de reprise du traitement (une fois celui-ci terminé)"""
+        with self._lock:
+            self._stages.clear()
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
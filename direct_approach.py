@@ -1,14 +1,21 @@
 import os
 import sys
 import json
+import time
+import threading
+import contextvars
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Dict, Optional, Any, Tuple, List
 
 try:
-    import google.generativeai as genai
     from decouple import config
+    from gemini_client import gemini_clients, default_api_key, GeminiError, CircuitOpenError
     from textwrap import dedent
-    from tools.scraping_tools import scrape_parcoursup, scrape_etablissement
-    from user_session import save_user_profile, load_user_profile, get_available_sessions
+    from user_session import (save_user_profile, load_user_profile, get_available_sessions,
+                              count_sessions, new_session_id, SESSION_PAGE_SIZE)
+    from checkpoints import StageCheckpoint, fingerprint
+    from length_fitting import LENGTH_TOLERANCE, trim_to_length, truncate_at_boundary, within_tolerance
 except ImportError as e:
     module_name = str(e).split("'")[-2]
     print(f"\n❌ ERROR: The '{module_name}' module is not installed.")
@@ -20,7 +27,8 @@ except ImportError as e:
 
 # Configuration de l'API
 try:
-    API_KEY = config("GOOGLE_API_KEY")
+    # GOOGLE_API_KEYS (liste séparée par des virgules) permet de répartir les requêtes sur plusieurs clés
+    API_KEY = default_api_key()
     if not API_KEY:
         print("❌ ERROR: GOOGLE_API_KEY is not set in your .env file.")
         print("Please create a .env file with your Google API key.")
@@ -33,62 +41,172 @@ except Exception as e:
     print("Example: GOOGLE_API_KEY=your_api_key_here")
     sys.exit(1)
 
-# Importer le gestionnaire de quota
+# Importer le gestionnaire de quota et le cache des réponses
 from quota_manager import quota_manager
+from llm_cache import llm_cache
+from model_router import model_router
+from llm_scheduler import llm_scheduler, scheduling
 
-def generate_text(prompt, temperature=0.7):
-    """Fonction simple pour générer du texte avec Gemini"""
-    try:
-        # Utiliser le gestionnaire de quota pour gérer les requêtes API
-        def request_function():
-            model = genai.GenerativeModel('gemini-pro', generation_config={"temperature": temperature})
-            response = model.generate_content(prompt)
-            return response.text
-        
-        # Utiliser le gestionnaire de quotas pour gérer les limites de taux
-        return quota_manager.handle_request(request_function)
-    except Exception as e:
-        print(f"Erreur lors de la génération de texte: {str(e)}")
-        return f"Une erreur est survenue: {str(e)}"
+# Températures utilisées par le pipeline (enrichissement, ajustement, formelle/fusion, créative)
+PIPELINE_TEMPERATURES = (0.3, 0.4, 0.7, 0.9)
 
-def load_previous_session() -> Optional[Dict[str, Any]]:
-    """Permet à l'utilisateur de choisir une session précédente"""
-    sessions = get_available_sessions()
-    
-    if not sessions:
-        print("Aucune session précédente trouvée.")
-        return None
-    
-    print("\n--- SESSIONS PRÉCÉDENTES ---")
-    print("0. Créer une nouvelle session")
+# Délai maximum (en secondes) accordé à chaque chaîne d'acquisition, compté à partir
+# du moment où son résultat est attendu (pas pendant l'entretien qui se déroule en parallèle)
+ACQUISITION_TIMEOUT = config("ACQUISITION_TIMEOUT", default=180, cast=float)
+
+# Nombre maximum d'appels au modèle pour ajuster la longueur d'une lettre
+MAX_LENGTH_LLM_ATTEMPTS = config("MAX_LENGTH_LLM_ATTEMPTS", default=2, cast=int)
+
+# Nombre maximum de brouillons générés simultanément
+DRAFT_CONCURRENCY = config("DRAFT_CONCURRENCY", default=2, cast=int)
+
+# Nombre maximum de candidatures traitées en une seule session
+MAX_APPLICATIONS = 10
+
+# Nombre maximum de candidatures générées simultanément
+APPLICATION_CONCURRENCY = config("APPLICATION_CONCURRENCY", default=3, cast=int)
+
+# Dossier des points de reprise des sessions (un fichier par session en cours)
+SESSION_CHECKPOINT_DIR = config("SESSION_CHECKPOINT_DIR", default="session_checkpoints")
+
+# États d'une session dont la génération ne s'est pas terminée
+INTERRUPTED_STATUSES = ("in_progress", "deferred")
+
+# Textes utilisés lorsqu'une chaîne d'acquisition n'a rien pu produire à temps
+ACQUISITION_FALLBACKS = {
+    "parcoursup": "Impossible d'accéder à l'URL Parcoursup. Veuillez vérifier l'URL et réessayer.",
+    "etablissement": "Impossible d'accéder à l'URL de l'établissement. Veuillez vérifier l'URL et réessayer.",
+}
+
+# Séparateur entre les informations extraites et leur enrichissement par le modèle
+ENRICHMENT_HEADER = "\n\nInformations enrichies:\n"
+
+# Questions posées pendant l'entretien
+INTERVIEW_QUESTIONS = [
+    "Pourriez-vous me parler de votre parcours académique jusqu'à présent ?",
+    "Quelles sont vos compétences ou expériences qui selon vous correspondent à ce programme ?",
+    "Pourquoi êtes-vous intéressé(e) par ce programme spécifique ?",
+    "Comment ce programme s'inscrit-il dans votre projet professionnel ?",
+    "Quelles qualités personnelles pensez-vous apporter à ce programme ?",
+    "Avez-vous des réalisations ou projets dont vous êtes particulièrement fier(e) ?",
+    "Avez-vous dû surmonter des défis importants dans votre parcours ?",
+    "Pouvez-vous me parler de vos expériences professionnelles, associatives ou de bénévolat qui pourraient être pertinentes pour cette candidature ?"
+]
+
+# Réponses prédéfinies (mode test)
+DEFAULT_ANSWERS = [
+    "J'ai obtenu un baccalauréat scientifique avec mention bien. Actuellement, je suis en classe préparatoire scientifique où j'étudie les mathématiques, la physique et l'informatique.",
+    "J'ai développé des compétences analytiques solides et une capacité à résoudre des problèmes complexes. J'ai également participé à plusieurs projets informatiques qui m'ont permis de développer mes compétences en programmation et en travail d'équipe.",
+    "Ce programme m'intéresse particulièrement pour son approche pluridisciplinaire et sa réputation d'excellence. La possibilité de combiner théorie et pratique correspond parfaitement à ma façon d'apprendre.",
+    "Ce programme s'inscrit parfaitement dans mon projet de devenir ingénieur/analyste de données. Les compétences que je pourrai y développer me permettront d'avoir une carrière dans un domaine en constante évolution.",
+    "Je suis rigoureux, persévérant et j'ai une grande capacité d'adaptation. Je suis également curieux et toujours désireux d'apprendre de nouvelles choses.",
+    "J'ai développé une application mobile qui a remporté un prix dans un concours étudiant. Ce projet m'a permis de mettre en pratique mes connaissances théoriques et de développer mes compétences en gestion de projet.",
+    "J'ai dû concilier mes études et un emploi à temps partiel pour financer ma scolarité. Cette expérience m'a appris à gérer mon temps efficacement et à rester déterminé face aux défis.",
+    "J'ai été membre actif de l'association informatique de mon école où j'ai organisé des ateliers de programmation. J'ai également effectué un stage de 3 mois dans une entreprise de développement logiciel où j'ai participé à la création d'une application web. Ces expériences m'ont permis de développer mes compétences en leadership et en communication."
+]
+
+def generate_text(prompt, temperature=0.7, call_site="default", use_cache=None):
+    """
+    Fonction simple pour générer du texte avec Gemini.
     
-    for i, session in enumerate(sessions, 1):
-        print(f"{i}. {session['username']} - Programme: {session['program']} (Mis à jour: {session['last_updated']})")
+    Args:
+        prompt: Texte envoyé au modèle
+        temperature: Température de génération
+        call_site: Point d'appel, qui détermine la politique de cache et les modèles utilisés
+                   ('enrichment', 'draft', 'fusion', 'length' ou 'default')
+        use_cache: True pour forcer le cache, False pour le contourner sur cet appel
     
-    try:
-        choice = input("\nVeuillez choisir une option (0-" + str(len(sessions)) + "): ")
-        choice = int(choice)
-        
-        if choice == 0:
+    Raises:
+        GeminiError: Échec de la génération (CircuitOpenError si l'API est jugée indisponible)
+    """
+    generation_config = {"temperature": temperature}
+    
+    # Réutiliser une réponse identique déjà obtenue si la politique le permet
+    cacheable = llm_cache.should_use(call_site, temperature, use_cache)
+    if cacheable:
+        cache_key = llm_cache.make_key(model_router.primary(call_site), generation_config, prompt)
+        cached_text = llm_cache.get(cache_key, call_site)
+        if cached_text is not None:
+            return cached_text
+    
+    # Le routeur choisit le modèle de l'étape et se replie sur le suivant si son
+    # quota est épuisé ou s'il répond trop lentement (limites de débit appliquées
+    # par le gestionnaire de quota). Les échecs sont levés, jamais renvoyés comme texte.
+    text, model_name = model_router.generate_with_model(call_site, prompt, generation_config)
+    if cacheable:
+        # La réponse est rangée sous le modèle qui l'a produite: celle d'un modèle de
+        # repli ne sera jamais servie comme si elle venait du modèle principal
+        llm_cache.put(llm_cache.make_key(model_name, generation_config, prompt), text, call_site)
+    return text
+
+def build_student_info(responses: List[Dict[str, str]]) -> str:
+    """Compile des réponses d'entretien en profil étudiant utilisable dans les prompts"""
+    return "\n\n".join(f"Question: {resp['question']}\nRéponse: {resp['answer']}" for resp in responses)
+
+def load_previous_session() -> Optional[Dict[str, Any]]:
+    """Permet à l'utilisateur de choisir une session précédente (liste paginée, filtre par nom)"""
+    username = None
+    offset = 0
+    
+    while True:
+        total = count_sessions(username)
+        if total == 0:
+            if username:
+                print(f"Aucune session trouvée pour '{username}'.")
+                username, offset = None, 0
+                continue
+            print("Aucune session précédente trouvée.")
             return None
-        elif 1 <= choice <= len(sessions):
-            session_id = sessions[choice-1]["session_id"]
-            user_data = load_user_profile(session_id)
-            if user_data:
-                print(f"Session '{sessions[choice-1]['username']}' chargée avec succès.")
-                return user_data
+        sessions = get_available_sessions(offset, SESSION_PAGE_SIZE, username)
+        
+        print("\n--- SESSIONS PRÉCÉDENTES ---")
+        print("0. Créer une nouvelle session")
+        
+        for i, session in enumerate(sessions, 1):
+            interrupted = " [à reprendre]" if session.get("status") in INTERRUPTED_STATUSES else ""
+            print(f"{i}. {session['username']} - Programme: {session['program']} "
+                  f"(Mis à jour: {session['last_updated']}){interrupted}")
+        
+        # Navigation lorsque toutes les sessions ne tiennent pas sur une page
+        if total > SESSION_PAGE_SIZE or username:
+            print(f"(sessions {offset + 1}-{offset + len(sessions)} sur {total}; "
+                  f"'s': page suivante, 'p': page précédente, '/nom': filtrer par nom)")
+        
+        try:
+            choice = input("\nVeuillez choisir une option (0-" + str(len(sessions)) + "): ").strip()
+            if choice.lower() == "s":
+                if offset + SESSION_PAGE_SIZE < total:
+                    offset += SESSION_PAGE_SIZE
+                continue
+            if choice.lower() == "p":
+                offset = max(0, offset - SESSION_PAGE_SIZE)
+                continue
+            if choice.startswith("/"):
+                username, offset = choice[1:].strip() or None, 0
+                continue
+            
+            choice = int(choice)
+            
+            if choice == 0:
+                return None
+            elif 1 <= choice <= len(sessions):
+                session_id = sessions[choice-1]["session_id"]
+                user_data = load_user_profile(session_id)
+                if user_data:
+                    print(f"Session '{sessions[choice-1]['username']}' chargée avec succès.")
+                    return user_data
+                else:
+                    print("Erreur lors du chargement de la session.")
+                    return None
             else:
-                print("Erreur lors du chargement de la session.")
+                print("Option invalide, création d'une nouvelle session.")
                 return None
-        else:
-            print("Option invalide, création d'une nouvelle session.")
+        except ValueError:
+            print("Entrée invalide, création d'une nouvelle session.")
+            return None
+        except Exception as e:
+            print(f"Erreur: {str(e)}")
             return None
-    except ValueError:
-        print("Entrée invalide, création d'une nouvelle session.")
-        return None
-    except Exception as e:
-        print(f"Erreur: {str(e)}")
-        return None
 
 def ask_personal_info() -> Dict[str, str]:
     """Demande des informations personnelles à l'utilisateur"""
@@ -110,7 +228,13 @@ def ask_personal_info() -> Dict[str, str]:
         return {}
 
 def interview_student(parcoursup_info, etablissement_info, previous_responses=None) -> Tuple[str, List[Dict[str, str]]]:
-    """Simule l'entretien avec l'étudiant et retourne les réponses structurées"""
+    """
+    Simule l'entretien avec l'étudiant et retourne les réponses structurées.
+    Les informations sur le programme peuvent valoir None lorsque leur
+    récupération est encore en cours en arrière-plan.
+    """
+    parcoursup_info = parcoursup_info or "(recherche en cours)"
+    etablissement_info = etablissement_info or "(recherche en cours)"
     prompt = dedent(f"""
     Tu es un intervieweur empathique spécialisé dans l'aide aux étudiants pour
     identifier et articuler leurs forces, motivations et expériences.
@@ -143,21 +267,8 @@ def interview_student(parcoursup_info, etablissement_info, previous_responses=No
     print("Agent: Bonjour ! Je suis là pour vous aider à préparer votre lettre de motivation.")
     print("Agent: Commençons par discuter de votre parcours et de vos motivations.\n")
     
-    student_profile = []
     response_data = []
     
-    # Simuler plusieurs questions
-    questions = [
-        "Pourriez-vous me parler de votre parcours académique jusqu'à présent ?",
-        "Quelles sont vos compétences ou expériences qui selon vous correspondent à ce programme ?",
-        "Pourquoi êtes-vous intéressé(e) par ce programme spécifique ?",
-        "Comment ce programme s'inscrit-il dans votre projet professionnel ?",
-        "Quelles qualités personnelles pensez-vous apporter à ce programme ?",
-        "Avez-vous des réalisations ou projets dont vous êtes particulièrement fier(e) ?",
-        "Avez-vous dû surmonter des défis importants dans votre parcours ?",
-        "Pouvez-vous me parler de vos expériences professionnelles, associatives ou de bénévolat qui pourraient être pertinentes pour cette candidature ?"
-    ]
-    
     # Gestion sécurisée des entrées avec option de réponses par défaut
     try:
         use_default = input("Souhaitez-vous utiliser des réponses prédéfinies pour le test ? (o/n): ").lower() in ['o', 'oui']
@@ -165,18 +276,8 @@ def interview_student(parcoursup_info, etablissement_info, previous_responses=No
         print("Erreur lors de la saisie. Utilisation des réponses prédéfinies par défaut.")
         use_default = True
     
-    default_answers = [
-        "J'ai obtenu un baccalauréat scientifique avec mention bien. Actuellement, je suis en classe préparatoire scientifique où j'étudie les mathématiques, la physique et l'informatique.",
-        "J'ai développé des compétences analytiques solides et une capacité à résoudre des problèmes complexes. J'ai également participé à plusieurs projets informatiques qui m'ont permis de développer mes compétences en programmation et en travail d'équipe.",
-        "Ce programme m'intéresse particulièrement pour son approche pluridisciplinaire et sa réputation d'excellence. La possibilité de combiner théorie et pratique correspond parfaitement à ma façon d'apprendre.",
-        "Ce programme s'inscrit parfaitement dans mon projet de devenir ingénieur/analyste de données. Les compétences que je pourrai y développer me permettront d'avoir une carrière dans un domaine en constante évolution.",
-        "Je suis rigoureux, persévérant et j'ai une grande capacité d'adaptation. Je suis également curieux et toujours désireux d'apprendre de nouvelles choses.",
-        "J'ai développé une application mobile qui a remporté un prix dans un concours étudiant. Ce projet m'a permis de mettre en pratique mes connaissances théoriques et de développer mes compétences en gestion de projet.",
-        "J'ai dû concilier mes études et un emploi à temps partiel pour financer ma scolarité. Cette expérience m'a appris à gérer mon temps efficacement et à rester déterminé face aux défis.",
-        "J'ai été membre actif de l'association informatique de mon école où j'ai organisé des ateliers de programmation. J'ai également effectué un stage de 3 mois dans une entreprise de développement logiciel où j'ai participé à la création d'une application web. Ces expériences m'ont permis de développer mes compétences en leadership et en communication."
-    ]
     
-    for i, question in enumerate(questions):
+    for i, question in enumerate(INTERVIEW_QUESTIONS):
         print(f"Agent: {question}")
         
         # Si nous avons des réponses précédentes, utilisons-les
@@ -184,27 +285,25 @@ def interview_student(parcoursup_info, etablissement_info, previous_responses=No
             answer = previous_responses[i]["answer"]
             print(f"Vous: {answer} (réponse précédente)")
         elif use_default:
-            answer = default_answers[i]
+            answer = DEFAULT_ANSWERS[i]
             print(f"Vous: {answer} (réponse prédéfinie)")
         else:
             try:
                 answer = input("Vous: ")
                 if not answer.strip():  # Si la réponse est vide
-                    answer = default_answers[i]
+                    answer = DEFAULT_ANSWERS[i]
                     print(f"Réponse vide, utilisation de la réponse par défaut: {answer}")
             except Exception as e:
-                answer = default_answers[i]
+                answer = DEFAULT_ANSWERS[i]
                 print(f"Erreur lors de la saisie: {e}")
                 print(f"Utilisation de la réponse par défaut: {answer}")
         
-        student_profile.append(f"Question: {question}\nRéponse: {answer}")
         response_data.append({"question": question, "answer": answer})
     
     print("\n--- FIN DE L'ENTRETIEN ---\n")
     
     # Compiler le profil étudiant
-    full_profile = "\n\n".join(student_profile)
-    return full_profile, response_data
+    return build_student_info(response_data), response_data
 
 def generate_formal_letter(parcoursup_info, etablissement_info, student_info):
     """Génère une lettre de motivation formelle"""
@@ -242,7 +341,7 @@ def generate_formal_letter(parcoursup_info, etablissement_info, student_info):
     Assure-toi d'intégrer harmonieusement les expériences professionnelles, associatives ou bénévoles si elles sont mentionnées.
     """)
     
-    letter = generate_text(prompt, temperature=0.7)
+    letter = generate_text(prompt, temperature=0.7, call_site="draft")
     
     # Vérifier et ajuster la longueur
     letter = adjust_letter_length(letter, 1490)
@@ -286,15 +385,67 @@ def generate_creative_letter(parcoursup_info, etablissement_info, student_info):
     des compétences transversales comme le leadership, le travail d'équipe ou l'engagement.
     """)
     
-    letter = generate_text(prompt, temperature=0.9)
+    letter = generate_text(prompt, temperature=0.9, call_site="draft")
     
     # Vérifier et ajuster la longueur
     letter = adjust_letter_length(letter, 1490)
     
     return letter
 
-def fusion_letters(letter1, letter2):
-    """Fusionne les deux versions de la lettre"""
+def is_usable_info(text) -> bool:
+    """
+    Indique si des informations de programme peuvent être conservées pour la reprise:
+    récupérées et enrichies (un enrichissement en échec sera retenté)
+    """
+    return bool(text) and text not in ACQUISITION_FALLBACKS.values() and ENRICHMENT_HEADER in text
+
+def is_usable_letter(text) -> bool:
+    """Indique si une lettre générée peut être conservée pour la reprise"""
+    return bool(text and text.strip())
+
+def generate_drafts(parcoursup_info, etablissement_info, student_info,
+                    checkpoint: Optional[StageCheckpoint] = None) -> Tuple[str, str]:
+    """
+    Génère en parallèle les versions formelle et créative de la lettre,
+    ajustements de longueur compris.
+    
+    Args:
+        checkpoint: Points de reprise de la session: un brouillon déjà généré
+                    avec les mêmes informations n'est pas redemandé au modèle
+    
+    Returns:
+        Tuple[str, str]: (lettre formelle, lettre créative)
+    """
+    if checkpoint is not None:
+        inputs = fingerprint(parcoursup_info, etablissement_info, student_info)
+        def draft(stage, func):
+            return lambda *args: checkpoint.run(stage, func, *args, inputs=inputs, accept=is_usable_letter)
+        formal_func = draft("formal", generate_formal_letter)
+        creative_func = draft("creative", generate_creative_letter)
+    else:
+        formal_func, creative_func = generate_formal_letter, generate_creative_letter
+    
+    # Chaque appel passe par le gestionnaire de quota; après des erreurs de
+    # quota récentes, revenir à une génération séquentielle
+    should_limit, _ = quota_manager.should_throttle()
+    workers = 1 if should_limit else DRAFT_CONCURRENCY
+    
+    # Chaque brouillon hérite du contexte d'ordonnancement de l'appelant (priorité, propriétaire)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="brouillon") as executor:
+        formal = executor.submit(contextvars.copy_context().run, formal_func,
+                                 parcoursup_info, etablissement_info, student_info)
+        creative = executor.submit(contextvars.copy_context().run, creative_func,
+                                   parcoursup_info, etablissement_info, student_info)
+        return formal.result(), creative.result()
+
+def fusion_letters(letter1, letter2, fit_length=True):
+    """
+    Fusionne les deux versions de la lettre.
+    
+    Args:
+        fit_length: Ajuster la longueur de la lettre fusionnée (sinon, c'est à
+                    l'appelant de le faire, par exemple comme étape distincte)
+    """
     prompt = dedent(f"""
     Analyse les deux versions de lettre de motivation et crée une version finale optimisée.
     
@@ -325,69 +476,166 @@ def fusion_letters(letter1, letter2):
     La lettre doit se lire comme un tout cohérent, et non comme des morceaux disparates.
     """)
     
-    letter = generate_text(prompt, temperature=0.7)
+    letter = generate_text(prompt, temperature=0.7, call_site="fusion")
     
     # Vérifier et ajuster la longueur
-    letter = adjust_letter_length(letter, 1490)
+    if fit_length:
+        letter = adjust_letter_length(letter, 1490)
     
     return letter
 
-def adjust_letter_length(letter, target_length=1490):
+def adjust_letter_length(letter, target_length=1490, max_llm_attempts=None):
     """
     Ajuste précisément la longueur de la lettre au nombre de caractères cible.
+    Une lettre trop longue est d'abord raccourcie localement (phrases ou incises
+    retirées en entier); le modèle n'est sollicité qu'en dernier recours, avec
+    un nombre d'essais borné.
     """
-    current_length = len(letter)
-    
-    # Si la différence est minime (±30 caractères), c'est acceptable
-    if abs(current_length - target_length) <= 30:
-        print(f"✓ Lettre générée: {current_length} caractères (proche de la cible)")
-        return letter
-    
-    if current_length > target_length:
-        # Si trop longue, demander une version plus courte
-        print(f"⚠️ Lettre trop longue ({current_length} caractères). Ajustement...")
-        shortened_prompt = dedent(f"""
-        Voici une lettre de motivation qui est trop longue ({current_length} caractères).
-        Raccourcis-la pour atteindre EXACTEMENT {target_length} caractères (espaces compris),
-        tout en préservant les points clés et la qualité du contenu.
-        
-        Lettre à raccourcir:
-        {letter}
-        """)
-        
-        letter = generate_text(shortened_prompt, temperature=0.4)
-    else:
-        # Si trop courte, demander une version plus longue
-        print(f"⚠️ Lettre trop courte ({current_length} caractères). Ajustement...")
-        extended_prompt = dedent(f"""
-        Voici une lettre de motivation qui est trop courte ({current_length} caractères).
-        Étends-la pour atteindre EXACTEMENT {target_length} caractères (espaces compris),
-        en ajoutant des détails pertinents, des exemples concrets ou des références spécifiques
-        au programme ou à l'établissement. Maintiens le même ton et style.
-        
-        Lettre à étendre:
-        {letter}
-        """)
-        
-        letter = generate_text(extended_prompt, temperature=0.4)
-    
-    # Vérifier la nouvelle longueur
-    new_length = len(letter)
-    print(f"✓ Lettre ajustée: {new_length} caractères")
-    
-    # Si toujours loin de la cible, faire un ajustement manuel
-    if abs(new_length - target_length) > 30:
-        if new_length > target_length:
-            letter = letter[:target_length]
+    if max_llm_attempts is None:
+        max_llm_attempts = MAX_LENGTH_LLM_ATTEMPTS
+    
+    attempts = 0
+    while True:
+        current_length = len(letter)
+        
+        # Si la différence est minime (±30 caractères), c'est acceptable
+        if within_tolerance(letter, target_length):
+            print(f"✓ Lettre générée: {current_length} caractères (proche de la cible)")
+            return letter
+        
+        # Trop longue: essayer d'abord sans appel au modèle
+        if current_length > target_length:
+            fitted = trim_to_length(letter, target_length)
+            if fitted is not None:
+                print(f"✓ Lettre ajustée localement: {current_length} → {len(fitted)} caractères")
+                return fitted
+        
+        if attempts >= max_llm_attempts:
+            break
+        attempts += 1
+        
+        if current_length > target_length:
+            # Si trop longue, demander une version plus courte
+            print(f"⚠️ Lettre trop longue ({current_length} caractères). Ajustement...")
+            shortened_prompt = dedent(f"""
+            Voici une lettre de motivation qui est trop longue ({current_length} caractères).
+            Raccourcis-la pour atteindre EXACTEMENT {target_length} caractères (espaces compris),
+            tout en préservant les points clés et la qualité du contenu.
+            
+            Lettre à raccourcir:
+            {letter}
+            """)
+            
+            try:
+                letter = generate_text(shortened_prompt, temperature=0.4, call_site="length")
+            except GeminiError as e:
+                # L'ajustement est facultatif: garder la lettre et finir localement
+                print(f"⚠️ Ajustement de longueur impossible: {e}")
+                break
         else:
-            # Ajouter des points si nécessaire
-            letter = letter + "." * (target_length - new_length)
+            # Si trop courte, demander une version plus longue
+            print(f"⚠️ Lettre trop courte ({current_length} caractères). Ajustement...")
+            extended_prompt = dedent(f"""
+            Voici une lettre de motivation qui est trop courte ({current_length} caractères).
+            Étends-la pour atteindre EXACTEMENT {target_length} caractères (espaces compris),
+            en ajoutant des détails pertinents, des exemples concrets ou des références spécifiques
+            au programme ou à l'établissement. Maintiens le même ton et style.
+            
+            Lettre à étendre:
+            {letter}
+            """)
+            
+            try:
+                letter = generate_text(extended_prompt, temperature=0.4, call_site="length")
+            except GeminiError as e:
+                print(f"⚠️ Ajustement de longueur impossible: {e}")
+                break
+    
+    # Toujours hors cible: couper à une fin de phrase plutôt qu'au milieu d'un mot,
+    # et laisser une lettre trop courte telle quelle plutôt que de la compléter
+    if len(letter) > target_length + LENGTH_TOLERANCE:
+        letter = truncate_at_boundary(letter, target_length + LENGTH_TOLERANCE)
+    print(f"✓ Lettre ajustée: {len(letter)} caractères")
     
     return letter
 
+def collect_student_profile(user_data: Optional[Dict[str, Any]], parcoursup_info=None,
+                            etablissement_info=None) -> Tuple[Optional[str], Dict[str, str], str, List[Dict[str, str]]]:
+    """
+    Recueille le profil de l'étudiant: à partir d'une session chargée (réponses
+    reprises ou mises à jour) ou d'un nouvel entretien.
+    
+    Returns:
+        Tuple: (identifiant de session ou None, informations personnelles,
+                profil étudiant, réponses d'entretien)
+    """
+    session_id = None
+    if user_data:
+        # Utiliser les données précédentes pour les réponses uniquement
+        session_id = user_data.get("metadata", {}).get("session_id")
+        personal_info = user_data.get("personal_info", {})
+        previous_responses = user_data.get("interview_responses", [])
+        
+        # Demander à l'utilisateur s'il souhaite mettre à jour ses réponses
+        update_responses = input("\nSouhaitez-vous mettre à jour vos réponses précédentes ? (o/n): ").lower() in ['o', 'oui']
+        
+        if not update_responses:
+            # Utiliser le profil précédent mais avec les nouvelles informations scrapées
+            student_info_data = user_data.get("student_info", "")
+            if not student_info_data:
+                print("Aucun profil étudiant trouvé dans la session précédente.")
+                print("Nous allons procéder à un nouvel entretien.")
+                student_info, interview_responses = interview_student(parcoursup_info, etablissement_info)
+            else:
+                # Utiliser les réponses précédentes avec les nouvelles informations sur le programme
+                student_info = build_student_info(previous_responses)
+                interview_responses = previous_responses
+        else:
+            # Faire un nouvel entretien avec les réponses précédentes
+            student_info, interview_responses = interview_student(parcoursup_info, etablissement_info, previous_responses)
+    else:
+        # Demander les informations personnelles
+        personal_info = ask_personal_info()
+        
+        # Entretien avec l'étudiant
+        student_info, interview_responses = interview_student(parcoursup_info, etablissement_info)
+    
+    return session_id, personal_info, student_info, interview_responses
+
+def prepare_models():
+    """Configure Gemini une seule fois et prépare les modèles utilisés par le pipeline"""
+    gemini_clients.configure(API_KEY)
+    gemini_clients.warm_up((model_name, {"temperature": t})
+                           for model_name in model_router.all_models() for t in PIPELINE_TEMPERATURES)
+
+def session_checkpoint(session_id: str) -> StageCheckpoint:
+    """Points de reprise des étapes d'une session (acquisition, entretien, brouillons, fusion, longueur)"""
+    return StageCheckpoint(f"session_{session_id}", SESSION_CHECKPOINT_DIR)
+
+def defer_generation(session_id, session_data, error) -> str:
+    """
+    Enregistre une session dont la génération a échoué (entretien et informations
+    du programme compris) pour qu'elle puisse être reprise plus tard.
+    """
+    if isinstance(error, CircuitOpenError):
+        print(f"\n🛑 L'API Gemini est momentanément indisponible: {error}")
+    else:
+        print(f"\n🛑 La génération des lettres a échoué: {error}")
+    
+    session_id = save_user_profile(dict(session_data, status="deferred", error=str(error)), session_id)
+    print(f"Vos réponses et les informations du programme ont été sauvegardées dans la session: {session_id}")
+    print("Relancez la génération plus tard en chargeant cette session.")
+    return "La génération a été reportée: relancez-la plus tard en chargeant la session sauvegardée."
+
 def run_direct_approach(parcoursup_url, etablissement_url):
-    # Configurer Gemini une seule fois
-    genai.configure(api_key=API_KEY)
+    prepare_models()
+    
+    # L'acquisition démarre en arrière-plan dès que les URLs sont connues,
+    # pour se dérouler pendant la sélection de session et l'entretien
+    acquisition = None
+    if parcoursup_url and etablissement_url:
+        acquisition = ProgramAcquisition(parcoursup_url, etablissement_url)
+    checkpoint = None
     
     try:
         # Vérifier l'état des quotas et afficher un avertissement si nécessaire
@@ -409,12 +657,22 @@ def run_direct_approach(parcoursup_url, etablissement_url):
         
         # Vérifier si l'utilisateur souhaite charger une session précédente
         user_data = load_previous_session()
-        previous_responses = None
-        session_id = None
-        personal_info = {}
         
-        # Demander les URLs à chaque fois, même avec une session chargée
-        print("\nPour générer une lettre de motivation, veuillez fournir les informations suivantes:")
+        # Une session interrompue (crash, quota, interruption) reprend là où elle s'est arrêtée
+        resume = False
+        if user_data and user_data.get("status") in INTERRUPTED_STATUSES:
+            checkpoint = session_checkpoint(user_data.get("metadata", {}).get("session_id"))
+            if checkpoint.get("interview") is not None:
+                resume = input("\nCette session n'a pas été terminée. Reprendre là où elle s'est arrêtée ? (o/n): ").lower() in ['o', 'oui']
+        
+        if resume:
+            # Reprendre les URLs de la session, sauf si d'autres ont été fournies
+            parcoursup_url = parcoursup_url or user_data.get("program_info", {}).get("url")
+            etablissement_url = etablissement_url or user_data.get("institution_info", {}).get("url")
+        
+        # Demander les URLs à chaque fois, même avec une session chargée (sauf reprise)
+        if not parcoursup_url or not etablissement_url:
+            print("\nPour générer une lettre de motivation, veuillez fournir les informations suivantes:")
         
         # Si l'URL est vide (appelé depuis launcher avec session), demander l'URL
         if not parcoursup_url:
@@ -423,82 +681,75 @@ def run_direct_approach(parcoursup_url, etablissement_url):
         if not etablissement_url:
             etablissement_url = input("URL du site web de l'établissement : ")
         
-        # Scraper les nouvelles informations, même avec une session existante
-        print("\nRecherche d'informations sur Parcoursup...")
-        parcoursup_info = scrape_parcoursup(parcoursup_url)
-        
-        print("Recherche d'informations sur l'établissement...")
-        etablissement_info = scrape_etablissement(etablissement_url)
+        # Étape 1: Acquisition, reprise si les mêmes URLs ont déjà été traitées
+        acquisition_inputs = fingerprint(parcoursup_url, etablissement_url)
+        acquired = checkpoint.get("acquisition", acquisition_inputs) if resume else None
+        if acquired is not None:
+            print("\n✓ Informations sur le programme reprises de la session interrompue")
+            if acquisition is not None:
+                acquisition.cancel()
+                acquisition = None
+        elif acquisition is None:
+            # Scraper les nouvelles informations, même avec une session existante
+            # (les deux sources sont récupérées et enrichies en parallèle, en arrière-plan)
+            acquisition = ProgramAcquisition(parcoursup_url, etablissement_url)
+        if acquisition is not None:
+            print("\nRecherche d'informations sur Parcoursup et sur l'établissement (en arrière-plan)...")
         
-        if user_data:
-            # Utiliser les données précédentes pour les réponses uniquement
-            session_id = user_data.get("metadata", {}).get("session_id")
-            personal_info = user_data.get("personal_info", {})
-            previous_responses = user_data.get("interview_responses", [])
-            
-            # Demander à l'utilisateur s'il souhaite mettre à jour ses réponses
-            update_responses = input("\nSouhaitez-vous mettre à jour vos réponses précédentes ? (o/n): ").lower() in ['o', 'oui']
-            
-            if not update_responses:
-                # Utiliser le profil précédent mais avec les nouvelles informations scrapées
-                student_info_data = user_data.get("student_info", "")
-                if not student_info_data:
-                    print("Aucun profil étudiant trouvé dans la session précédente.")
-                    print("Nous allons procéder à un nouvel entretien.")
-                    student_info, interview_responses = interview_student(parcoursup_info, etablissement_info)
-                else:
-                    # Utiliser les réponses précédentes avec les nouvelles informations sur le programme
-                    student_profile = []
-                    for resp in previous_responses:
-                        student_profile.append(f"Question: {resp['question']}\nRéponse: {resp['answer']}")
-                    student_info = "\n\n".join(student_profile)
-                    interview_responses = previous_responses
-            else:
-                # Faire un nouvel entretien avec les réponses précédentes
-                student_info, interview_responses = interview_student(parcoursup_info, etablissement_info, previous_responses)
-                
-            # Pour les lettres, toujours générer de nouvelles versions avec les informations mises à jour
-            regenerate = True
+        # Étape 2: Entretien (les informations ne sont pas encore disponibles pendant l'entretien)
+        if resume:
+            profile = checkpoint.get("interview")["output"]
+            session_id = user_data["metadata"]["session_id"]
+            personal_info = profile["personal_info"]
+            student_info = profile["student_info"]
+            interview_responses = profile["interview_responses"]
+            print("✓ Entretien repris de la session interrompue")
         else:
-            # Demander les informations personnelles
-            personal_info = ask_personal_info()
-            
-            # Étape 2: Entretien avec l'étudiant
-            student_info, interview_responses = interview_student(parcoursup_info, etablissement_info)
-            
-            regenerate = True
+            session_id, personal_info, student_info, interview_responses = collect_student_profile(
+                user_data, None, None)
+            # Identifiant attribué dès maintenant: les étapes suivantes sont enregistrées sous ce nom
+            session_id = session_id or new_session_id()
+            checkpoint = session_checkpoint(session_id)
+            checkpoint.record("interview", {
+                "personal_info": personal_info,
+                "student_info": student_info,
+                "interview_responses": interview_responses,
+            })
         
-        # Étape 3: Génération des lettres (toujours régénérer avec les nouvelles informations)
-        if regenerate:
-            print("\nGénération de la première version de lettre (formelle)...")
-            letter1 = generate_formal_letter(parcoursup_info, etablissement_info, student_info)
-            print(f"✓ Lettre formelle générée: {len(letter1)} caractères")
-            
-            print("Génération de la seconde version de lettre (créative)...")
-            letter2 = generate_creative_letter(parcoursup_info, etablissement_info, student_info)
-            print(f"✓ Lettre créative générée: {len(letter2)} caractères")
-            
-            # Étape 4: Fusion des lettres
-            print("Optimisation et fusion des deux lettres...\n")
-            final_letter = fusion_letters(letter1, letter2)
-            print(f"✓ Lettre finale générée: {len(final_letter)} caractères")
+        # Session visible (et reprenable) dès la fin de l'entretien, puis mise à jour après
+        # l'acquisition; les lettres d'une session déjà terminée sont conservées jusqu'à
+        # leur remplacement
+        previous_letters = {field: user_data[field] for field in ("letter1", "letter2", "final_letter")
+                            if user_data and user_data.get(field)}
+        if not resume:
+            save_user_profile(dict(previous_letters,
+                                   personal_info=personal_info,
+                                   student_info=student_info,
+                                   interview_responses=interview_responses,
+                                   program_info={"url": parcoursup_url},
+                                   institution_info={"url": etablissement_url},
+                                   status="in_progress"), session_id)
+        
+        # Pour les lettres, toujours générer de nouvelles versions avec les informations mises à jour
+        regenerate = True
+        
+        if acquired is not None:
+            parcoursup_info, etablissement_info = acquired["output"]
         else:
-            # Ce cas ne devrait plus se produire, mais le code est conservé par sécurité
-            letter1 = user_data["letter1"]
-            letter2 = user_data["letter2"]
-            final_letter = user_data["final_letter"]
-            print("\nUtilisation des lettres précédemment générées.")
+            # Attendre uniquement ce qui reste de l'acquisition
+            if not acquisition.done():
+                print("\nFinalisation de la recherche d'informations...")
+            parcoursup_info, etablissement_info = acquisition.result()
+            if all(is_usable_info(info) for info in (parcoursup_info, etablissement_info)):
+                checkpoint.record("acquisition", [parcoursup_info, etablissement_info], inputs=acquisition_inputs)
         
-        # Sauvegarder la session utilisateur
+        # Informations de la session, enregistrées même si la génération échoue
         session_data = {
             "personal_info": personal_info,
             "parcoursup_info": parcoursup_info,
             "etablissement_info": etablissement_info,
             "student_info": student_info,
             "interview_responses": interview_responses,
-            "letter1": letter1,
-            "letter2": letter2,
-            "final_letter": final_letter,
             "program_info": {
                 "url": parcoursup_url,
                 "name": extract_program_name(parcoursup_info)
@@ -508,10 +759,50 @@ def run_direct_approach(parcoursup_url, etablissement_url):
                 "name": extract_institution_name(etablissement_info)
             }
         }
+        save_user_profile(dict(previous_letters, **session_data, status="in_progress"), session_id)
+        
+        # Étape 3: Génération des lettres (toujours régénérer avec les nouvelles informations);
+        # chaque étape terminée est enregistrée, et une étape dont les entrées
+        # n'ont pas changé n'est pas recalculée lors d'une reprise
+        if regenerate:
+            try:
+                print("\nGénération des deux versions de lettre (formelle et créative) en parallèle...")
+                letter1, letter2 = generate_drafts(parcoursup_info, etablissement_info, student_info, checkpoint)
+                print(f"✓ Lettre formelle générée: {len(letter1)} caractères")
+                print(f"✓ Lettre créative générée: {len(letter2)} caractères")
+                
+                # Étape 4: Fusion des lettres
+                print("Optimisation et fusion des deux lettres...\n")
+                fused_letter = checkpoint.run("fusion", fusion_letters, letter1, letter2, fit_length=False,
+                                              inputs=fingerprint(letter1, letter2), accept=is_usable_letter)
+                
+                # Étape 5: Ajustement de la longueur
+                final_letter = checkpoint.run("length_fit", adjust_letter_length, fused_letter, 1490,
+                                              inputs=fingerprint(fused_letter), accept=is_usable_letter)
+                print(f"✓ Lettre finale générée: {len(final_letter)} caractères")
+            except GeminiError as e:
+                # Ne pas enchaîner des appels voués à l'échec: reporter la génération
+                return defer_generation(session_id, session_data, e)
+        else:
+            # Ce cas ne devrait plus se produire, mais le code est conservé par sécurité
+            letter1 = user_data["letter1"]
+            letter2 = user_data["letter2"]
+            final_letter = user_data["final_letter"]
+            print("\nUtilisation des lettres précédemment générées.")
+        
+        # Sauvegarder la session utilisateur
+        session_data.update({
+            "letter1": letter1,
+            "letter2": letter2,
+            "final_letter": final_letter,
+        })
         
         session_id = save_user_profile(session_data, session_id)
         print(f"\nVos informations ont été sauvegardées dans la session: {session_id}")
         
+        # Session terminée: ses points de reprise ne servent plus
+        checkpoint.discard()
+        
         # Affichage du résultat
         print("\n\n########################")
         print("## Votre Lettre de Motivation:")
@@ -526,9 +817,140 @@ def run_direct_approach(parcoursup_url, etablissement_url):
         
         return cleaned_letter
     
+    except KeyboardInterrupt:
+        print("\nProcessus interrompu.")
+        if checkpoint is not None and checkpoint.get("interview") is not None:
+            print("Les étapes terminées sont sauvegardées: chargez la session pour reprendre.")
+        return "Le processus a été interrompu."
     except Exception as e:
         print(f"Une erreur s'est produite pendant le processus: {e}")
         return "Le processus a rencontré une erreur et n'a pas pu être complété."
+    finally:
+        # Ne pas lancer d'enrichissement si le processus s'arrête avant la génération
+        if acquisition is not None and not acquisition.done():
+            acquisition.cancel()
+
+def ask_url_pairs(max_pairs: int = MAX_APPLICATIONS) -> List[Tuple[str, str]]:
+    """Demande les URLs (programme, établissement) de chaque candidature"""
+    print(f"\nIndiquez jusqu'à {max_pairs} candidatures (laissez l'URL Parcoursup vide pour terminer).")
+    pairs = []
+    while len(pairs) < max_pairs:
+        number = len(pairs) + 1
+        parcoursup_url = input(f"\n[{number}] URL Parcoursup du programme : ").strip()
+        if not parcoursup_url:
+            break
+        etablissement_url = input(f"[{number}] URL du site web de l'établissement : ").strip()
+        pairs.append((parcoursup_url, etablissement_url))
+    return pairs
+
+def run_multi_application(url_pairs: Optional[List[Tuple[str, str]]] = None) -> List[str]:
+    """
+    Génère les lettres de plusieurs candidatures à partir d'un seul entretien.
+    Les acquisitions démarrent toutes en arrière-plan, puis les lettres sont générées
+    en parallèle avec le même profil étudiant; tous les résultats sont enregistrés
+    dans une seule session.
+    
+    Args:
+        url_pairs: Couples (URL Parcoursup, URL de l'établissement); demandés si absents
+    
+    Returns:
+        list: Lettres finales nettoyées, dans l'ordre des candidatures réussies
+    """
+    prepare_models()
+    
+    acquisitions = []
+    if url_pairs:
+        if len(url_pairs) > MAX_APPLICATIONS:
+            print(f"⚠️ Seules les {MAX_APPLICATIONS} premières candidatures seront traitées.")
+        url_pairs = list(url_pairs)[:MAX_APPLICATIONS]
+        acquisitions = [ProgramAcquisition(p_url, e_url) for p_url, e_url in url_pairs]
+    
+    try:
+        user_data = load_previous_session()
+        
+        if not url_pairs:
+            url_pairs = ask_url_pairs()
+            if not url_pairs:
+                print("Aucune candidature indiquée.")
+                return []
+            acquisitions = [ProgramAcquisition(p_url, e_url) for p_url, e_url in url_pairs]
+        print(f"\nRecherche d'informations pour {len(url_pairs)} candidature(s) (en arrière-plan)...")
+        
+        # Un seul entretien, dont le profil sert à toutes les candidatures
+        session_id, personal_info, student_info, interview_responses = collect_student_profile(user_data)
+        
+        def generate_application(index):
+            parcoursup_url, etablissement_url = url_pairs[index]
+            parcoursup_info, etablissement_info = acquisitions[index].result()
+            # Les candidatures sont servies à tour de rôle par l'ordonnanceur
+            with scheduling(owner=f"{session_id}:{index}"):
+                letter1, letter2 = generate_drafts(parcoursup_info, etablissement_info, student_info)
+                final_letter = fusion_letters(letter1, letter2)
+            print(f"✓ Candidature {index + 1}: lettre finale de {len(final_letter)} caractères")
+            return {
+                "parcoursup_info": parcoursup_info,
+                "etablissement_info": etablissement_info,
+                "letter1": letter1,
+                "letter2": letter2,
+                "final_letter": final_letter,
+                "program_info": {
+                    "url": parcoursup_url,
+                    "name": extract_program_name(parcoursup_info)
+                },
+                "institution_info": {
+                    "url": etablissement_url,
+                    "name": extract_institution_name(etablissement_info)
+                }
+            }
+        
+        print(f"\nGénération des lettres pour {len(url_pairs)} candidature(s)...")
+        with ThreadPoolExecutor(max_workers=APPLICATION_CONCURRENCY, thread_name_prefix="candidature") as executor:
+            # Chaque candidature hérite du contexte de l'appelant (clé API, ordonnancement)
+            futures = [executor.submit(contextvars.copy_context().run, generate_application, index)
+                       for index in range(len(url_pairs))]
+        
+        applications = []
+        for index, future in enumerate(futures):
+            try:
+                applications.append(future.result())
+            except Exception as e:
+                print(f"❌ Candidature {index + 1} ({url_pairs[index][0]}): {e}")
+        
+        if not applications:
+            print("Aucune lettre n'a pu être générée.")
+            return []
+        
+        # La première candidature reste au premier niveau pour les outils
+        # qui ne connaissent que les sessions à un seul programme
+        session_data = {
+            "personal_info": personal_info,
+            "student_info": student_info,
+            "interview_responses": interview_responses,
+            **applications[0],
+            "applications": applications,
+        }
+        session_id = save_user_profile(session_data, session_id)
+        print(f"\nVos informations ont été sauvegardées dans la session: {session_id}")
+        
+        letters = []
+        for application in applications:
+            cleaned_letter = clean_letter_text(application["final_letter"])
+            letters.append(cleaned_letter)
+            print("\n\n########################")
+            print(f"## {application['program_info']['name']} - {application['institution_info']['name']}")
+            print("########################\n")
+            print(cleaned_letter)
+        
+        save_letters_to_files(letters)
+        return letters
+    
+    except Exception as e:
+        print(f"Une erreur s'est produite pendant le processus: {e}")
+        return []
+    finally:
+        for acquisition in acquisitions:
+            if not acquisition.done():
+                acquisition.cancel()
 
 def extract_program_name(parcoursup_info):
     """Extrait le nom du programme depuis les informations Parcoursup"""
@@ -574,6 +996,28 @@ def save_letter_to_file(letter):
         print(f"Erreur lors de la sauvegarde: {e}")
         print("La lettre n'a pas pu être sauvegardée.")
 
+def save_letters_to_files(letters):
+    """Sauvegarde plusieurs lettres dans des fichiers numérotés"""
+    try:
+        save_option = input("\nVoulez-vous sauvegarder ces lettres dans des fichiers? (o/n): ").lower()
+        if save_option in ['o', 'oui']:
+            try:
+                basename = input("Préfixe des fichiers: ").strip() or "lettre_motivation"
+            except Exception:
+                basename = "lettre_motivation"
+                print(f"Erreur lors de la saisie du préfixe. Utilisation de: {basename}")
+            
+            if basename.endswith('.txt'):
+                basename = basename[:-4]
+            for index, letter in enumerate(letters, 1):
+                filename = f"{basename}_{index}.txt"
+                with open(filename, 'w', encoding='utf-8') as file:
+                    file.write(letter)
+                print(f"Lettre sauvegardée dans {filename}")
+    except Exception as e:
+        print(f"Erreur lors de la sauvegarde: {e}")
+        print("Les lettres n'ont pas pu être sauvegardées.")
+
 def clean_letter_text(letter_text):
     """
     Nettoie le texte de la lettre pour ne garder que le contenu principal.
@@ -615,10 +1059,11 @@ def scrape_parcoursup(url):
     """Scrape les informations de Parcoursup de manière plus approfondie"""
     from tools.scraping_tools import scrape_parcoursup as basic_scrape
     
-    # Récupérer les informations de base
-    basic_info = basic_scrape(url)
-    
-    # Enrichir avec des informations supplémentaires
+    # Récupérer les informations de base puis les enrichir
+    return enrich_parcoursup_info(basic_scrape(url))
+
+def enrich_parcoursup_info(basic_info):
+    """Enrichit les informations Parcoursup extraites avec Gemini"""
     enrichment_prompt = dedent(f"""
     Voici des informations extraites d'une page Parcoursup:
     {basic_info}
@@ -635,19 +1080,23 @@ def scrape_parcoursup(url):
     """)
     
     try:
-        enriched_info = generate_text(enrichment_prompt, temperature=0.3)
-        return basic_info + "\n\nInformations enrichies:\n" + enriched_info
-    except:
+        enriched_info = generate_text(enrichment_prompt, temperature=0.3, call_site="enrichment")
+        return basic_info + ENRICHMENT_HEADER + enriched_info
+    except Exception as e:
+        # Les informations extraites restent utilisables, mais ne sont pas conservées
+        # comme résultat définitif (voir is_usable_info)
+        print(f"⚠️ Enrichissement impossible, informations extraites utilisées telles quelles: {e}")
         return basic_info
 
 def scrape_etablissement(url):
     """Scrape les informations de l'établissement de manière plus approfondie"""
     from tools.scraping_tools import scrape_etablissement as basic_scrape
     
-    # Récupérer les informations de base
-    basic_info = basic_scrape(url)
-    
-    # Enrichir avec des informations supplémentaires
+    # Récupérer les informations de base puis les enrichir
+    return enrich_etablissement_info(basic_scrape(url))
+
+def enrich_etablissement_info(basic_info):
+    """Enrichit les informations de l'établissement extraites avec Gemini"""
     enrichment_prompt = dedent(f"""
     Voici des informations extraites du site d'un établissement d'enseignement:
     {basic_info}
@@ -664,11 +1113,107 @@ def scrape_etablissement(url):
     """)
     
     try:
-        enriched_info = generate_text(enrichment_prompt, temperature=0.3)
-        return basic_info + "\n\nInformations enrichies:\n" + enriched_info
-    except:
+        enriched_info = generate_text(enrichment_prompt, temperature=0.3, call_site="enrichment")
+        return basic_info + ENRICHMENT_HEADER + enriched_info
+    except Exception as e:
+        # Les informations extraites restent utilisables, mais ne sont pas conservées
+        # comme résultat définitif (voir is_usable_info)
+        print(f"⚠️ Enrichissement impossible, informations extraites utilisées telles quelles: {e}")
         return basic_info
 
+class ProgramAcquisition:
+    """
+    Acquisition concurrente des informations sur le programme et l'établissement.
+    - Les deux chaînes (récupération, extraction, enrichissement) s'exécutent en parallèle
+    - Chaque chaîne dispose de son propre délai maximum, qui ne court qu'à partir
+      du moment où l'appelant attend le résultat (result())
+    - Une chaîne annulée ou hors délai n'appelle pas l'enrichissement et
+      renvoie ce qui a déjà été extrait
+    """
+    
+    def __init__(self, parcoursup_url: str, etablissement_url: str, timeout: Optional[float] = None):
+        """
+        Démarre les deux chaînes d'acquisition.
+        
+        Args:
+            parcoursup_url: URL Parcoursup du programme
+            etablissement_url: URL du site de l'établissement
+            timeout: Délai maximum (en secondes) accordé à chaque chaîne une fois son résultat attendu
+        """
+        from tools.scraping_tools import scrape_parcoursup as basic_parcoursup
+        from tools.scraping_tools import scrape_etablissement as basic_etablissement
+        
+        self.timeout = timeout if timeout is not None else ACQUISITION_TIMEOUT
+        # Échéance fixée au premier appel de result(): l'acquisition anticipée n'est pas limitée
+        self._deadline: Optional[float] = None
+        self._partial: Dict[str, str] = {}
+        self._cancel_events = {"parcoursup": threading.Event(), "etablissement": threading.Event()}
+        # Propriétaire des appels d'enrichissement de chaque chaîne (pour les annuler)
+        self._owners = {name: f"acquisition:{id(self)}:{name}" for name in self._cancel_events}
+        
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="acquisition")
+        self._futures = {
+            "parcoursup": executor.submit(contextvars.copy_context().run, self._run_chain, "parcoursup",
+                                          basic_parcoursup, enrich_parcoursup_info, parcoursup_url),
+            "etablissement": executor.submit(contextvars.copy_context().run, self._run_chain, "etablissement",
+                                             basic_etablissement, enrich_etablissement_info, etablissement_url),
+        }
+        # Les threads se terminent d'eux-mêmes: ne pas bloquer sur leur fin
+        executor.shutdown(wait=False)
+    
+    def _run_chain(self, name, basic_scrape, enrich, url) -> str:
+        """Exécute une chaîne: récupération et extraction, puis enrichissement"""
+        basic_info = basic_scrape(url)
+        self._partial[name] = basic_info
+        if self._cancel_events[name].is_set():
+            return basic_info
+        # L'enrichissement n'attend pas une place au-delà du délai de la chaîne; avant que
+        # le résultat soit attendu, pas d'échéance: une requête encore en file à l'échéance
+        # est retirée par cancel()
+        with scheduling(owner=self._owners[name], deadline=self._deadline):
+            return enrich(basic_info)
+    
+    def cancel(self, name: Optional[str] = None) -> None:
+        """Annule une chaîne (ou les deux): l'enrichissement ne sera pas lancé"""
+        for chain_name in ([name] if name else list(self._futures)):
+            self._cancel_events[chain_name].set()
+            self._futures[chain_name].cancel()
+            # Retirer l'appel d'enrichissement s'il attend encore une place
+            llm_scheduler.cancel(self._owners[chain_name])
+    
+    def done(self) -> bool:
+        """Indique si les deux chaînes sont terminées"""
+        return all(future.done() for future in self._futures.values())
+    
+    def _chain_result(self, name: str) -> str:
+        remaining = max(0.0, self._deadline - time.monotonic())
+        try:
+            return self._futures[name].result(timeout=remaining)
+        except FutureTimeoutError:
+            print(f"⚠️ Délai dépassé pour la recherche d'informations ({name}).")
+        except CancelledError:
+            pass
+        except Exception as e:
+            print(f"Erreur lors de la recherche d'informations ({name}): {e}")
+        self.cancel(name)
+        return self._partial.get(name) or ACQUISITION_FALLBACKS[name]
+    
+    def result(self) -> Tuple[str, str]:
+        """
+        Attend la fin des deux chaînes (ou leur délai).
+        
+        Returns:
+            Tuple[str, str]: (informations Parcoursup, informations établissement)
+        """
+        if self._deadline is None:
+            self._deadline = time.monotonic() + self.timeout
+        return self._chain_result("parcoursup"), self._chain_result("etablissement")
+
+def acquire_program_info(parcoursup_url: str, etablissement_url: str,
+                         timeout: Optional[float] = None) -> Tuple[str, str]:
+    """Récupère et enrichit en parallèle les informations du programme et de l'établissement"""
+    return ProgramAcquisition(parcoursup_url, etablissement_url, timeout).result()
+
 # Point d'entrée si exécuté directement
 if __name__ == "__main__":
     print("## Bienvenue dans le Système de Génération de Lettres de Motivation")
@@ -0,0 +1,358 @@
+"""
+Registre des clients Gemini partagés par tout le processus.
+Les objets GenerativeModel sont construits une seule fois par couple
+(modèle, configuration de génération) puis réutilisés à chaque appel.
+Avec un pool de clés API, chaque clé dispose de ses propres modèles et
+de son propre client de service.
+
+Les échecs sont convertis en erreurs typées (GeminiError) et chaque modèle
+est protégé par un disjoncteur qui refuse les appels voués à l'échec.
+
+Le SDK google-generativeai (long à importer) n'est chargé qu'à la première
+configuration, c'est-à-dire au premier vrai appel au modèle.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from decouple import config
+
+from quota_manager import active_api_key, is_quota_error, is_timeout_error
+
+
+def _sdk():
+    """Modules du SDK Gemini (importés au premier appel, puis mis en cache par Python)"""
+    import google.generativeai as genai
+    import google.ai.generativelanguage as glm
+    return genai, glm
+
+
+class GeminiError(Exception):
+    """Échec d'un appel à l'API Gemini"""
+
+    # Les échecs transitoires (délai, service) comptent pour le disjoncteur
+    transient = True
+    # La requête a été envoyée à l'API (et doit être comptabilisée)
+    sent = True
+
+
+class GeminiQuotaError(GeminiError):
+    """
+    Quota ou limite de débit atteint (429).
+    Le service répond: le disjoncteur n'en tient pas compte, le gestionnaire de
+    quota et le routeur s'en chargent (changement de clé, puis de modèle).
+    """
+
+
+class GeminiTimeoutError(GeminiError):
+    """Délai dépassé côté API"""
+
+
+class GeminiServiceError(GeminiError):
+    """Service indisponible ou erreur inattendue (5xx, connexion)"""
+
+
+class GeminiRequestError(GeminiError):
+    """Requête refusée pour elle-même (argument invalide, contenu bloqué)"""
+
+    transient = False
+
+
+class CircuitOpenError(GeminiError):
+    """Appel refusé sans être envoyé: le disjoncteur du modèle est ouvert"""
+
+    sent = False
+
+
+def classify_error(error: Exception) -> GeminiError:
+    """Convertit une exception du SDK en erreur typée (le message d'origine est conservé)"""
+    if isinstance(error, GeminiError):
+        return error
+    if is_quota_error(error):
+        return GeminiQuotaError(str(error))
+    if is_timeout_error(error):
+        return GeminiTimeoutError(str(error))
+    error_msg = str(error).lower()
+    if any(marker in error_msg for marker in ("400", "invalid argument", "blocked", "safety", "finish_reason")):
+        return GeminiRequestError(str(error))
+    return GeminiServiceError(str(error))
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'un modèle.
+    - Fermé: les appels passent; failure_threshold échecs transitoires consécutifs l'ouvrent
+    - Ouvert: les appels sont refusés immédiatement (CircuitOpenError) pendant reset_timeout
+    - Semi-ouvert: un appel d'essai passe; son succès referme le disjoncteur,
+      son échec le rouvre pour une nouvelle période
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            name: Nom du modèle protégé
+            failure_threshold: Nombre d'échecs consécutifs avant ouverture
+            reset_timeout: Durée (en secondes) d'ouverture avant un appel d'essai
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Autorise un appel ou le refuse.
+
+        Raises:
+            CircuitOpenError: Le disjoncteur est ouvert (ou un appel d'essai est déjà en cours)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probe_started = None
+            # Un seul appel d'essai à la fois (un essai abandonné est remplacé après reset_timeout)
+            if self.state == "half_open" and (self._probe_started is None
+                                              or now - self._probe_started >= self.reset_timeout):
+                self._probe_started = now
+                return
+            remaining = max(0.0, self.opened_at + self.reset_timeout - now)
+        raise CircuitOpenError(f"Disjoncteur ouvert pour {self.name} après {self.failures} échecs "
+                               f"consécutifs (nouvel essai dans {remaining:.0f}s)")
+
+    def is_open(self) -> bool:
+        """Indique, sans réserver d'appel d'essai, si before_call refuserait un appel maintenant"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == "closed":
+                return False
+            if self.state == "open":
+                return now - self.opened_at < self.reset_timeout
+            return self._probe_started is not None and now - self._probe_started < self.reset_timeout
+
+    def release(self) -> None:
+        """Appel terminé sans renseigner sur l'état du service (erreur de quota): libère l'essai en cours"""
+        with self._lock:
+            if self.state == "half_open":
+                self._probe_started = None
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                print(f"✓ {self.name} répond de nouveau: disjoncteur refermé")
+            self.state = "closed"
+            self.failures = 0
+            self._probe_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                if self.state == "closed":
+                    print(f"⚠️ {self.name}: {self.failures} échecs consécutifs, disjoncteur ouvert "
+                          f"pour {self.reset_timeout:.0f}s")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probe_started = None
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+def default_api_key() -> str:
+    """Clé API par défaut: GOOGLE_API_KEY, ou la première de GOOGLE_API_KEYS"""
+    return config("GOOGLE_API_KEY", default="") or config("GOOGLE_API_KEYS", default="").split(",")[0].strip()
+
+
+class KeyedModel:
+    """
+    Modèle Gemini lié à une clé API précise.
+    genai.configure ne porte qu'une clé par processus: les autres clés du pool passent
+    par leur propre GenerativeServiceClient, avec la même interface que GenerativeModel
+    (generate_content(prompt).text).
+    """
+
+    def __init__(self, model_name: str, generation_config: Optional[Dict[str, Any]], client):
+        """
+        Args:
+            model_name: Nom du modèle Gemini
+            generation_config: Configuration de génération (température...)
+            client: Client de service construit avec la clé API
+        """
+        self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        self.generation_config = dict(generation_config or {})
+        self.client = client
+
+    def generate_content(self, prompt: str) -> "KeyedResponse":
+        """Envoie le prompt au modèle avec le client de la clé"""
+        _, glm = _sdk()
+        request = glm.GenerateContentRequest(
+            model=self.model_name,
+            contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])],
+            generation_config=glm.GenerationConfig(**self.generation_config),
+        )
+        return KeyedResponse(self.client.generate_content(request=request))
+
+
+class KeyedResponse:
+    """Réponse d'un KeyedModel (texte du premier candidat, comme GenerateContentResponse.text)"""
+
+    def __init__(self, response):
+        self.response = response
+
+    @property
+    def text(self) -> str:
+        if not self.response.candidates:
+            raise ValueError(f"Requête bloquée par le modèle: {self.response.prompt_feedback}")
+        candidate = self.response.candidates[0]
+        if not candidate.content.parts:
+            raise ValueError(f"Réponse sans texte (finish_reason: {candidate.finish_reason})")
+        return "".join(part.text for part in candidate.content.parts)
+
+
+class GeminiClientRegistry:
+    """
+    Registre thread-safe des modèles Gemini.
+    - Configure l'API une seule fois
+    - Construit chaque GenerativeModel une seule fois par (modèle, configuration, clé)
+    - Utilise la clé choisie par le pool de clés (active_api_key) pour la requête en cours:
+      la clé configurée passe par GenerativeModel, chaque autre clé par un KeyedModel
+      et son propre client de service
+    - Peut préchauffer les modèles au démarrage
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self._models: Dict[Tuple[str, str, str], Any] = {}
+        self._service_clients: Dict[str, Any] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._configured = False
+        self._api_key: Optional[str] = None
+
+    def configure(self, api_key: Optional[str] = None) -> None:
+        """Configure l'API Gemini (une seule fois par processus)"""
+        with self._lock:
+            if not self._configured:
+                genai, _ = _sdk()
+                self._api_key = api_key or default_api_key()
+                genai.configure(api_key=self._api_key)
+                self._configured = True
+
+    @staticmethod
+    def _key(model_name: str, generation_config: Optional[Dict[str, Any]],
+             api_key: Optional[str] = None) -> Tuple[str, str, str]:
+        key_id = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8] if api_key else ""
+        return model_name, json.dumps(generation_config or {}, sort_keys=True), key_id
+
+    def _service_client(self, api_key: str):
+        """Client de service propre à une clé API (appelé sous verrou)"""
+        client = self._service_clients.get(api_key)
+        if client is None:
+            _, glm = _sdk()
+            client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+            self._service_clients[api_key] = client
+        return client
+
+    def get_model(self, model_name: str, generation_config: Optional[Dict[str, Any]] = None,
+                  api_key: Optional[str] = None):
+        """
+        Retourne le modèle associé à (model_name, generation_config), créé à la demande.
+
+        Args:
+            model_name: Nom du modèle Gemini
+            generation_config: Configuration de génération (température...)
+            api_key: Clé API à utiliser (clé configurée si None)
+        """
+        self.configure()
+        if api_key == self._api_key:
+            api_key = None
+
+        key = self._key(model_name, generation_config, api_key)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                if api_key:
+                    model = KeyedModel(model_name, generation_config, self._service_client(api_key))
+                else:
+                    genai, _ = _sdk()
+                    model = genai.GenerativeModel(model_name, generation_config=dict(generation_config or {}))
+                self._models[key] = model
+        return model
+
+    def breaker(self, model_name: str) -> CircuitBreaker:
+        """Disjoncteur associé à un modèle"""
+        with self._lock:
+            breaker = self._breakers.get(model_name)
+            if breaker is None:
+                breaker = CircuitBreaker(model_name, self.failure_threshold, self.reset_timeout)
+                self._breakers[model_name] = breaker
+        return breaker
+
+    def breaker_status(self) -> Dict[str, Dict[str, Any]]:
+        """État des disjoncteurs de chaque modèle"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.status() for breaker in breakers}
+
+    def generate(self, model_name: str, prompt: str,
+                 generation_config: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Génère du texte avec un modèle du registre (et la clé choisie pour la requête en cours).
+        Chaque tentative passe par le disjoncteur du modèle, qui reçoit son résultat.
+
+        Raises:
+            CircuitOpenError: Le disjoncteur du modèle refuse l'appel
+            GeminiError: Erreur typée selon la cause de l'échec
+        """
+        breaker = self.breaker(model_name)
+        breaker.before_call()
+        try:
+            model = self.get_model(model_name, generation_config, api_key=active_api_key.get())
+            response = model.generate_content(prompt)
+            text = response.text
+        except Exception as e:
+            error = classify_error(e)
+            if isinstance(error, GeminiQuotaError):
+                # Les 429 relèvent du quota, pas d'une panne du service
+                breaker.release()
+            elif error.transient:
+                breaker.record_failure()
+            else:
+                # Une requête refusée pour elle-même montre que le service répond
+                breaker.record_success()
+            raise error from e
+        breaker.record_success()
+        return text
+
+    def warm_up(self, specs: Iterable[Tuple[str, Optional[Dict[str, Any]]]]) -> None:
+        """
+        Construit à l'avance les modèles utilisés par le pipeline.
+
+        Args:
+            specs: Couples (nom du modèle, configuration de génération)
+        """
+        for model_name, generation_config in specs:
+            self.get_model(model_name, generation_config)
+
+
+# Instance globale pour faciliter l'importation
+gemini_clients = GeminiClientRegistry(
+    failure_threshold=config("CIRCUIT_FAILURE_THRESHOLD", default=5, cast=int),
+    reset_timeout=config("CIRCUIT_RESET_TIMEOUT", default=30.0, cast=float),
+)
@@ -10,7 +10,6 @@ from textwrap import dedent
 
 try:
     from decouple import config
-    from quota_manager import quota_manager
 except ImportError:
     print("\n❌ ERROR: The 'decouple' module is not installed.")
     print("Please install it using one of the following commands:")
@@ -21,6 +20,9 @@ except ImportError:
 def check_quota_status():
     """Vérifie l'état des quotas et affiche un rapport"""
     try:
+        # Importé ici: le gestionnaire de quota n'est chargé qu'une fois les questions
+        # du lanceur posées, juste avant la génération
+        from quota_manager import quota_manager
         report = quota_manager.get_usage_report()
         print("\n--- ÉTAT DE L'UTILISATION API ---")
         print(f"Requêtes totales: {report['total_requests']}")
@@ -58,25 +60,39 @@ def main():
 └─────────────────────────────────────────────────────┘
 """)
 
-    # Vérifier l'état des quotas
-    check_quota_status()
+    # Mode multi-candidatures: un seul entretien pour plusieurs programmes
+    if "--multi" in sys.argv[1:]:
+        try:
+            from direct_approach import run_multi_application
+            check_quota_status()
+            print("\nMode multi-candidatures: un entretien, une lettre par programme.")
+            return 0 if run_multi_application() else 1
+        except ImportError:
+            print("\n❌ ERROR: Could not import the required modules.")
+            print("Please install all dependencies using one of the following commands:")
+            print("    pip install -r requirements.txt")
+            print("    or")
+            print("    poetry install\n")
+            return 1
 
     # Exécuter directement l'approche qui fonctionne
     try:
-        # Importer ici pour pouvoir vérifier l'existence de sessions
-        from user_session import get_available_sessions
-        from direct_approach import run_direct_approach
+        # Importer ici pour pouvoir vérifier l'existence de sessions; direct_approach
+        # (client Gemini, quotas, cache, routeur) n'est chargé qu'après les questions
+        from user_session import count_sessions
         
-        # Vérifier si des sessions existent déjà
-        sessions = get_available_sessions()
+        # Vérifier si des sessions existent déjà (lecture de l'index uniquement)
+        session_count = count_sessions()
         
-        if sessions:
-            print(f"\nNous avons trouvé {len(sessions)} session(s) précédente(s).")
+        if session_count:
+            print(f"\nNous avons trouvé {session_count} session(s) précédente(s).")
             choice = input("Souhaitez-vous reprendre une session existante, ou en créer une nouvelle ? (e/n): ").lower()
             
             if choice in ['e', 'existante', 'oui', 'o']:
                 # L'utilisateur sera redirigé vers l'interface de choix de session dans run_direct_approach
                 print("\nRedirection vers les sessions existantes...")
+                check_quota_status()
+                from direct_approach import run_direct_approach
                 # Appeler run_direct_approach avec des URLs vides - elles seront demandées à l'utilisateur dans la fonction
                 run_direct_approach("", "")
                 return 0
@@ -88,7 +104,10 @@ def main():
         parcoursup_url = input("URL Parcoursup du programme: ")
         etablissement_url = input("URL du site web de l'établissement: ")
 
+        # Vérifier l'état des quotas avant de lancer la génération
+        check_quota_status()
         print("\nLancement du générateur de lettres de motivation...\n")
+        from direct_approach import run_direct_approach
         run_direct_approach(parcoursup_url, etablissement_url)
         return 0
     except ImportError:
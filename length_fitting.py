@@ -0,0 +1,160 @@
+"""
+Ajustement local de la longueur des lettres.
+Raccourcit une lettre en retirant des phrases ou des incises entières,
+sans appel au modèle et sans jamais couper un mot.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Écart toléré (en caractères) autour de la longueur cible
+LENGTH_TOLERANCE = 30
+
+# Part minimale de la longueur cible conservée par une coupe en fin de phrase
+# (sinon en fin de mot, sinon au caractère près)
+MIN_BOUNDARY_RATIO = 0.8
+
+# Une phrase: du premier caractère non blanc jusqu'à la ponctuation finale
+_SENTENCE = re.compile(r'\S.*?(?:[.!?…]+["»)]*(?=\s|$)|$)')
+# Incise entre deux virgules, ou entre parenthèses
+_COMMA_CLAUSE = re.compile(r',\s[^,.;:!?()]{8,}?(?=,)')
+_PAREN_CLAUSE = re.compile(r'\s\([^()]{3,}\)')
+
+Span = Tuple[int, int]
+
+
+def within_tolerance(text: str, target: int, tolerance: int = LENGTH_TOLERANCE) -> bool:
+    """Indique si la longueur du texte est acceptable"""
+    return abs(len(text) - target) <= tolerance
+
+
+def _normalize(text: str) -> str:
+    """Nettoie les espaces laissés par les suppressions"""
+    text = re.sub(r'[ \t]{2,}', ' ', text)
+    text = re.sub(r'[ \t]+([,.;:!?])', r'\1', text)
+    text = re.sub(r'[ \t]+\n', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def _sentence_spans(text: str) -> List[Span]:
+    """Retourne les positions des phrases, espaces suivants compris"""
+    spans = []
+    for match in _SENTENCE.finditer(text):
+        end = match.end()
+        while end < len(text) and text[end] in " \t":
+            end += 1
+        spans.append((match.start(), end))
+    return spans
+
+
+def removable_units(text: str) -> List[Tuple[Span, Optional[int]]]:
+    """
+    Liste les segments qui peuvent être retirés sans casser la structure:
+    - les phrases, sauf la première et la dernière de la lettre
+    - les incises entre virgules ou entre parenthèses
+    Chaque segment est accompagné du numéro de son paragraphe (None pour une incise).
+    """
+    sentences = _sentence_spans(text)
+    units: List[Tuple[Span, Optional[int]]] = []
+
+    for index, (start, end) in enumerate(sentences):
+        sentence = text[start:end]
+        for pattern in (_COMMA_CLAUSE, _PAREN_CLAUSE):
+            for match in pattern.finditer(sentence):
+                units.append(((start + match.start(), start + match.end()), None))
+
+        if index not in (0, len(sentences) - 1):
+            units.append(((start, end), text.count("\n", 0, start)))
+
+    return units
+
+
+def _paragraph_sizes(text: str) -> Dict[int, int]:
+    """Nombre de phrases par paragraphe (identifié par son numéro de ligne)"""
+    sizes: Dict[int, int] = {}
+    for start, _ in _sentence_spans(text):
+        line = text.count("\n", 0, start)
+        sizes[line] = sizes.get(line, 0) + 1
+    return sizes
+
+
+def _apply(text: str, removed: List[Span]) -> str:
+    pieces = []
+    position = 0
+    for start, end in sorted(removed):
+        pieces.append(text[position:start])
+        position = end
+    pieces.append(text[position:])
+    return _normalize("".join(pieces))
+
+
+def _overlaps(span: Span, removed: List[Span]) -> bool:
+    return any(span[0] < end and start < span[1] for start, end in removed)
+
+
+def trim_to_length(text: str, target: int, tolerance: int = LENGTH_TOLERANCE) -> Optional[str]:
+    """
+    Raccourcit le texte en retirant des phrases ou des incises complètes.
+
+    Returns:
+        str or None: Texte dans la tolérance, ou None si aucune combinaison
+        de suppressions ne permet de l'atteindre
+    """
+    text = _normalize(text)
+    lower, upper = target - tolerance, target + tolerance
+    if len(text) <= upper:
+        return text if len(text) >= lower else None
+
+    units = removable_units(text)
+    remaining = _paragraph_sizes(text)
+    removed: List[Span] = []
+    current = text
+
+    while len(current) > upper:
+        best: Optional[Tuple[int, Span, Optional[int], str]] = None
+        for unit, paragraph in units:
+            if _overlaps(unit, removed):
+                continue
+            # Ne jamais vider un paragraphe
+            if paragraph is not None and remaining[paragraph] <= 1:
+                continue
+            candidate = _apply(text, removed + [unit])
+            if len(candidate) < lower:
+                continue
+            # Dans la tolérance: choisir la suppression la plus proche de la cible;
+            # sinon: retirer le plus grand segment possible
+            score = abs(len(candidate) - target) if len(candidate) <= upper else len(candidate)
+            if best is None or score < best[0]:
+                best = (score, unit, paragraph, candidate)
+        if best is None:
+            return None
+        _, unit, paragraph, current = best
+        removed.append(unit)
+        if paragraph is not None:
+            remaining[paragraph] -= 1
+
+    return current
+
+
+def truncate_at_boundary(text: str, max_length: int) -> str:
+    """
+    Coupe le texte à la dernière fin de phrase avant max_length, ou à la dernière
+    fin de mot si cette phrase s'arrête trop tôt (moins de MIN_BOUNDARY_RATIO × max_length);
+    coupe franchement à max_length si aucune fin de mot n'est assez proche
+    """
+    text = _normalize(text)
+    if len(text) <= max_length:
+        return text
+    head = text[:max_length]
+    # Le caractère suivant est inclus: une phrase qui se termine pile à la limite est conservée
+    last_sentence = max(text[:max_length + 1].rfind(mark) for mark in (". ", "! ", "? ", ".\n", "!\n", "?\n"))
+    if last_sentence + 1 >= max_length * MIN_BOUNDARY_RATIO:
+        return head[:last_sentence + 1].rstrip()
+    last_space = head.rfind(" ")
+    if last_space < max_length * MIN_BOUNDARY_RATIO:
+        # Un « mot » démesuré (lien, texte sans espaces) occupe la fin: seule une coupe franche
+        # conserve l'essentiel du texte
+        return head
+    cut = head[:last_space].rstrip(" ,;:")
+    return cut if cut.endswith((".", "!", "?")) else cut + "."
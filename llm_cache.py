@@ -0,0 +1,148 @@
+"""
+Cache persistant des réponses Gemini, adressé par contenu.
+Une réponse est retrouvée à partir de l'empreinte du modèle, de la configuration
+de génération et du prompt normalisé.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from decouple import config
+
+from tools.disk_cache import DiskCache
+
+# Dossier de stockage du cache des réponses
+LLM_CACHE_DIR = "llm_cache"
+
+# Politiques par point d'appel:
+# - enabled: mise en cache par défaut
+# - ttl: durée de validité d'une réponse (en secondes)
+# - max_temperature: au-delà, la réponse n'est pas mise en cache (sauf demande explicite)
+CACHE_POLICIES: Dict[str, Dict[str, Any]] = {
+    "enrichment": {"enabled": True, "ttl": 7 * 24 * 3600, "max_temperature": 0.5},
+    "length": {"enabled": False, "ttl": 24 * 3600, "max_temperature": 0.5},
+    "draft": {"enabled": False, "ttl": 24 * 3600, "max_temperature": 1.0},
+    "fusion": {"enabled": False, "ttl": 24 * 3600, "max_temperature": 1.0},
+    "default": {"enabled": True, "ttl": 24 * 3600, "max_temperature": 0.3},
+}
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Supprime les différences d'indentation et d'espaces sans effet sur le sens"""
+    lines = [" ".join(line.split()) for line in prompt.strip().splitlines()]
+    return "\n".join(lines)
+
+
+class PromptCache:
+    """
+    Cache des réponses du modèle.
+    - Clé: SHA-256 de (modèle, configuration de génération, prompt normalisé)
+    - Politique par point d'appel (appels factuels en cache, brouillons créatifs non)
+    - Durée de validité et éviction LRU bornée en taille
+    - Compteurs de succès/échecs de lecture
+    """
+
+    def __init__(self, directory: str = LLM_CACHE_DIR, max_bytes: int = 50 * 1024 * 1024,
+                 policies: Optional[Dict[str, Dict[str, Any]]] = None, enabled: bool = True):
+        """
+        Initialise le cache.
+
+        Args:
+            directory: Dossier de stockage
+            max_bytes: Taille maximale du cache avant éviction LRU
+            policies: Politiques par point d'appel (CACHE_POLICIES par défaut)
+            enabled: Active ou désactive complètement le cache
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.policies = policies or CACHE_POLICIES
+        self.enabled = enabled
+        self._store: Optional[DiskCache] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def store(self) -> DiskCache:
+        # Le dossier n'est parcouru qu'au premier usage du cache
+        with self._lock:
+            if self._store is None:
+                self._store = DiskCache(self.directory, max_bytes=self.max_bytes)
+            return self._store
+
+    def policy(self, call_site: str) -> Dict[str, Any]:
+        """Retourne la politique applicable à un point d'appel"""
+        return self.policies.get(call_site, self.policies["default"])
+
+    def should_use(self, call_site: str, temperature: float, use_cache: Optional[bool] = None) -> bool:
+        """
+        Indique si un appel doit passer par le cache.
+
+        Args:
+            call_site: Point d'appel ('enrichment', 'draft', 'fusion', 'length'...)
+            temperature: Température de génération de l'appel
+            use_cache: True pour forcer, False pour contourner le cache sur cet appel
+        """
+        if not self.enabled or use_cache is False:
+            return False
+        if use_cache:
+            return True
+        policy = self.policy(call_site)
+        return policy["enabled"] and temperature <= policy["max_temperature"]
+
+    @staticmethod
+    def make_key(model_name: str, generation_config: Dict[str, Any], prompt: str) -> str:
+        """Calcule la clé d'une requête"""
+        payload = json.dumps({
+            "model": model_name,
+            "config": generation_config,
+            "prompt": normalize_prompt(prompt),
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, call_site: str = "default") -> Optional[str]:
+        """Retourne la réponse en cache si elle existe et n'a pas expiré"""
+        cached = self.store.get(key)
+        if cached is not None:
+            meta, body = cached
+            if time.time() - meta.get("created_at", 0) < self.policy(call_site)["ttl"]:
+                with self._lock:
+                    self.hits += 1
+                return body.decode("utf-8")
+            self.store.delete(key)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, response_text: str, call_site: str = "default") -> None:
+        """Enregistre une réponse"""
+        meta = {"call_site": call_site, "created_at": time.time()}
+        self.store.put(key, meta, response_text.encode("utf-8"))
+
+    def clear(self) -> None:
+        """Vide le cache"""
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les compteurs du cache"""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": len(self.store),
+            "bytes": self.store.total_bytes,
+        }
+
+
+# Instance globale pour faciliter l'importation
+llm_cache = PromptCache(
+    directory=config("LLM_CACHE_DIR", default=LLM_CACHE_DIR),
+    max_bytes=config("LLM_CACHE_MAX_MB", default=50, cast=int) * 1024 * 1024,
+    enabled=config("LLM_CACHE_ENABLED", default=True, cast=bool),
+)
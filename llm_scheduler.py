@@ -0,0 +1,242 @@
+"""
+Ordonnanceur des appels au modèle.
+Toutes les générations passent par un nombre limité de places; lorsque le budget
+est saturé, la place suivante revient à la requête la plus prioritaire, et à
+priorité égale, chaque propriétaire (session, candidature, travail de lot) est
+servi à tour de rôle.
+"""
+
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from quota_manager import ConcurrencyLimiter, quota_manager
+
+# Classes de priorité, de la plus urgente à la moins urgente
+PRIORITY_CLASSES = ("interactive", "fusion", "draft", "enrichment", "batch")
+
+# Classe par défaut de chaque étape du pipeline
+STAGE_PRIORITIES = {
+    "fusion": "fusion",
+    "length": "fusion",
+    "draft": "draft",
+    "enrichment": "enrichment",
+}
+
+# Contexte de la requête en cours (propagé aux threads via contextvars.copy_context)
+request_priority: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_priority", default=None)
+request_owner: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_owner", default=None)
+request_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+_holding_slot: contextvars.ContextVar[bool] = contextvars.ContextVar("_holding_slot", default=False)
+
+
+class RequestCancelled(Exception):
+    """La requête a été annulée avant d'obtenir une place"""
+
+
+class DeadlineExceeded(Exception):
+    """L'échéance de la requête est passée avant qu'elle obtienne une place"""
+
+
+@contextmanager
+def scheduling(priority: Optional[str] = None, owner: Optional[str] = None,
+               deadline: Optional[float] = None) -> Iterator[None]:
+    """
+    Définit la priorité, le propriétaire et l'échéance des appels faits dans ce contexte.
+
+    Args:
+        priority: Classe de priorité (voir PRIORITY_CLASSES)
+        owner: Propriétaire des requêtes (partage équitable et annulation)
+        deadline: Échéance absolue (time.monotonic()) au-delà de laquelle attendre est inutile
+    """
+    if priority is not None and priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Classe de priorité inconnue: {priority}")
+    tokens = []
+    if priority is not None:
+        tokens.append((request_priority, request_priority.set(priority)))
+    if owner is not None:
+        tokens.append((request_owner, request_owner.set(owner)))
+    if deadline is not None:
+        tokens.append((request_deadline, request_deadline.set(deadline)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ScheduledRequest:
+    """Requête en attente d'une place"""
+
+    def __init__(self, priority: str, owner: str, deadline: Optional[float]):
+        self.priority = priority
+        self.owner = owner
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.state = "queued"
+        self.granted = threading.Event()
+
+    def expired(self, now: float) -> bool:
+        return self.deadline is not None and now >= self.deadline
+
+
+class LLMScheduler:
+    """
+    Ordonnanceur à priorités devant le gestionnaire de quota.
+    - Au plus `limiter.current()` appels en cours: la limite adaptative du gestionnaire
+      de quota augmente tant que les réponses sont rapides et baisse dès les premières 429
+    - Les places libérées vont à la classe la plus prioritaire qui attend
+    - Dans une classe, les propriétaires sont servis à tour de rôle
+    - Une requête en attente peut être annulée (par propriétaire) ou expirer à son échéance
+    """
+
+    def __init__(self, limiter: Optional[ConcurrencyLimiter] = None):
+        """
+        Args:
+            limiter: Limite (adaptative) des appels simultanés
+        """
+        self.limiter = limiter or ConcurrencyLimiter()
+        self._lock = threading.Lock()
+        self._queues: Dict[str, "OrderedDict[str, Deque[ScheduledRequest]]"] = {
+            priority: OrderedDict() for priority in PRIORITY_CLASSES
+        }
+        self._running = 0
+        self._stats: Dict[str, Dict[str, Any]] = {
+            priority: {"completed": 0, "cancelled": 0, "expired": 0, "max_wait": 0.0}
+            for priority in PRIORITY_CLASSES
+        }
+
+    def resolve_priority(self, stage: Optional[str] = None) -> str:
+        """Classe d'une requête: celle du contexte, sinon celle de l'étape"""
+        return request_priority.get() or STAGE_PRIORITIES.get(stage or "", "interactive")
+
+    def _capacity(self) -> int:
+        return self.limiter.current()
+
+    def _dispatch(self) -> None:
+        """Attribue les places libres aux requêtes en attente (appelé sous verrou)"""
+        now = time.monotonic()
+        for priority in PRIORITY_CLASSES:
+            owners = self._queues[priority]
+            while owners and self._running < self._capacity():
+                owner, queue = next(iter(owners.items()))
+                request = queue.popleft()
+                # Tour de rôle: le propriétaire servi passe en fin de file
+                if queue:
+                    owners.move_to_end(owner)
+                else:
+                    del owners[owner]
+                if request.expired(now):
+                    request.state = "expired"
+                    self._stats[priority]["expired"] += 1
+                else:
+                    request.state = "running"
+                    self._running += 1
+                    stats = self._stats[priority]
+                    stats["max_wait"] = max(stats["max_wait"], round(now - request.enqueued, 3))
+                request.granted.set()
+            if self._running >= self._capacity():
+                return
+
+    def _remove(self, request: ScheduledRequest) -> None:
+        """Retire une requête de sa file (appelé sous verrou)"""
+        owners = self._queues[request.priority]
+        queue = owners.get(request.owner)
+        if queue is not None and request in queue:
+            queue.remove(request)
+            if not queue:
+                del owners[request.owner]
+
+    def acquire(self, priority: str, owner: Optional[str] = None,
+                deadline: Optional[float] = None) -> ScheduledRequest:
+        """
+        Attend une place pour un appel.
+
+        Raises:
+            RequestCancelled: La requête a été annulée pendant l'attente
+            DeadlineExceeded: L'échéance est passée pendant l'attente
+        """
+        request = ScheduledRequest(priority, owner or "default", deadline)
+        with self._lock:
+            self._queues[priority].setdefault(request.owner, deque()).append(request)
+            self._dispatch()
+
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not request.granted.wait(timeout):
+            with self._lock:
+                if request.state == "queued":
+                    self._remove(request)
+                    request.state = "expired"
+                    self._stats[priority]["expired"] += 1
+        if request.state == "cancelled":
+            raise RequestCancelled(f"Requête annulée ({priority}, {request.owner})")
+        if request.state == "expired":
+            raise DeadlineExceeded(f"Échéance dépassée avant l'appel au modèle ({priority}, {request.owner})")
+        return request
+
+    def release(self, request: ScheduledRequest) -> None:
+        """Libère la place d'un appel terminé"""
+        with self._lock:
+            self._running -= 1
+            self._stats[request.priority]["completed"] += 1
+            request.state = "done"
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, stage: Optional[str] = None) -> Iterator[None]:
+        """
+        Occupe une place pendant un appel, selon le contexte de la requête.
+        Un appel imbriqué dans un autre réutilise sa place.
+        """
+        if _holding_slot.get():
+            yield
+            return
+        request = self.acquire(self.resolve_priority(stage), request_owner.get(), request_deadline.get())
+        token = _holding_slot.set(True)
+        try:
+            yield
+        finally:
+            _holding_slot.reset(token)
+            self.release(request)
+
+    def run(self, stage: Optional[str], func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Exécute func dès qu'une place est attribuée à la requête"""
+        with self.slot(stage):
+            return func(*args, **kwargs)
+
+    def cancel(self, owner: str) -> int:
+        """
+        Annule les requêtes en attente d'un propriétaire (les appels en cours continuent).
+
+        Returns:
+            int: Nombre de requêtes annulées
+        """
+        cancelled = 0
+        with self._lock:
+            for priority, owners in self._queues.items():
+                for request in owners.pop(owner, ()):
+                    request.state = "cancelled"
+                    request.granted.set()
+                    self._stats[priority]["cancelled"] += 1
+                    cancelled += 1
+        return cancelled
+
+    def status(self) -> Dict[str, Any]:
+        """État de l'ordonnanceur: places, files d'attente et statistiques par classe"""
+        with self._lock:
+            return {
+                "limit": self._capacity(),
+                "running": self._running,
+                "queued": {
+                    priority: sum(len(queue) for queue in owners.values())
+                    for priority, owners in self._queues.items()
+                },
+                "classes": {priority: dict(stats) for priority, stats in self._stats.items()},
+            }
+
+
+# Instance globale pour faciliter l'importation
+llm_scheduler = LLMScheduler(quota_manager.concurrency)
@@ -0,0 +1,221 @@
+"""
+Routage des appels au modèle selon l'étape du pipeline.
+Chaque étape dispose d'une liste ordonnée de modèles: le premier est utilisé
+par défaut, les suivants servent de repli lorsque le quota du modèle est épuisé
+ou que ses réponses deviennent trop lentes.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from decouple import config
+
+from gemini_client import CircuitOpenError, gemini_clients
+from llm_scheduler import llm_scheduler
+from quota_manager import quota_manager, estimate_tokens, is_quota_error
+
+# Modèles par étape, du préféré au dernier recours
+DEFAULT_MODEL_ROUTES = {
+    "enrichment": ["gemini-1.5-flash", "gemini-pro"],
+    "length": ["gemini-1.5-flash", "gemini-pro"],
+    "draft": ["gemini-pro", "gemini-1.5-flash"],
+    "fusion": ["gemini-pro", "gemini-1.5-flash"],
+    "default": ["gemini-pro", "gemini-1.5-flash"],
+}
+
+
+def parse_model_routes(spec: str) -> Dict[str, List[str]]:
+    """
+    Lit une politique de routage au format "étape=modèle|modèle;étape=modèle".
+
+    Exemple: "draft=gemini-pro|gemini-1.5-flash;enrichment=gemini-1.5-flash"
+    """
+    routes: Dict[str, List[str]] = {}
+    for entry in spec.split(";"):
+        if not entry.strip():
+            continue
+        try:
+            stage, models = entry.split("=", 1)
+            names = [name.strip() for name in models.split("|") if name.strip()]
+            if not names:
+                raise ValueError("aucun modèle")
+            routes[stage.strip()] = names
+        except ValueError as e:
+            print(f"Route de modèle ignorée ({entry!r}): {e}")
+    return routes
+
+
+class ModelRouter:
+    """
+    Choisit le modèle de chaque appel et bascule sur le suivant en cas de problème.
+    - Erreur de quota (429): le modèle est écarté pendant demotion_period et l'appel
+      est immédiatement rejoué sur le modèle suivant de la route
+    - Réponse plus lente que latency_threshold: le modèle est écarté pour les appels
+      suivants (la réponse obtenue est conservée)
+    - Disjoncteur du modèle ouvert: l'appel passe directement au modèle suivant
+    - Chaque décision (modèle utilisé, repli et motif) est enregistrée dans les
+      statistiques d'utilisation
+    """
+
+    def __init__(self, routes: Optional[Dict[str, List[str]]] = None,
+                 latency_threshold: float = 30.0, demotion_period: float = 60.0):
+        """
+        Args:
+            routes: Modèles par étape (DEFAULT_MODEL_ROUTES si None)
+            latency_threshold: Durée (s) au-delà de laquelle un modèle est jugé trop lent
+            demotion_period: Durée (s) pendant laquelle un modèle écarté n'est plus choisi en premier
+        """
+        self.routes = dict(DEFAULT_MODEL_ROUTES)
+        self.routes.update(routes or {})
+        self.latency_threshold = latency_threshold
+        self.demotion_period = demotion_period
+        self._demoted: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def route(self, stage: str) -> List[str]:
+        """Modèles configurés pour une étape, du préféré au dernier recours"""
+        return list(self.routes.get(stage) or self.routes["default"])
+
+    def primary(self, stage: str) -> str:
+        """Modèle préféré d'une étape (utilisé aussi pour les clés de cache)"""
+        return self.route(stage)[0]
+
+    def all_models(self) -> List[str]:
+        """Tous les modèles mentionnés par la politique de routage"""
+        models: List[str] = []
+        for names in self.routes.values():
+            models.extend(name for name in names if name not in models)
+        return models
+
+    def _demote(self, model_name: str, reason: str) -> None:
+        with self._lock:
+            self._demoted[model_name] = {"until": time.time() + self.demotion_period, "reason": reason}
+
+    def _demotion(self, model_name: str) -> Optional[str]:
+        """Motif pour lequel un modèle est écarté, ou None s'il est disponible"""
+        with self._lock:
+            demotion = self._demoted.get(model_name)
+            if demotion is None:
+                return None
+            if demotion["until"] <= time.time():
+                del self._demoted[model_name]
+                return None
+            return demotion["reason"]
+
+    def candidates(self, stage: str, models: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        Ordre d'essai des modèles pour un appel: les modèles disponibles d'abord,
+        les modèles écartés ensuite (en dernier recours).
+        """
+        names = list(models) if models else self.route(stage)
+        available = [name for name in names if self._demotion(name) is None]
+        return available + [name for name in names if name not in available]
+
+    def generate(self, stage: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                 models: Optional[Sequence[str]] = None) -> str:
+        """
+        Génère du texte pour une étape en suivant sa route.
+
+        Args:
+            stage: Étape du pipeline ('enrichment', 'draft', 'fusion', 'length'...)
+            prompt: Texte envoyé au modèle
+            generation_config: Configuration de génération (température...)
+            models: Route explicite (remplace celle de l'étape)
+
+        Returns:
+            str: Texte généré
+
+        Raises:
+            GeminiError: La dernière erreur si aucun modèle n'a pu répondre
+            (CircuitOpenError si tous les disjoncteurs sont ouverts)
+        """
+        return self.generate_with_model(stage, prompt, generation_config, models)[0]
+
+    def generate_with_model(self, stage: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                            models: Optional[Sequence[str]] = None) -> Tuple[str, str]:
+        """
+        Comme generate, mais indique aussi le modèle qui a répondu (un modèle de repli
+        si le premier de la route a été écarté).
+
+        Returns:
+            tuple: (texte généré, nom du modèle qui l'a produit)
+        """
+        # L'ordonnanceur attribue une place selon la priorité de la requête;
+        # la cascade de repli s'exécute entièrement dans cette place
+        with llm_scheduler.slot(stage):
+            return self._generate(stage, prompt, generation_config, models)
+
+    def _generate(self, stage: str, prompt: str, generation_config: Optional[Dict[str, Any]],
+                  models: Optional[Sequence[str]]) -> Tuple[str, str]:
+        names = list(models) if models else self.route(stage)
+        order = self.candidates(stage, names)
+        token_estimate = estimate_tokens(prompt)
+        # Les modèles écartés avant l'appel expliquent un éventuel repli
+        reason = self._demotion(names[0])
+
+        for index, model_name in enumerate(order):
+            is_last = index == len(order) - 1
+            started = time.monotonic()
+            try:
+                # Un modèle dont le disjoncteur est ouvert n'est pas appelé du tout
+                # (chaque tentative repasse par le disjoncteur dans gemini_clients.generate)
+                if gemini_clients.breaker(model_name).is_open():
+                    raise CircuitOpenError(f"Disjoncteur ouvert pour {model_name}")
+                # Seul le dernier modèle épuise les tentatives du gestionnaire de quota;
+                # les autres cèdent la place dès la première erreur de quota
+                # (après avoir essayé chaque clé API du pool)
+                text = quota_manager.handle_request(
+                    gemini_clients.generate, model_name, prompt, generation_config,
+                    model_name=model_name, token_estimate=token_estimate,
+                    max_retries=None if is_last else max(len(quota_manager.key_pool or ()) - 1, 0)
+                )
+            except CircuitOpenError:
+                if is_last:
+                    raise
+                reason = "circuit"
+                continue
+            except Exception as e:
+                if is_last or not is_quota_error(e):
+                    raise
+                print(f"⚠️ Quota épuisé pour {model_name} ({stage}), repli sur {order[index + 1]}")
+                self._demote(model_name, "quota")
+                reason = "quota"
+                continue
+
+            elapsed = time.monotonic() - started
+            if elapsed > self.latency_threshold and not is_last:
+                print(f"⚠️ {model_name} a mis {elapsed:.1f}s à répondre ({stage}), "
+                      f"les prochains appels passeront par {order[index + 1]}")
+                self._demote(model_name, "latency")
+
+            fallback_from = names[0] if model_name != names[0] else None
+            quota_manager.record_routing(stage, model_name, fallback_from=fallback_from,
+                                         reason=(reason or "quota") if fallback_from else None)
+            return text, model_name
+
+        raise CircuitOpenError(f"Aucun modèle disponible pour l'étape {stage}")
+
+    def status(self) -> Dict[str, Any]:
+        """Routes configurées et modèles actuellement écartés"""
+        now = time.time()
+        with self._lock:
+            demoted = {
+                name: {"reason": demotion["reason"], "remaining": round(demotion["until"] - now, 1)}
+                for name, demotion in self._demoted.items() if demotion["until"] > now
+            }
+        routes = {stage: list(models) for stage, models in self.routes.items()}
+        return {"routes": routes, "demoted": demoted}
+
+
+def create_model_router() -> ModelRouter:
+    """Construit le routeur à partir de MODEL_ROUTES et MODEL_LATENCY_THRESHOLD"""
+    return ModelRouter(
+        routes=parse_model_routes(config("MODEL_ROUTES", default="")),
+        latency_threshold=config("MODEL_LATENCY_THRESHOLD", default=30.0, cast=float),
+        demotion_period=config("MODEL_DEMOTION_PERIOD", default=60.0, cast=float),
+    )
+
+
+# Instance globale pour faciliter l'importation
+model_router = create_model_router()
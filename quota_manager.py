@@ -3,19 +3,702 @@ Module de gestion des quotas pour l'API Gemini.
 Permet de contrôler l'utilisation de l'API et de gérer les erreurs de quota.
 """
 
+import atexit
+import hashlib
 import time
 import json
 import os
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import threading
 
+from decouple import config
+
+# Modèle auquel sont imputées les requêtes qui n'en précisent pas
+DEFAULT_MODEL = "gemini-pro"
+
+# Limites par défaut d'un modèle: requêtes/minute, jetons/minute, requêtes/jour
+DEFAULT_RATE_LIMITS = {"rpm": 60, "tpm": 120000, "rpd": 1500}
+
+# Durée de la fenêtre des limites par minute (en secondes)
+MINUTE_WINDOW = 60.0
+
+# Clé API à utiliser pour la requête en cours (choisie par le pool de clés)
+active_api_key: ContextVar[Optional[str]] = ContextVar("active_api_key", default=None)
+
+
+def parse_rate_limits(value: str) -> Dict[str, Dict[str, int]]:
+    """
+    Convertit 'gemini-pro=60/120000/1500,gemini-1.5-flash=15/1000000/1500'
+    en limites par modèle (requêtes/minute, jetons/minute, requêtes/jour).
+    """
+    limits = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        model_name, spec = item.split("=", 1)
+        rpm, tpm, rpd = (int(part) for part in spec.split("/"))
+        limits[model_name.strip()] = {"rpm": rpm, "tpm": tpm, "rpd": rpd}
+    return limits
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Indique si une exception correspond à une limite de quota (429)"""
+    error_msg = str(error).lower()
+    return "429" in error_msg or "quota" in error_msg or "rate limit" in error_msg
+
+
+def apply_routing_event(routing: Dict[str, Any], event: Dict[str, Any]) -> None:
+    """
+    Ajoute une décision de routage aux statistiques de routage:
+    modèle utilisé par étape, nombre de repli par motif et derniers replis.
+    """
+    by_stage = routing.setdefault("by_stage", {})
+    stage_counts = by_stage.setdefault(event["stage"], {})
+    stage_counts[event["model"]] = stage_counts.get(event["model"], 0) + 1
+    if event.get("fallback_from"):
+        fallbacks = routing.setdefault("fallbacks", {})
+        fallbacks[event["reason"]] = fallbacks.get(event["reason"], 0) + 1
+        recent = routing.setdefault("recent_fallbacks", [])
+        recent.append({key: event[key] for key in ("time", "stage", "fallback_from", "model", "reason")})
+        del recent[:-20]
+
+
+def apply_bucket_event(bucket_usage: Dict[str, Dict[str, int]], event: Dict[str, Any]) -> None:
+    """
+    Compte une requête dans l'utilisation quotidienne de son seau (modèle, ou
+    modèle@clé avec un pool de clés): chaque seau a son propre budget quotidien.
+    """
+    day = event["time"][:10]
+    per_bucket = bucket_usage.setdefault(day, {})
+    per_bucket[event["bucket"]] = per_bucket.get(event["bucket"], 0) + 1
+    # Seul le décompte du jour sert (niveau initial des budgets quotidiens)
+    for old_day in sorted(bucket_usage)[:-2]:
+        del bucket_usage[old_day]
+
+
+def is_timeout_error(error: Exception) -> bool:
+    """Indique si une exception correspond à un délai dépassé côté API"""
+    error_msg = str(error).lower()
+    return any(marker in error_msg for marker in ("timeout", "timed out", "deadline exceeded", "504"))
+
+
+def apply_concurrency_event(concurrency: Dict[str, Any], event: Dict[str, Any]) -> None:
+    """Ajoute un changement de limite de concurrence à l'historique (50 derniers)"""
+    concurrency["limit"] = event["limit"]
+    history = concurrency.setdefault("history", [])
+    history.append({key: event[key] for key in ("time", "limit", "reason")})
+    del history[:-50]
+
+
+def estimate_tokens(prompt: str, expected_output_tokens: int = 600) -> int:
+    """Estime le nombre de jetons d'une requête (environ 4 caractères par jeton)"""
+    return len(prompt) // 4 + expected_output_tokens
+
+
+class TokenBucket:
+    """
+    Seau à jetons avec réservation.
+    Une réservation est toujours acceptée: le niveau peut devenir négatif, et
+    l'appelant attend le temps nécessaire pour que le seau revienne à zéro.
+    Les appelants concurrents sont ainsi servis dans l'ordre de leurs réservations.
+    """
+    
+    def __init__(self, capacity: float, refill_per_second: float, level: Optional[float] = None):
+        """
+        Args:
+            capacity: Nombre maximum de jetons disponibles d'un coup
+            refill_per_second: Jetons ajoutés par seconde
+            level: Niveau initial (plein par défaut)
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.level = capacity if level is None else level
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated)
+        self.level = min(self.capacity, self.level + elapsed * self.refill_per_second)
+        self.updated = now
+    
+    def reserve(self, amount: float, now: float) -> float:
+        """Réserve des jetons et retourne le délai d'attente avant de pouvoir les utiliser"""
+        self._refill(now)
+        self.level -= amount
+        return -self.level / self.refill_per_second if self.level < 0 else 0.0
+    
+    def block_for(self, seconds: float, now: float) -> None:
+        """Vide le seau pour qu'aucune réservation ne soit servie avant `seconds`"""
+        self._refill(now)
+        self.level = min(self.level, -seconds * self.refill_per_second)
+
+
+class RateLimiter:
+    """
+    Limitation proactive du débit par modèle.
+    - Trois seaux par modèle: requêtes/minute, jetons/minute, requêtes/jour
+    - Chaque requête réserve sa part dans les trois seaux et attend exactement
+      le temps nécessaire pour rester sous les limites
+    """
+    
+    def __init__(self, limits: Optional[Dict[str, Dict[str, int]]] = None,
+                 default_limits: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            limits: Limites par modèle ({'rpm', 'tpm', 'rpd'})
+            default_limits: Limites des modèles non listés
+        """
+        self.limits = limits or {}
+        self.default_limits = default_limits or DEFAULT_RATE_LIMITS
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._lock = threading.Lock()
+    
+    def bucket_specs(self, model_name: str, requests_today: int = 0) -> Dict[str, Tuple[float, float, float]]:
+        """Capacité, débit de recharge et niveau initial de chaque seau d'un modèle"""
+        limits = {**self.default_limits, **self.limits.get(model_name, {})}
+        return {
+            "rpm": (limits["rpm"], limits["rpm"] / MINUTE_WINDOW, limits["rpm"]),
+            "tpm": (limits["tpm"], limits["tpm"] / MINUTE_WINDOW, limits["tpm"]),
+            # Les requêtes déjà faites aujourd'hui sont déduites du budget quotidien
+            "rpd": (limits["rpd"], limits["rpd"] / 86400.0, max(0, limits["rpd"] - requests_today)),
+        }
+    
+    def _buckets_for(self, model_name: str, requests_today: int = 0) -> Dict[str, TokenBucket]:
+        buckets = self._buckets.get(model_name)
+        if buckets is None:
+            buckets = {
+                name: TokenBucket(capacity, rate, level=level)
+                for name, (capacity, rate, level) in self.bucket_specs(model_name, requests_today).items()
+            }
+            self._buckets[model_name] = buckets
+        return buckets
+    
+    def reserve(self, model_name: str, tokens: int = 0, requests_today: int = 0) -> float:
+        """
+        Réserve une requête (et ses jetons) pour un modèle.
+        
+        Args:
+            model_name: Modèle appelé
+            tokens: Nombre de jetons estimé pour la requête
+            requests_today: Requêtes déjà faites aujourd'hui (première utilisation du modèle)
+        
+        Returns:
+            float: Délai (en secondes) à attendre avant d'envoyer la requête
+        """
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._buckets_for(model_name, requests_today)
+            waits = [buckets["rpm"].reserve(1, now), buckets["rpd"].reserve(1, now)]
+            if tokens:
+                waits.append(buckets["tpm"].reserve(tokens, now))
+        return max(waits)
+    
+    def available(self, model_name: str, requests_today: int = 0) -> float:
+        """Nombre de requêtes disponibles immédiatement pour un modèle (négatif si en attente)"""
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._buckets_for(model_name, requests_today)
+            for bucket in buckets.values():
+                bucket._refill(now)
+            return min(buckets["rpm"].level, buckets["rpd"].level)
+    
+    def block(self, model_name: str, seconds: float) -> None:
+        """Suspend les requêtes vers un modèle (après une erreur 429)"""
+        now = time.monotonic()
+        with self._lock:
+            self._buckets_for(model_name)["rpm"].block_for(seconds, now)
+    
+    def status(self) -> Dict[str, Dict[str, float]]:
+        """Niveau actuel des seaux de chaque modèle"""
+        now = time.monotonic()
+        with self._lock:
+            report = {}
+            for model_name, buckets in self._buckets.items():
+                for bucket in buckets.values():
+                    bucket._refill(now)
+                report[model_name] = {name: round(bucket.level, 1) for name, bucket in buckets.items()}
+            return report
+
+class ApiKey:
+    """État d'une clé API du pool"""
+    
+    def __init__(self, secret: str):
+        self.secret = secret
+        # Identifiant stable et non secret (utilisé pour les seaux et les rapports)
+        self.key_id = hashlib.sha256(secret.encode("utf-8")).hexdigest()[:8]
+        self.requests = 0
+        self.errors = 0
+        self.quota_errors = 0
+        self.error_rate = 0.0
+        self.consecutive_quota_errors = 0
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+
+
+class ApiKeyPool:
+    """
+    Pool de clés API avec répartition selon la marge disponible.
+    - Chaque clé a ses propres limites de débit (seaux dédiés par modèle)
+    - Une clé qui renvoie des erreurs 429 est retirée de la rotation pendant
+      une période de refroidissement (doublée à chaque erreur consécutive)
+    - Le taux d'erreur (moyenne mobile) pénalise les clés peu fiables
+    """
+    
+    def __init__(self, secrets: List[str], cooldown: float = MINUTE_WINDOW,
+                 max_cooldown: float = 600.0, error_smoothing: float = 0.2):
+        """
+        Args:
+            secrets: Clés API (les doublons sont ignorés)
+            cooldown: Durée de retrait d'une clé après une erreur 429 (en secondes)
+            max_cooldown: Durée maximale de retrait
+            error_smoothing: Poids d'une nouvelle requête dans le taux d'erreur
+        """
+        self.keys = [ApiKey(secret) for secret in dict.fromkeys(secrets)]
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.error_smoothing = error_smoothing
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    @staticmethod
+    def bucket_name(model_name: str, key: ApiKey) -> str:
+        """Nom des seaux d'un modèle pour une clé donnée"""
+        return f"{model_name}@{key.key_id}"
+    
+    def select(self, rate_limiter: RateLimiter, model_name: str,
+               requests_today: Optional[Dict[str, int]] = None) -> ApiKey:
+        """
+        Choisit la clé qui a le plus de marge pour un modèle.
+        Si toutes les clés sont en refroidissement, choisit celle qui en sort la première.
+        
+        Args:
+            requests_today: Requêtes déjà faites aujourd'hui par seau (modèle@clé)
+        """
+        requests_today = requests_today or {}
+        now = time.monotonic()
+        with self._lock:
+            available = [key for key in self.keys if key.cooldown_until <= now]
+            if not available:
+                key = min(self.keys, key=lambda k: k.cooldown_until)
+            else:
+                def score(key: ApiKey) -> float:
+                    bucket_name = self.bucket_name(model_name, key)
+                    headroom = rate_limiter.available(bucket_name, requests_today.get(bucket_name, 0))
+                    return headroom * (1 - key.error_rate) - key.in_flight
+                key = max(available, key=score)
+            key.in_flight += 1
+            return key
+    
+    def cooldown_remaining(self, key: ApiKey) -> float:
+        """Temps restant (en secondes) avant le retour d'une clé dans la rotation"""
+        return max(0.0, key.cooldown_until - time.monotonic())
+    
+    def release(self, key: ApiKey) -> None:
+        """Libère une clé choisie dont la requête n'a pas abouti (interruption, annulation)"""
+        with self._lock:
+            key.in_flight = max(0, key.in_flight - 1)
+    
+    def record(self, key: ApiKey, error: bool = False, quota_error: bool = False,
+               retry_after: Optional[float] = None) -> None:
+        """Enregistre le résultat d'une requête faite avec une clé"""
+        with self._lock:
+            key.in_flight = max(0, key.in_flight - 1)
+            key.requests += 1
+            key.errors += 1 if error else 0
+            key.error_rate += self.error_smoothing * ((1.0 if error else 0.0) - key.error_rate)
+            if quota_error:
+                key.quota_errors += 1
+                now = time.monotonic()
+                # Les requêtes déjà en vol quand la clé a été retirée ne prolongent pas le retrait
+                if key.cooldown_until <= now:
+                    key.consecutive_quota_errors += 1
+                    duration = retry_after or self.cooldown * 2 ** (key.consecutive_quota_errors - 1)
+                    key.cooldown_until = now + min(duration, self.max_cooldown)
+            elif not error:
+                key.consecutive_quota_errors = 0
+    
+    def status(self) -> List[Dict[str, Any]]:
+        """État de chaque clé (sans les secrets)"""
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "key_id": key.key_id,
+                "requests": key.requests,
+                "errors": key.errors,
+                "quota_errors": key.quota_errors,
+                "error_rate": round(key.error_rate, 3),
+                "cooldown_remaining": round(max(0.0, key.cooldown_until - now), 1),
+                "in_flight": key.in_flight,
+            } for key in self.keys]
+
+
+class ConcurrencyLimiter:
+    """
+    Limite adaptative du nombre d'appels simultanés (AIMD).
+    - Augmentation additive: +increase par fenêtre complète de réponses rapides
+      (environ +1 lorsque `limit` appels consécutifs ont réussi sous latency_target)
+    - Diminution multiplicative: limite × decrease après une erreur 429, un délai
+      dépassé ou une réponse plus lente que latency_target
+    - Une seule diminution par latence moyenne observée: les erreurs des appels
+      déjà en vol au moment de la saturation ne s'additionnent pas
+    """
+    
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 16,
+                 increase: float = 1.0, decrease: float = 0.5, latency_target: float = 20.0):
+        """
+        Args:
+            initial: Limite de départ
+            min_limit: Limite minimale
+            max_limit: Limite maximale
+            increase: Augmentation par fenêtre de réponses rapides
+            decrease: Facteur appliqué à la limite en cas de saturation
+            latency_target: Latence (en secondes) au-delà de laquelle une réponse signale une saturation
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.latency = None
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+    
+    def current(self) -> int:
+        """Nombre d'appels simultanés autorisés"""
+        return int(self.limit)
+    
+    def started(self) -> None:
+        """Signale le début d'un appel"""
+        with self._lock:
+            self.in_flight += 1
+    
+    def abandoned(self) -> None:
+        """Signale un appel refusé avant d'être envoyé (la limite ne change pas)"""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+    
+    def record(self, latency: Optional[float] = None, congestion: Optional[str] = None,
+               failed: bool = False) -> Optional[str]:
+        """
+        Enregistre la fin d'un appel et ajuste la limite.
+        Seul un appel réussi assez rapide augmente la limite; un échec sans motif de
+        saturation (erreur du service, requête invalide) la laisse inchangée.
+        
+        Args:
+            latency: Durée de l'appel (en secondes)
+            congestion: Motif de saturation ('quota', 'timeout'), None sinon
+            failed: True si l'appel a échoué
+        
+        Returns:
+            str or None: Motif du changement si la limite entière a changé
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if failed and congestion is None:
+                return None
+            if latency is not None:
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+                if congestion is None and latency > self.latency_target:
+                    congestion = "latency"
+            
+            previous = self.current()
+            now = time.monotonic()
+            if congestion is not None:
+                if now - self._last_decrease < (self.latency or self.latency_target):
+                    return None
+                self._last_decrease = now
+                self.limit = max(float(self.min_limit), self.limit * self.decrease)
+                reason = congestion
+            else:
+                self.limit = min(float(self.max_limit), self.limit + self.increase / self.limit)
+                reason = "increase"
+            return reason if self.current() != previous else None
+    
+    def status(self) -> Dict[str, Any]:
+        """Limite courante et appels en cours"""
+        with self._lock:
+            return {
+                "limit": self.current(),
+                "in_flight": self.in_flight,
+                "min": self.min_limit,
+                "max": self.max_limit,
+                "latency": round(self.latency, 3) if self.latency is not None else None,
+            }
+
+
+class SQLiteQuotaStore:
+    """
+    État de quota partagé par tous les processus d'une machine (SQLite en mode WAL).
+    - Compteurs d'utilisation et utilisation quotidienne agrégés
+    - Niveaux des seaux à jetons de chaque modèle
+    Chaque mise à jour est une transaction IMMEDIATE: les processus concurrents
+    sont sérialisés par SQLite sans jamais écraser les écritures des autres.
+    """
+    
+    # Événements résumés dans un compteur JSON plutôt que comptés comme requêtes
+    SUMMARY_EVENTS = {"routing": apply_routing_event, "concurrency": apply_concurrency_event}
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value TEXT);
+    CREATE TABLE IF NOT EXISTS daily_usage (
+        day TEXT PRIMARY KEY,
+        requests INTEGER NOT NULL DEFAULT 0,
+        errors INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS buckets (
+        model TEXT NOT NULL,
+        name TEXT NOT NULL,
+        level REAL NOT NULL,
+        updated REAL NOT NULL,
+        PRIMARY KEY (model, name)
+    );
+    """
+    
+    def __init__(self, path: str = "api_usage.db", timeout: float = 30.0):
+        """
+        Args:
+            path: Chemin de la base partagée
+            timeout: Délai maximum d'attente du verrou d'écriture (en secondes)
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connect().executescript(self.SCHEMA)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Connexion propre au thread courant"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def is_empty(self) -> bool:
+        """Indique si la base n'a encore jamais reçu de statistiques"""
+        row = self._connect().execute("SELECT COUNT(*) FROM counters").fetchone()
+        return row[0] == 0
+    
+    def load_stats(self) -> Dict[str, Any]:
+        """Lit les statistiques agrégées de tous les processus"""
+        conn = self._connect()
+        counters = {name: json.loads(value) for name, value in conn.execute("SELECT name, value FROM counters")}
+        return {
+            "total_requests": counters.get("total_requests", 0),
+            "quota_errors": counters.get("quota_errors", 0),
+            "last_error_time": counters.get("last_error_time"),
+            "daily_usage": {
+                day: {"requests": requests, "errors": errors}
+                for day, requests, errors in conn.execute("SELECT day, requests, errors FROM daily_usage ORDER BY day")
+            },
+            "hourly_limits": counters.get("hourly_limits", {}),
+            "routing": counters.get("routing", {}),
+            "concurrency": counters.get("concurrency", {}),
+            "bucket_usage": counters.get("bucket_usage", {}),
+        }
+    
+    def replace_stats(self, stats: Dict[str, Any]) -> None:
+        """Remplace toutes les statistiques (import initial ou réinitialisation)"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM counters")
+            conn.execute("DELETE FROM daily_usage")
+            conn.executemany("INSERT INTO counters (name, value) VALUES (?, ?)", [
+                (name, json.dumps(stats.get(name, default)))
+                for name, default in (("total_requests", 0), ("quota_errors", 0),
+                                      ("last_error_time", None), ("hourly_limits", {}),
+                                      ("routing", {}), ("concurrency", {}), ("bucket_usage", {}))
+            ])
+            conn.executemany("INSERT INTO daily_usage (day, requests, errors) VALUES (?, ?, ?)", [
+                (day, usage["requests"], usage["errors"]) for day, usage in stats.get("daily_usage", {}).items()
+            ])
+    
+    def record_events(self, events) -> None:
+        """Ajoute un lot d'événements d'utilisation aux compteurs partagés"""
+        summary_events = [event for event in events if event.get("type") in self.SUMMARY_EVENTS]
+        events = [event for event in events if event.get("type") not in self.SUMMARY_EVENTS]
+        if summary_events:
+            self._record_summaries(summary_events)
+        if not events:
+            return
+        errors = [event for event in events if event.get("quota_error")]
+        per_day: Dict[str, List[int]] = {}
+        for event in events:
+            counts = per_day.setdefault(event["time"][:10], [0, 0])
+            counts[0] += 1
+            counts[1] += 1 if event.get("quota_error") else 0
+        
+        with self._transaction() as conn:
+            for name, increment in (("total_requests", len(events)), ("quota_errors", len(errors))):
+                conn.execute(
+                    "INSERT INTO counters (name, value) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = CAST(value AS INTEGER) + ?",
+                    (name, json.dumps(increment), increment))
+            if errors:
+                last_error = max(event["time"] for event in errors)
+                row = conn.execute("SELECT value FROM counters WHERE name = 'last_error_time'").fetchone()
+                if row is None or json.loads(row[0]) is None or json.loads(row[0]) < last_error:
+                    conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES ('last_error_time', ?)",
+                                 (json.dumps(last_error),))
+            conn.executemany(
+                "INSERT INTO daily_usage (day, requests, errors) VALUES (?, ?, ?) "
+                "ON CONFLICT(day) DO UPDATE SET requests = requests + excluded.requests, "
+                "errors = errors + excluded.errors",
+                [(day, requests, errors) for day, (requests, errors) in per_day.items()])
+            # Limiter l'historique à 30 jours
+            conn.execute("DELETE FROM daily_usage WHERE day NOT IN "
+                         "(SELECT day FROM daily_usage ORDER BY day DESC LIMIT 30)")
+            bucket_events = [event for event in events if event.get("bucket")]
+            if bucket_events:
+                row = conn.execute("SELECT value FROM counters WHERE name = 'bucket_usage'").fetchone()
+                bucket_usage = json.loads(row[0]) if row else {}
+                for event in bucket_events:
+                    apply_bucket_event(bucket_usage, event)
+                conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES ('bucket_usage', ?)",
+                             (json.dumps(bucket_usage),))
+    
+    def _record_summaries(self, events) -> None:
+        """Ajoute des événements de routage ou de concurrence aux compteurs JSON partagés"""
+        with self._transaction() as conn:
+            for event_type, apply in self.SUMMARY_EVENTS.items():
+                batch = [event for event in events if event["type"] == event_type]
+                if not batch:
+                    continue
+                row = conn.execute("SELECT value FROM counters WHERE name = ?", (event_type,)).fetchone()
+                summary = json.loads(row[0]) if row else {}
+                for event in batch:
+                    apply(summary, event)
+                conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)",
+                             (event_type, json.dumps(summary)))
+    
+    def last_error_time(self) -> Optional[str]:
+        """Date de la dernière erreur de quota, tous processus confondus"""
+        row = self._connect().execute("SELECT value FROM counters WHERE name = 'last_error_time'").fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _load_bucket(self, conn, model_name: str, name: str, spec: Tuple[float, float, float],
+                     now: float) -> TokenBucket:
+        capacity, rate, initial_level = spec
+        row = conn.execute("SELECT level, updated FROM buckets WHERE model = ? AND name = ?",
+                           (model_name, name)).fetchone()
+        bucket = TokenBucket(capacity, rate, level=row[0] if row else initial_level)
+        bucket.updated = row[1] if row else now
+        return bucket
+    
+    @staticmethod
+    def _store_bucket(conn, model_name: str, name: str, bucket: TokenBucket) -> None:
+        conn.execute("INSERT OR REPLACE INTO buckets (model, name, level, updated) VALUES (?, ?, ?, ?)",
+                     (model_name, name, bucket.level, bucket.updated))
+    
+    def reserve(self, model_name: str, specs: Dict[str, Tuple[float, float, float]],
+                amounts: Dict[str, float]) -> float:
+        """
+        Réserve des jetons dans les seaux partagés d'un modèle.
+        
+        Args:
+            model_name: Modèle appelé
+            specs: Capacité, débit et niveau initial de chaque seau
+            amounts: Jetons à réserver par seau
+        
+        Returns:
+            float: Délai (en secondes) à attendre avant d'envoyer la requête
+        """
+        # Horloge murale: les processus ne partagent pas d'horloge monotone
+        now = time.time()
+        waits = [0.0]
+        with self._transaction() as conn:
+            for name, amount in amounts.items():
+                bucket = self._load_bucket(conn, model_name, name, specs[name], now)
+                waits.append(bucket.reserve(amount, now))
+                self._store_bucket(conn, model_name, name, bucket)
+        return max(waits)
+    
+    def levels(self, model_name: str, specs: Dict[str, Tuple[float, float, float]]) -> Dict[str, float]:
+        """Niveau actuel (recharge comprise) des seaux d'un modèle, sans les modifier"""
+        now = time.time()
+        conn = self._connect()
+        levels = {}
+        for name, spec in specs.items():
+            bucket = self._load_bucket(conn, model_name, name, spec, now)
+            bucket._refill(now)
+            levels[name] = bucket.level
+        return levels
+    
+    def block(self, model_name: str, name: str, spec: Tuple[float, float, float], seconds: float) -> None:
+        """Vide un seau partagé pour suspendre les requêtes de tous les processus"""
+        now = time.time()
+        with self._transaction() as conn:
+            bucket = self._load_bucket(conn, model_name, name, spec, now)
+            bucket.block_for(seconds, now)
+            self._store_bucket(conn, model_name, name, bucket)
+    
+    def bucket_levels(self) -> Dict[str, Dict[str, float]]:
+        """Niveau enregistré des seaux de chaque modèle (sans la recharge depuis la dernière requête)"""
+        levels: Dict[str, Dict[str, float]] = {}
+        for model_name, name, level in self._connect().execute("SELECT model, name, level FROM buckets"):
+            levels.setdefault(model_name, {})[name] = round(level, 1)
+        return levels
+
+
+class SharedRateLimiter(RateLimiter):
+    """Limiteur de débit dont les seaux sont partagés entre processus (SQLiteQuotaStore)"""
+    
+    def __init__(self, store: SQLiteQuotaStore, limits: Optional[Dict[str, Dict[str, int]]] = None,
+                 default_limits: Optional[Dict[str, int]] = None):
+        super().__init__(limits, default_limits)
+        self.store = store
+    
+    def reserve(self, model_name: str, tokens: int = 0, requests_today: int = 0) -> float:
+        amounts = {"rpm": 1, "rpd": 1}
+        if tokens:
+            amounts["tpm"] = tokens
+        return self.store.reserve(model_name, self.bucket_specs(model_name, requests_today), amounts)
+    
+    def available(self, model_name: str, requests_today: int = 0) -> float:
+        levels = self.store.levels(model_name, self.bucket_specs(model_name, requests_today))
+        return min(levels["rpm"], levels["rpd"])
+    
+    def block(self, model_name: str, seconds: float) -> None:
+        self.store.block(model_name, "rpm", self.bucket_specs(model_name)["rpm"], seconds)
+    
+    def status(self) -> Dict[str, Dict[str, float]]:
+        return self.store.bucket_levels()
+
+
 class QuotaManager:
     """
     Gère les quotas et les limites de taux pour l'API Gemini.
     - Implémente un backoff exponentiel pour les erreurs 429
     - Surveille l'utilisation pour éviter d'atteindre les limites
     - Stocke les statistiques d'utilisation
+    
+    Les compteurs sont tenus en mémoire; chaque requête ajoute un événement à un
+    journal (append-only) écrit en arrière-plan à intervalle régulier et à l'arrêt.
+    Le journal est régulièrement compacté dans le fichier de statistiques.
+    
+    Avec un SQLiteQuotaStore, les événements sont agrégés dans la base partagée
+    par tous les processus de la machine au lieu du journal local.
+    
+    Les statistiques ne sont lues qu'à leur première consultation: importer le
+    module (ou un module qui en dépend) ne coûte aucune lecture de fichier.
     """
     
     # Chemin du fichier de statistiques d'utilisation
@@ -24,28 +707,65 @@ class QuotaManager:
     # Verrouillage pour assurer l'accès thread-safe aux statistiques
     _lock = threading.Lock()
     
-    def __init__(self, max_retries: int = 3, initial_delay: float = 2.0):
+    def __init__(self, max_retries: int = 3, initial_delay: float = 2.0,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 flush_interval: float = 5.0, compact_every: int = 1000,
+                 store: Optional[SQLiteQuotaStore] = None,
+                 key_pool: Optional[ApiKeyPool] = None,
+                 concurrency: Optional[ConcurrencyLimiter] = None):
         """
         Initialise le gestionnaire de quota.
         
         Args:
             max_retries: Nombre maximum de tentatives en cas d'erreur de quota
             initial_delay: Délai initial (en secondes) avant de réessayer
+            rate_limiter: Limiteur de débit par modèle (limites par défaut si None)
+            flush_interval: Intervalle (en secondes) d'écriture du journal d'utilisation
+            compact_every: Nombre d'événements journalisés avant compaction
+            store: État partagé entre processus (fichiers locaux si None)
+            key_pool: Pool de clés API entre lesquelles répartir les requêtes
+            concurrency: Limite adaptative des appels simultanés (utilisée par l'ordonnanceur)
         """
         self.max_retries = max_retries
         self.initial_delay = initial_delay
-        self.usage_stats = self._load_usage_stats()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.store = store
+        self.key_pool = key_pool if key_pool else None
+        self.concurrency = concurrency or ConcurrencyLimiter()
+        # Les écritures disque sont sérialisées à part: une requête ne les attend jamais
+        self._io_lock = threading.Lock()
+        self._pending_events = []
+        self._logged_events = 0
+        self._flusher: Optional[threading.Thread] = None
+        self._stop_flusher = threading.Event()
+        self._usage_stats: Optional[Dict[str, Any]] = None
+        self._load_lock = threading.Lock()
     
-    def _load_usage_stats(self) -> Dict[str, Any]:
-        """Charge les statistiques d'utilisation depuis le fichier"""
-        if os.path.exists(self.USAGE_FILE):
-            try:
-                with open(self.USAGE_FILE, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Erreur lors du chargement des statistiques: {e}")
-        
-        # Statistiques par défaut si le fichier n'existe pas
+    @property
+    def usage_stats(self) -> Dict[str, Any]:
+        """
+        Compteurs d'utilisation, chargés à la première consultation.
+        Un journal trop long est compacté à la prochaine écriture (flush).
+        """
+        if self._usage_stats is None:
+            with self._load_lock:
+                if self._usage_stats is None:
+                    self._usage_stats = self._load_usage_stats()
+        return self._usage_stats
+    
+    @usage_stats.setter
+    def usage_stats(self, stats: Dict[str, Any]) -> None:
+        self._usage_stats = stats
+    
+    @property
+    def usage_log_file(self) -> str:
+        """Journal des événements non encore compactés"""
+        return os.path.splitext(self.USAGE_FILE)[0] + ".log"
+    
+    @staticmethod
+    def _default_stats() -> Dict[str, Any]:
         return {
             "total_requests": 0,
             "quota_errors": 0,
@@ -54,85 +774,276 @@ class QuotaManager:
             "hourly_limits": {}
         }
     
+    @staticmethod
+    def _apply_event(stats: Dict[str, Any], event: Dict[str, Any]) -> None:
+        """Applique un événement d'utilisation (ou de routage) aux compteurs"""
+        if event.get("type") == "routing":
+            apply_routing_event(stats.setdefault("routing", {}), event)
+            return
+        if event.get("type") == "concurrency":
+            apply_concurrency_event(stats.setdefault("concurrency", {}), event)
+            return
+        
+        # Mettre à jour les compteurs globaux
+        stats["total_requests"] += 1
+        if event.get("bucket"):
+            apply_bucket_event(stats.setdefault("bucket_usage", {}), event)
+        if event.get("quota_error"):
+            stats["quota_errors"] += 1
+            stats["last_error_time"] = event["time"]
+        
+        # Mettre à jour l'utilisation quotidienne
+        day = event["time"][:10]
+        daily_usage = stats["daily_usage"]
+        if day not in daily_usage:
+            daily_usage[day] = {"requests": 0, "errors": 0}
+            # Limiter l'historique à 30 jours (uniquement lorsqu'un nouveau jour apparaît)
+            if len(daily_usage) > 30:
+                for old_day in sorted(daily_usage)[:-30]:
+                    daily_usage.pop(old_day, None)
+        
+        daily_usage[day]["requests"] += 1
+        if event.get("quota_error"):
+            daily_usage[day]["errors"] += 1
+    
+    def _load_usage_stats(self) -> Dict[str, Any]:
+        """Charge les statistiques d'utilisation: dernier instantané puis journal"""
+        stats = self._default_stats()
+        if os.path.exists(self.USAGE_FILE):
+            try:
+                with open(self.USAGE_FILE, 'r') as f:
+                    stats = json.load(f)
+            except Exception as e:
+                print(f"Erreur lors du chargement des statistiques: {e}")
+        
+        # Rejouer les événements écrits depuis la dernière compaction
+        if os.path.exists(self.usage_log_file):
+            try:
+                with open(self.usage_log_file, 'r') as f:
+                    for line in f:
+                        try:
+                            self._apply_event(stats, json.loads(line))
+                            self._logged_events += 1
+                        except ValueError:
+                            # Ligne incomplète (arrêt brutal): l'ignorer et compacter au démarrage
+                            self._logged_events = self.compact_every
+            except Exception as e:
+                print(f"Erreur lors de la lecture du journal d'utilisation: {e}")
+        
+        if self.store is not None:
+            # Première utilisation de la base partagée: y importer l'historique local
+            if self.store.is_empty():
+                self.store.replace_stats(stats)
+            return self.store.load_stats()
+        
+        return stats
+    
     def _save_usage_stats(self) -> None:
-        """Sauvegarde les statistiques d'utilisation dans le fichier"""
-        with self._lock:
+        """
+        Écrit l'état actuel des compteurs dans le fichier de statistiques
+        et vide le journal (compaction).
+        """
+        with self._io_lock:
+            with self._lock:
+                snapshot = json.dumps(self.usage_stats, indent=2)
+                # Les événements en attente sont déjà comptés dans l'instantané
+                self._pending_events = []
+            if self.store is not None:
+                self.store.replace_stats(json.loads(snapshot))
+                return
             try:
-                with open(self.USAGE_FILE, 'w') as f:
-                    json.dump(self.usage_stats, f, indent=2)
+                tmp_path = f"{self.USAGE_FILE}.tmp"
+                with open(tmp_path, 'w') as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, self.USAGE_FILE)
+                if os.path.exists(self.usage_log_file):
+                    os.remove(self.usage_log_file)
+                self._logged_events = 0
             except Exception as e:
                 print(f"Erreur lors de la sauvegarde des statistiques: {e}")
     
-    def update_usage(self, success: bool = True, quota_error: bool = False) -> None:
+    def flush(self) -> None:
+        """Ajoute les événements en attente au journal, et compacte si nécessaire"""
+        with self._io_lock:
+            with self._lock:
+                events, self._pending_events = self._pending_events, []
+            if self.store is not None:
+                if events:
+                    try:
+                        self.store.record_events(events)
+                    except Exception as e:
+                        print(f"Erreur lors de l'enregistrement de l'utilisation partagée: {e}")
+                return
+            if events:
+                try:
+                    with open(self.usage_log_file, 'a') as f:
+                        f.write("".join(json.dumps(event) + "\n" for event in events))
+                    self._logged_events += len(events)
+                except Exception as e:
+                    print(f"Erreur lors de l'écriture du journal d'utilisation: {e}")
+            should_compact = self._logged_events >= self.compact_every
+        if should_compact:
+            self._save_usage_stats()
+    
+    def close(self) -> None:
+        """Arrête l'écriture en arrière-plan et compacte le journal"""
+        self._stop_flusher.set()
+        self.flush()
+        if self.store is None and self._logged_events:
+            self._save_usage_stats()
+    
+    def _flush_loop(self) -> None:
+        while not self._stop_flusher.wait(self.flush_interval):
+            self.flush()
+    
+    def _ensure_flusher(self) -> None:
+        """Démarre l'écriture en arrière-plan au premier événement"""
+        if self._flusher is None:
+            with self._io_lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name="quota-flush", daemon=True)
+                    self._flusher.start()
+                    atexit.register(self.close)
+    
+    def record_routing(self, stage: str, model_name: str, fallback_from: Optional[str] = None,
+                       reason: Optional[str] = None) -> None:
         """
-        Met à jour les statistiques d'utilisation.
+        Enregistre une décision de routage (écriture différée, comme l'utilisation).
+        
+        Args:
+            stage: Étape du pipeline ('draft', 'fusion', 'enrichment'...)
+            model_name: Modèle qui a produit la réponse
+            fallback_from: Modèle initialement prévu, en cas de repli
+            reason: Motif du repli ('quota' ou 'latency')
+        """
+        event = {
+            "type": "routing",
+            "time": datetime.now().isoformat(),
+            "stage": stage,
+            "model": model_name,
+            "fallback_from": fallback_from,
+            "reason": reason,
+        }
+        with self._lock:
+            self._apply_event(self.usage_stats, event)
+            self._pending_events.append(event)
+        self._ensure_flusher()
+    
+    def _record_concurrency(self, latency: Optional[float] = None, congestion: Optional[str] = None,
+                            failed: bool = False) -> None:
+        """Transmet le résultat d'un appel à la limite adaptative et journalise ses changements"""
+        reason = self.concurrency.record(latency, congestion, failed)
+        if reason is None:
+            return
+        event = {
+            "type": "concurrency",
+            "time": datetime.now().isoformat(),
+            "limit": self.concurrency.current(),
+            "reason": reason,
+        }
+        with self._lock:
+            self._apply_event(self.usage_stats, event)
+            self._pending_events.append(event)
+        self._ensure_flusher()
+    
+    def update_usage(self, success: bool = True, quota_error: bool = False,
+                     bucket: Optional[str] = None) -> None:
+        """
+        Met à jour les statistiques d'utilisation (en mémoire; écriture différée).
         
         Args:
             success: Si la requête a réussi
             quota_error: Si l'erreur est due à une limite de quota
+            bucket: Seau de débit de la requête (modèle, ou modèle@clé)
         """
+        event = {"time": datetime.now().isoformat(), "quota_error": quota_error}
+        if bucket:
+            event["bucket"] = bucket
         with self._lock:
-            # Mettre à jour les compteurs globaux
-            self.usage_stats["total_requests"] += 1
-            
-            if quota_error:
-                self.usage_stats["quota_errors"] += 1
-                self.usage_stats["last_error_time"] = datetime.now().isoformat()
-            
-            # Mettre à jour l'utilisation quotidienne
-            today = datetime.now().strftime("%Y-%m-%d")
-            if today not in self.usage_stats["daily_usage"]:
-                self.usage_stats["daily_usage"][today] = {"requests": 0, "errors": 0}
-            
-            self.usage_stats["daily_usage"][today]["requests"] += 1
-            if quota_error:
-                self.usage_stats["daily_usage"][today]["errors"] += 1
-            
-            # Limiter l'historique à 30 jours
-            dates = list(self.usage_stats["daily_usage"].keys())
-            if len(dates) > 30:
-                oldest_dates = sorted(dates)[:-30]
-                for date in oldest_dates:
-                    self.usage_stats["daily_usage"].pop(date, None)
-            
-            # Sauvegarder les statistiques mises à jour
-            self._save_usage_stats()
+            self._apply_event(self.usage_stats, event)
+            self._pending_events.append(event)
+        if quota_error and self.store is not None:
+            # Les autres processus doivent voir l'erreur sans attendre l'écriture différée
+            self.flush()
+        self._ensure_flusher()
     
     def should_throttle(self) -> Tuple[bool, float]:
         """
-        Vérifie si les requêtes doivent être limitées en fonction de l'historique récent.
+        Vérifie si les requêtes doivent être limitées après une erreur de quota récente.
+        Les limites de Gemini portent sur des fenêtres d'une minute: seule la part
+        restante de la fenêtre qui a suivi la dernière erreur est attendue.
         
         Returns:
             Tuple[bool, float]: (Faut-il limiter?, Délai recommandé en secondes)
         """
-        with self._lock:
-            # Si aucune erreur récente, pas besoin de limiter
-            if self.usage_stats.get("last_error_time") is None:
-                return False, 0
-            
-            # Vérifier si une erreur s'est produite récemment (dernière heure)
-            try:
-                last_error = datetime.fromisoformat(self.usage_stats["last_error_time"])
-                now = datetime.now()
-                time_since_error = (now - last_error).total_seconds()
-                
-                # Si l'erreur est récente, suggérer un délai
-                if time_since_error < 3600:  # Moins d'une heure
-                    # Plus l'erreur est récente, plus le délai est long
-                    suggested_delay = max(1.0, 60 * (1 - time_since_error/3600))
-                    return True, suggested_delay
-            except Exception:
-                pass
-            
+        if self.store is not None:
+            last_error_time = self.store.last_error_time()
+        else:
+            with self._lock:
+                last_error_time = self.usage_stats.get("last_error_time")
+        
+        # Si aucune erreur récente, pas besoin de limiter
+        if last_error_time is None:
             return False, 0
+        
+        try:
+            time_since_error = (datetime.now() - datetime.fromisoformat(last_error_time)).total_seconds()
+            if 0 <= time_since_error < MINUTE_WINDOW:
+                return True, MINUTE_WINDOW - time_since_error
+        except Exception:
+            pass
+        
+        return False, 0
+    
+    def _bucket_requests_today(self) -> Dict[str, int]:
+        """Requêtes faites aujourd'hui par seau (chaque modèle, chaque clé a son budget quotidien)"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        with self._lock:
+            return dict(self.usage_stats.get("bucket_usage", {}).get(today, {}))
+    
+    @staticmethod
+    def _bucket_name(model_name: Optional[str], key: Optional[ApiKey] = None) -> str:
+        bucket_name = model_name or DEFAULT_MODEL
+        return ApiKeyPool.bucket_name(bucket_name, key) if key is not None else bucket_name
+    
+    def wait_for_capacity(self, model_name: Optional[str] = None, token_estimate: Optional[int] = None,
+                          key: Optional[ApiKey] = None) -> float:
+        """
+        Réserve la capacité d'une requête et attend le temps nécessaire.
+        
+        Args:
+            model_name: Modèle appelé
+            token_estimate: Nombre de jetons estimé
+            key: Clé du pool utilisée (ses limites sont propres à la clé)
+        
+        Returns:
+            float: Temps d'attente effectif (en secondes)
+        """
+        bucket_name = self._bucket_name(model_name, key)
+        wait = self.rate_limiter.reserve(bucket_name, token_estimate or 0,
+                                         requests_today=self._bucket_requests_today().get(bucket_name, 0))
+        if key is not None:
+            # Une clé en refroidissement n'est choisie que si toutes le sont
+            wait = max(wait, self.key_pool.cooldown_remaining(key))
+        if wait > 0:
+            if wait >= 1:
+                print(f"⏳ Limite de débit de l'API: attente de {wait:.1f} secondes...")
+            time.sleep(wait)
+        return wait
     
-    def handle_request(self, request_func, *args, **kwargs) -> Any:
+    def handle_request(self, request_func, *args, model_name: Optional[str] = None,
+                       token_estimate: Optional[int] = None, max_retries: Optional[int] = None,
+                       **kwargs) -> Any:
         """
-        Gère une requête API avec retry et backoff exponentiel.
+        Gère une requête API avec limitation de débit, retry et backoff exponentiel.
         
         Args:
             request_func: Fonction à exécuter pour la requête API
             *args, **kwargs: Arguments à passer à request_func
+            model_name: Modèle appelé (détermine les limites de débit appliquées)
+            token_estimate: Nombre de jetons estimé pour la requête
+            max_retries: Nombre de tentatives après une erreur de quota
+                         (self.max_retries si None; 0 pour laisser l'appelant se replier)
             
         Returns:
             Any: Le résultat de request_func si réussi
@@ -140,30 +1051,53 @@ class QuotaManager:
         Raises:
             Exception: Si toutes les tentatives échouent
         """
-        # Vérifier s'il faut limiter les requêtes
-        should_limit, delay = self.should_throttle()
-        if should_limit:
-            print(f"⚠️ Limitation préventive des requêtes. Attente de {delay:.1f} secondes...")
-            time.sleep(delay)
-        
+        model_name = model_name or DEFAULT_MODEL
+        if max_retries is None:
+            max_retries = self.max_retries
         retry_count = 0
         delay = self.initial_delay
         
-        while retry_count <= self.max_retries:
+        while retry_count <= max_retries:
+            # Avec un pool de clés, choisir la clé qui a le plus de marge
+            key = None
+            if self.key_pool is not None:
+                key = self.key_pool.select(self.rate_limiter, model_name, self._bucket_requests_today())
+            bucket_name = self._bucket_name(model_name, key)
+            key_token = None
+            # La place de la clé est libérée même si la tentative est interrompue avant son résultat
+            recorded = False
             try:
+                # Chaque tentative réserve sa place dans les limites du modèle (et de la clé)
+                self.wait_for_capacity(model_name, token_estimate, key)
+                key_token = active_api_key.set(key.secret) if key is not None else None
+                self.concurrency.started()
+                started = time.monotonic()
                 result = request_func(*args, **kwargs)
                 # Mettre à jour les statistiques en cas de succès
-                self.update_usage(success=True)
+                self._record_concurrency(latency=time.monotonic() - started)
+                self.update_usage(success=True, bucket=bucket_name)
+                if key is not None:
+                    self.key_pool.record(key)
+                    recorded = True
                 return result
                 
             except Exception as e:
+                if not getattr(e, "sent", True):
+                    # Appel refusé avant l'envoi (disjoncteur ouvert): rien à comptabiliser
+                    self.concurrency.abandoned()
+                    raise
                 error_msg = str(e).lower()
-                is_quota_error = "429" in error_msg or "quota" in error_msg or "rate limit" in error_msg
+                quota_error = is_quota_error(e)
                 
-                # Mettre à jour les statistiques
-                self.update_usage(success=False, quota_error=is_quota_error)
+                # Mettre à jour les statistiques (une erreur 429 ou un délai dépassé réduit la concurrence)
+                congestion = "quota" if quota_error else ("timeout" if is_timeout_error(e) else None)
+                self._record_concurrency(congestion=congestion, failed=True)
+                self.update_usage(success=False, quota_error=quota_error, bucket=bucket_name)
+                if key is not None and not quota_error:
+                    self.key_pool.record(key, error=True)
+                    recorded = True
                 
-                if is_quota_error and retry_count < self.max_retries:
+                if quota_error and retry_count < max_retries:
                     retry_count += 1
                     wait_time = delay * (2 ** (retry_count - 1))  # Backoff exponentiel
                     
@@ -183,16 +1117,33 @@ class QuotaManager:
                     if suggested_delay is not None and suggested_delay > 0:
                         wait_time = suggested_delay
                     
-                    print(f"⚠️ Erreur de quota API (tentative {retry_count}/{self.max_retries}). "
-                          f"Nouvelle tentative dans {wait_time:.1f} secondes...")
-                    time.sleep(wait_time)
+                    if key is not None:
+                        # Retirer la clé de la rotation: la tentative suivante
+                        # passe par une autre clé si l'une d'elles a de la marge
+                        self.key_pool.record(key, error=True, quota_error=True, retry_after=suggested_delay)
+                        recorded = True
+                        print(f"⚠️ Erreur de quota API sur la clé {key.key_id} "
+                              f"(tentative {retry_count}/{max_retries}). Changement de clé...")
+                    else:
+                        print(f"⚠️ Erreur de quota API (tentative {retry_count}/{max_retries}). "
+                              f"Nouvelle tentative dans {wait_time:.1f} secondes...")
+                        # Suspendre toutes les requêtes vers ce modèle, pas seulement celle-ci
+                        self.rate_limiter.block(model_name, wait_time)
                 else:
+                    if key is not None and quota_error:
+                        self.key_pool.record(key, error=True, quota_error=True)
+                        recorded = True
                     # Relancer l'exception si ce n'est pas une erreur de quota
                     # ou si nous avons épuisé nos tentatives
                     raise
+            finally:
+                if key_token is not None:
+                    active_api_key.reset(key_token)
+                if key is not None and not recorded:
+                    self.key_pool.release(key)
         
         # Ne devrait jamais arriver ici, mais par sécurité
-        raise Exception(f"Toutes les tentatives ont échoué ({self.max_retries + 1} essais)")
+        raise Exception(f"Toutes les tentatives ont échoué ({max_retries + 1} essais)")
     
     def get_usage_report(self) -> Dict[str, Any]:
         """
@@ -201,6 +1152,13 @@ class QuotaManager:
         Returns:
             Dict[str, Any]: Statistiques d'utilisation
         """
+        if self.store is not None:
+            # Agréger l'utilisation de tous les processus
+            self.flush()
+            stats = self.store.load_stats()
+            with self._lock:
+                self.usage_stats = stats
+        
         with self._lock:
             today = datetime.now().strftime("%Y-%m-%d")
             yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
@@ -208,13 +1166,55 @@ class QuotaManager:
             today_stats = self.usage_stats["daily_usage"].get(today, {"requests": 0, "errors": 0})
             yesterday_stats = self.usage_stats["daily_usage"].get(yesterday, {"requests": 0, "errors": 0})
             
-            return {
+            report = {
                 "total_requests": self.usage_stats["total_requests"],
                 "total_quota_errors": self.usage_stats["quota_errors"],
                 "today": today_stats,
                 "yesterday": yesterday_stats,
                 "last_error": self.usage_stats.get("last_error_time"),
+                "routing": json.loads(json.dumps(self.usage_stats.get("routing", {}))),
+                "concurrency_history": list(self.usage_stats.get("concurrency", {}).get("history", [])),
             }
+        
+        report["concurrency"] = self.concurrency.status()
+        if self.key_pool is not None:
+            report["api_keys"] = self.key_pool.status()
+        return report
+
+def create_quota_manager() -> QuotaManager:
+    """Construit le gestionnaire de quota selon la configuration (QUOTA_BACKEND: 'file' ou 'sqlite')"""
+    limits = parse_rate_limits(config("GEMINI_RATE_LIMITS", default=""))
+    default_limits = {
+        "rpm": config("GEMINI_RPM", default=DEFAULT_RATE_LIMITS["rpm"], cast=int),
+        "tpm": config("GEMINI_TPM", default=DEFAULT_RATE_LIMITS["tpm"], cast=int),
+        "rpd": config("GEMINI_RPD", default=DEFAULT_RATE_LIMITS["rpd"], cast=int),
+    }
+    
+    # Plusieurs clés (GOOGLE_API_KEYS=cle1,cle2): répartir les requêtes entre elles
+    secrets = [secret.strip() for secret in config("GOOGLE_API_KEYS", default="").split(",") if secret.strip()]
+    key_pool = ApiKeyPool(secrets, cooldown=config("API_KEY_COOLDOWN", default=MINUTE_WINDOW, cast=float)) \
+        if len(secrets) > 1 else None
+    
+    store = None
+    if config("QUOTA_BACKEND", default="file").lower() == "sqlite":
+        store = SQLiteQuotaStore(config("QUOTA_DB_PATH", default="api_usage.db"))
+        rate_limiter = SharedRateLimiter(store, limits, default_limits)
+    else:
+        rate_limiter = RateLimiter(limits, default_limits)
+    
+    return QuotaManager(
+        rate_limiter=rate_limiter,
+        flush_interval=config("USAGE_FLUSH_INTERVAL", default=5.0, cast=float),
+        compact_every=config("USAGE_COMPACT_EVERY", default=1000, cast=int),
+        store=store,
+        key_pool=key_pool,
+        concurrency=ConcurrencyLimiter(
+            initial=config("LLM_INITIAL_CONCURRENCY", default=4, cast=int),
+            min_limit=config("LLM_MIN_CONCURRENCY", default=1, cast=int),
+            max_limit=config("LLM_MAX_CONCURRENCY", default=16, cast=int),
+            latency_target=config("LLM_LATENCY_TARGET", default=20.0, cast=float),
+        ),
+    )
 
 # Instance globale pour faciliter l'importation
-quota_manager = QuotaManager()
+quota_manager = create_quota_manager()
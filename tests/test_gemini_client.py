@@ -0,0 +1,69 @@
+"""Tests du registre des clients Gemini"""
+from types import SimpleNamespace
+
+import pytest
+
+import gemini_client
+from gemini_client import GeminiClientRegistry, KeyedModel
+from quota_manager import active_api_key
+
+
+class FakeServiceClient:
+    """Client de service qui répond en indiquant la clé qui l'a construit"""
+
+    def __init__(self, client_options=None):
+        self.api_key = client_options["api_key"]
+        self.requests = []
+
+    def generate_content(self, request=None):
+        self.requests.append(request)
+        part = SimpleNamespace(text=f"{request.model} via {self.api_key}")
+        candidate = SimpleNamespace(content=SimpleNamespace(parts=[part]), finish_reason="STOP")
+        return SimpleNamespace(candidates=[candidate], prompt_feedback=None)
+
+
+class FakeGenerativeModel:
+    def __init__(self, model_name, generation_config=None):
+        self.model_name = model_name
+
+    def generate_content(self, prompt):
+        return SimpleNamespace(text=f"{self.model_name} via configure")
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    genai = SimpleNamespace(configure=lambda api_key=None: None, GenerativeModel=FakeGenerativeModel)
+    glm = SimpleNamespace(
+        GenerativeServiceClient=FakeServiceClient,
+        GenerateContentRequest=lambda **kwargs: SimpleNamespace(**kwargs),
+        Content=lambda **kwargs: SimpleNamespace(**kwargs),
+        Part=lambda **kwargs: SimpleNamespace(**kwargs),
+        GenerationConfig=lambda **kwargs: SimpleNamespace(**kwargs),
+    )
+    monkeypatch.setattr(gemini_client, "_sdk", lambda: (genai, glm))
+    registry = GeminiClientRegistry()
+    registry.configure(api_key="cle-defaut")
+    return registry
+
+
+def test_each_key_has_its_own_client(registry):
+    first = registry.get_model("gemini-pro", {"temperature": 0.5}, api_key="cle-1")
+    second = registry.get_model("gemini-pro", {"temperature": 0.5}, api_key="cle-2")
+
+    assert isinstance(first, KeyedModel) and isinstance(second, KeyedModel)
+    assert first.client is not second.client
+    assert (first.client.api_key, second.client.api_key) == ("cle-1", "cle-2")
+    # Le modèle et le client d'une clé sont réutilisés d'un appel à l'autre
+    assert registry.get_model("gemini-pro", {"temperature": 0.5}, api_key="cle-1") is first
+    assert registry.get_model("gemini-1.5-flash", None, api_key="cle-1").client is first.client
+
+
+def test_generate_uses_the_active_key(registry):
+    texts = []
+    for secret in ("cle-1", "cle-2", None):
+        token = active_api_key.set(secret)
+        try:
+            texts.append(registry.generate("gemini-pro", "Bonjour", {"temperature": 0.5}))
+        finally:
+            active_api_key.reset(token)
+    assert texts == ["models/gemini-pro via cle-1", "models/gemini-pro via cle-2", "gemini-pro via configure"]
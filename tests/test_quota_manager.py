@@ -0,0 +1,42 @@
+"""Tests de la limite adaptative de concurrence"""
+import pytest
+
+from quota_manager import ConcurrencyLimiter, QuotaManager
+
+
+class ServiceError(Exception):
+    """Erreur du service qui n'est ni une erreur de quota ni un délai dépassé"""
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    # Les statistiques d'utilisation sont écrites dans le répertoire courant
+    monkeypatch.chdir(tmp_path)
+    manager = QuotaManager(max_retries=0, concurrency=ConcurrencyLimiter(initial=4))
+    yield manager
+    manager.close()
+
+
+def failing_request():
+    raise ServiceError("503 service unavailable")
+
+
+def test_failures_do_not_raise_the_limit(manager):
+    for _ in range(20):
+        with pytest.raises(ServiceError):
+            manager.handle_request(failing_request)
+    assert manager.concurrency.current() == 4
+    assert manager.concurrency.in_flight == 0
+
+
+def test_fast_successes_raise_the_limit(manager):
+    for _ in range(20):
+        manager.handle_request(lambda: "ok")
+    assert manager.concurrency.current() > 4
+
+
+def test_quota_errors_lower_the_limit():
+    limiter = ConcurrencyLimiter(initial=8)
+    limiter.started()
+    assert limiter.record(congestion="quota", failed=True) == "quota"
+    assert limiter.current() == 4
@@ -0,0 +1,53 @@
+"""Tests de l'ordre des sessions listées selon le stockage"""
+import pytest
+
+import user_session
+from user_session import SQLiteSessionStore
+
+
+def make_profile(name):
+    return {"personal_info": {"name": name}, "program_info": {"name": "Licence"}}
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    """Stockage JSON dans un dossier temporaire"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(user_session, "SESSION_DIR", str(tmp_path / "user_sessions"))
+    monkeypatch.setattr(user_session, "SESSION_BACKEND", "json")
+    monkeypatch.setattr(user_session, "_session_store", None)
+    return tmp_path
+
+
+def use_sqlite(tmp_path, monkeypatch):
+    monkeypatch.setattr(user_session, "SESSION_BACKEND", "sqlite")
+    monkeypatch.setattr(user_session, "_session_store", SQLiteSessionStore(str(tmp_path / "sessions.db")))
+
+
+def save_sessions():
+    """Trois sessions; la première est mise à jour en dernier"""
+    first = user_session.save_user_profile(make_profile("Alice"))
+    user_session.save_user_profile(make_profile("Bruno"))
+    user_session.save_user_profile(make_profile("Chloé"))
+    user_session.save_user_profile(user_session.load_user_profile(first), first)
+
+
+def listed_names(**kwargs):
+    return [session["username"] for session in user_session.get_available_sessions(**kwargs)]
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_most_recently_updated_first(sessions, monkeypatch, backend):
+    if backend == "sqlite":
+        use_sqlite(sessions, monkeypatch)
+    save_sessions()
+    assert listed_names() == ["Alice", "Chloé", "Bruno"]
+    assert listed_names(offset=1, limit=1) == ["Chloé"]
+
+
+def test_migration_keeps_the_order(sessions, monkeypatch):
+    save_sessions()
+    before = listed_names()
+    user_session.migrate_to_sqlite(str(sessions / "sessions.db"))
+    use_sqlite(sessions, monkeypatch)
+    assert listed_names() == before
@@ -0,0 +1,201 @@
+"""
+Stockage clé/valeur persistant sur disque avec éviction LRU.
+Chaque entrée est composée de métadonnées JSON et d'un contenu binaire.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class DiskCache:
+    """
+    Cache persistant borné en taille.
+    - Une entrée = un fichier de métadonnées (.json) et un fichier de contenu (.bin)
+    - L'ordre LRU est porté par la date de modification du fichier de contenu,
+      ce qui évite de réécrire les métadonnées à chaque lecture
+    - Les écritures sont atomiques (fichier temporaire puis renommage)
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 100 * 1024 * 1024,
+                 max_entries: Optional[int] = None):
+        """
+        Initialise le cache.
+
+        Args:
+            directory: Dossier de stockage des entrées
+            max_bytes: Taille maximale cumulée des contenus (en octets)
+            max_entries: Nombre maximal d'entrées (illimité si None)
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Index en mémoire: clé -> (taille, dernier accès)
+        self._index: Dict[str, Tuple[int, float]] = {}
+        self._total_bytes = 0
+        self._load_index()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".bin"
+
+    def _load_index(self) -> None:
+        """Reconstruit l'index à partir des fichiers présents (sans les lire)"""
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+            return
+
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".bin"):
+                stat = entry.stat()
+                key = entry.name[:-4]
+                self._index[key] = (stat.st_size, stat.st_mtime)
+                self._total_bytes += stat.st_size
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        """
+        Lit une entrée et la marque comme récemment utilisée.
+
+        Returns:
+            tuple or None: (métadonnées, contenu) ou None si absente
+        """
+        meta_path, body_path = self._paths(key)
+        with self._lock:
+            if key not in self._index:
+                return None
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                with open(body_path, "rb") as f:
+                    body = f.read()
+                now = time.time()
+                os.utime(body_path, (now, now))
+                self._index[key] = (len(body), now)
+                return meta, body
+            except (OSError, ValueError):
+                # Entrée corrompue ou supprimée par un autre processus
+                self._remove(key)
+                return None
+
+    def get_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        """Lit uniquement les métadonnées d'une entrée"""
+        meta_path, _ = self._paths(key)
+        with self._lock:
+            if key not in self._index:
+                return None
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                self._remove(key)
+                return None
+
+    def put(self, key: str, meta: Dict[str, Any], body: bytes) -> None:
+        """Enregistre une entrée puis applique l'éviction LRU si nécessaire"""
+        meta_path, body_path = self._paths(key)
+        with self._lock:
+            old_size = self._index.get(key, (0, 0))[0]
+            self._write_atomic(body_path, body)
+            self._write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+            self._index[key] = (len(body), time.time())
+            self._total_bytes += len(body) - old_size
+            self._evict()
+
+    def open_body(self, key: str):
+        """
+        Ouvre le contenu d'une entrée en lecture binaire (lecture par morceaux).
+
+        Returns:
+            file or None: Fichier ouvert, ou None si l'entrée est absente
+        """
+        _, body_path = self._paths(key)
+        with self._lock:
+            if key not in self._index:
+                return None
+            try:
+                handle = open(body_path, "rb")
+            except OSError:
+                self._remove(key)
+                return None
+            now = time.time()
+            os.utime(body_path, (now, now))
+            self._index[key] = (self._index[key][0], now)
+            return handle
+
+    def temp_path(self) -> str:
+        """Retourne un chemin temporaire dans le dossier du cache"""
+        return os.path.join(self.directory, f"spool.{os.getpid()}.{threading.get_ident()}.{time.time_ns()}.tmp")
+
+    def put_file(self, key: str, meta: Dict[str, Any], source_path: str) -> None:
+        """Enregistre une entrée dont le contenu a été écrit dans un fichier temporaire"""
+        meta_path, body_path = self._paths(key)
+        size = os.path.getsize(source_path)
+        with self._lock:
+            old_size = self._index.get(key, (0, 0))[0]
+            os.replace(source_path, body_path)
+            self._write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+            self._index[key] = (size, time.time())
+            self._total_bytes += size - old_size
+            self._evict()
+
+    def update_meta(self, key: str, meta: Dict[str, Any]) -> None:
+        """Remplace les métadonnées d'une entrée existante sans toucher au contenu"""
+        meta_path, body_path = self._paths(key)
+        with self._lock:
+            if key not in self._index:
+                return
+            self._write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+            now = time.time()
+            try:
+                os.utime(body_path, (now, now))
+            except OSError:
+                pass
+            self._index[key] = (self._index[key][0], now)
+
+    def delete(self, key: str) -> None:
+        """Supprime une entrée"""
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Supprime toutes les entrées"""
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        size = self._index.pop(key, (0, 0))[0]
+        self._total_bytes -= size
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        """Supprime les entrées les moins récemment utilisées au-delà des limites"""
+        too_many = self.max_entries is not None and len(self._index) > self.max_entries
+        if self._total_bytes <= self.max_bytes and not too_many:
+            return
+
+        for key, _ in sorted(self._index.items(), key=lambda item: item[1][1]):
+            too_many = self.max_entries is not None and len(self._index) > self.max_entries
+            if self._total_bytes <= self.max_bytes and not too_many:
+                break
+            self._remove(key)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
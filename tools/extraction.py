@@ -0,0 +1,442 @@
+"""
+Moteur d'extraction en une seule passe pour les pages scrapées.
+Le document est parcouru une seule fois: chaque balise est classée en même
+temps contre toutes les règles de section, au lieu d'enchaîner un find_all
+par section.
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, Tag
+from decouple import config
+
+# Analyseur HTML. html.parser par défaut: lxml est plus rapide mais répare
+# autrement le HTML mal formé (sections extraites différentes), il faut donc
+# le demander explicitement (SCRAPER_PARSER=lxml)
+DEFAULT_PARSER = config("SCRAPER_PARSER", default="html.parser")
+if DEFAULT_PARSER == "lxml":
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        print("⚠️ SCRAPER_PARSER=lxml mais lxml n'est pas installé: utilisation de html.parser")
+        DEFAULT_PARSER = "html.parser"
+
+# Règles de section: nom -> (balises concernées, motif appliqué aux classes CSS)
+SECTION_RULES: Dict[str, Tuple[Tuple[str, ...], "re.Pattern"]] = {
+    "program_name": (("h1", "h2"), re.compile(r'(title|heading)')),
+    "admission": (("div", "section"), re.compile(r'(admission|requirements|condition)')),
+    "skills": (("div", "section", "ul"), re.compile(r'(skills|competences|attendues)')),
+    "institution_name": (("h1", "h2", "div"), re.compile(r'(title|name|logo)')),
+    "mission": (("div", "section", "article"), re.compile(r'(about|mission|presentation)')),
+    "values": (("div", "section"), re.compile(r'(values|philosophy|approach)')),
+}
+
+# Sections utiles selon le type de page
+PROFILE_SECTIONS = {
+    "parcoursup": ("program_name", "admission", "skills"),
+    "etablissement": ("institution_name", "mission", "values"),
+}
+
+# Sections dont seule la première occurrence est retenue
+SINGLE_SECTIONS = ("program_name", "institution_name")
+
+# Conteneurs du contenu principal et balises de texte retenues
+MAIN_CONTAINER_TAGS = ("main", "article", "div", "section")
+MAIN_CONTAINER_PATTERN = re.compile(r'(content|main|article)')
+MAX_MAIN_CONTAINERS = 3
+CONTAINER_TEXT_TAGS = ("p", "h1", "h2", "h3", "h4", "li")
+FALLBACK_TEXT_TAGS = ("p", "h1", "h2", "h3", "h4")
+MIN_PARAGRAPH_LENGTH = 20
+
+
+def clean_text(text: str) -> str:
+    """Nettoie le texte extrait"""
+    # Supprimer les espaces et sauts de ligne multiples
+    text = re.sub(r'\s+', ' ', text)
+    # Supprimer les caractères de contrôle
+    text = re.sub(r'[\x00-\x1F\x7F]', '', text)
+    return text.strip()
+
+
+def class_matches(classes: Any, pattern: "re.Pattern") -> bool:
+    """Reproduit la correspondance de classe_=re.compile(...) de BeautifulSoup"""
+    if not classes:
+        return False
+    if isinstance(classes, str):
+        return pattern.search(classes) is not None
+    if any(pattern.search(c) for c in classes):
+        return True
+    return pattern.search(" ".join(classes)) is not None
+
+
+def classify(tag_name: str, classes: Any, sections: Tuple[str, ...]) -> List[str]:
+    """Retourne les sections auxquelles appartient une balise"""
+    matched = []
+    for section in sections:
+        tags, pattern = SECTION_RULES[section]
+        if tag_name in tags and class_matches(classes, pattern):
+            matched.append(section)
+    return matched
+
+
+def make_soup(html_content: str, parser: Optional[str] = None) -> BeautifulSoup:
+    """Construit l'arbre HTML avec le backend le plus rapide disponible"""
+    return BeautifulSoup(html_content, parser or DEFAULT_PARSER)
+
+
+def extract_page_record(soup: BeautifulSoup, profile: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Parcourt le document une seule fois et extrait toutes les sections.
+
+    Args:
+        soup: Document HTML analysé
+        profile: 'parcoursup', 'etablissement' ou None pour toutes les sections
+
+    Returns:
+        dict: Enregistrement structuré (title, description, sections, main_content)
+    """
+    if profile is None:
+        sections = tuple(SECTION_RULES)
+    else:
+        sections = PROFILE_SECTIONS[profile]
+
+    title_tag = None
+    meta_tag = None
+    matches: Dict[str, List[Tag]] = {section: [] for section in sections}
+    containers: List[List[Tag]] = []
+    container_count = 0
+    fallback: List[Tag] = []
+
+    # Parcours en profondeur (ordre du document); chaque entrée de pile porte
+    # les indices des conteneurs principaux ouverts au-dessus de la balise
+    stack: List[Tuple[Tag, Tuple[int, ...]]] = [(soup, ())]
+    while stack:
+        node, open_containers = stack.pop()
+        name = node.name
+
+        if node is not soup:
+            if name == "title" and title_tag is None:
+                title_tag = node
+            elif name == "meta" and meta_tag is None and node.get("name") == "description":
+                meta_tag = node
+
+            classes = node.get("class")
+            if classes:
+                for section in classify(name, classes, sections):
+                    if section in SINGLE_SECTIONS and matches[section]:
+                        continue
+                    matches[section].append(node)
+
+            if name in CONTAINER_TEXT_TAGS:
+                for index in open_containers:
+                    containers[index].append(node)
+            if name in FALLBACK_TEXT_TAGS:
+                fallback.append(node)
+
+            if name in MAIN_CONTAINER_TAGS and class_matches(classes, MAIN_CONTAINER_PATTERN):
+                if container_count < MAX_MAIN_CONTAINERS:
+                    containers.append([])
+                    open_containers = open_containers + (container_count,)
+                container_count += 1
+
+        children = [child for child in node.children if isinstance(child, Tag)]
+        for child in reversed(children):
+            stack.append((child, open_containers))
+
+    # Le texte n'est calculé que pour les balises retenues
+    record_sections: Dict[str, Any] = {}
+    for section in sections:
+        texts = [clean_text(element.get_text()) for element in matches[section]]
+        if section in SINGLE_SECTIONS:
+            record_sections[section] = texts[0] if texts else ""
+        else:
+            record_sections[section] = texts
+
+    if container_count:
+        paragraphs = [element for container in containers for element in container]
+    else:
+        paragraphs = fallback
+    main_content = ""
+    for element in paragraphs:
+        text = clean_text(element.get_text())
+        if len(text) > MIN_PARAGRAPH_LENGTH:
+            main_content += text + "\n"
+
+    if meta_tag is not None and meta_tag.get("content"):
+        description = meta_tag["content"].strip()
+    else:
+        description = "Description non trouvée"
+
+    return {
+        "title": title_tag.get_text().strip() if title_tag is not None else "Titre non trouvé",
+        "description": description,
+        "sections": record_sections,
+        "main_content": main_content,
+    }
+
+
+def format_parcoursup_specific(record: Dict[str, Any]) -> str:
+    """Met en forme les sections Parcoursup d'un enregistrement"""
+    sections = record["sections"]
+    parcoursup_info = ""
+    admission_info = "".join(text + "\n" for text in sections["admission"])
+    skills_info = "".join(text + "\n" for text in sections["skills"])
+
+    if sections["program_name"]:
+        parcoursup_info += f"Program: {sections['program_name']}\n\n"
+    if admission_info:
+        parcoursup_info += f"Admission Requirements:\n{admission_info}\n"
+    if skills_info:
+        parcoursup_info += f"Expected Skills:\n{skills_info}\n"
+    return parcoursup_info
+
+
+def format_establishment_specific(record: Dict[str, Any]) -> str:
+    """Met en forme les sections établissement d'un enregistrement"""
+    sections = record["sections"]
+    establishment_info = ""
+    mission_info = "".join(text + "\n" for text in sections["mission"])
+    values_info = "".join(text + "\n" for text in sections["values"])
+
+    if sections["institution_name"]:
+        establishment_info += f"Institution: {sections['institution_name']}\n\n"
+    if mission_info:
+        establishment_info += f"Mission:\n{mission_info}\n"
+    if values_info:
+        establishment_info += f"Values and Approach:\n{values_info}\n"
+    return establishment_info
+
+
+def format_scrape_result(record: Dict[str, Any], specific: str) -> str:
+    """Assemble le texte final renvoyé par les fonctions de scraping"""
+    result = f"Title: {record['title']}\n\n"
+    if specific:
+        result += specific
+    else:
+        result += f"Description: {record['description']}\n\n"
+
+    # Ajouter le contenu principal si les informations spécifiques sont limitées
+    if len(specific) < 200 and record["main_content"]:
+        result += f"Additional Information:\n{record['main_content'][:1000]}...\n"
+    return result
+
+
+# Balises sans fermeture: jamais empilées par l'analyseur incrémental
+VOID_TAGS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+))
+
+# Balises dont le contenu n'est pas du texte visible
+SKIPPED_TEXT_TAGS = frozenset(("script", "style", "template", "noscript"))
+
+# Balises qui ferment implicitement un paragraphe resté ouvert
+PARAGRAPH_CLOSERS = frozenset((
+    "p", "div", "section", "article", "main", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+    "table", "form", "header", "footer", "nav", "aside",
+))
+
+
+class _TextBuffer:
+    """Accumulateur de texte borné"""
+
+    __slots__ = ("parts", "size", "limit")
+
+    def __init__(self, limit: int):
+        self.parts: List[str] = []
+        self.size = 0
+        self.limit = limit
+
+    def append(self, data: str) -> None:
+        room = self.limit - self.size
+        if room > 0:
+            piece = data[:room]
+            self.parts.append(piece)
+            self.size += len(piece)
+
+    @property
+    def full(self) -> bool:
+        return self.size >= self.limit
+
+    def text(self) -> str:
+        return clean_text("".join(self.parts))
+
+
+class StreamingPageExtractor(HTMLParser):
+    """
+    Extracteur incrémental: reçoit le HTML par morceaux (feed) et applique
+    les mêmes règles de section que extract_page_record sans construire d'arbre.
+    La mémoire est bornée par les limites de texte, et la propriété `done`
+    indique que les sections utiles ont été collectées (arrêt anticipé possible).
+    """
+
+    def __init__(self, profile: str, section_budget: int = 8000,
+                 main_content_limit: int = 1000, max_items: int = 50):
+        """
+        Initialise l'extracteur.
+
+        Args:
+            profile: 'parcoursup' ou 'etablissement'
+            section_budget: Nombre de caractères de sections au-delà duquel l'extraction s'arrête
+            main_content_limit: Caractères conservés pour le contenu principal
+            max_items: Nombre maximum d'éléments retenus par section
+        """
+        super().__init__(convert_charrefs=True)
+        self.sections = PROFILE_SECTIONS[profile]
+        self.section_budget = section_budget
+        self.main_content_limit = main_content_limit
+        self.max_items = max_items
+
+        # Pile des éléments ouverts: (nom, tampons ouverts par cet élément, conteneurs ouverts)
+        self._stack: List[Tuple[str, List[_TextBuffer], Tuple[int, ...]]] = []
+        self._skip_depth = 0
+        self._title: Optional[_TextBuffer] = None
+        self._title_closed = False
+        self._description: Optional[str] = None
+        self._meta_seen = False
+        self._matches: Dict[str, List[_TextBuffer]] = {section: [] for section in self.sections}
+        self._containers: List[List[_TextBuffer]] = []
+        self._container_count = 0
+        self._fallback: List[_TextBuffer] = []
+        self._active: List[_TextBuffer] = []
+
+    # -- Suivi de la pile -------------------------------------------------
+
+    def _refresh_active(self) -> None:
+        self._active = [buffer for _, buffers, _ in self._stack for buffer in buffers if not buffer.full]
+
+    def _pop_to(self, name: str) -> None:
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == name:
+                for popped_name, _, _ in self._stack[index:]:
+                    if popped_name in SKIPPED_TEXT_TAGS:
+                        self._skip_depth -= 1
+                    if popped_name == "title":
+                        self._title_closed = True
+                del self._stack[index:]
+                self._refresh_active()
+                return
+
+    def _close_implicit(self, name: str) -> None:
+        if not self._stack:
+            return
+        if name in PARAGRAPH_CLOSERS and self._stack[-1][0] == "p":
+            self._pop_to("p")
+        elif name == "li":
+            for open_name, _, _ in reversed(self._stack):
+                if open_name in ("ul", "ol"):
+                    break
+                if open_name == "li":
+                    self._pop_to("li")
+                    break
+
+    def _main_content_full(self, buffers: List[_TextBuffer]) -> bool:
+        return sum(buffer.size for buffer in buffers) > self.main_content_limit * 2
+
+    # -- Callbacks HTMLParser ---------------------------------------------
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        attributes = dict(attrs)
+
+        if tag == "meta":
+            if not self._meta_seen and attributes.get("name") == "description":
+                self._meta_seen = True
+                self._description = attributes.get("content")
+            return
+        if tag in VOID_TAGS:
+            return
+
+        self._close_implicit(tag)
+        open_containers = self._stack[-1][2] if self._stack else ()
+        buffers: List[_TextBuffer] = []
+
+        if tag == "title" and self._title is None:
+            self._title = _TextBuffer(1000)
+            buffers.append(self._title)
+
+        classes = (attributes.get("class") or "").split()
+        if classes:
+            for section in classify(tag, classes, self.sections):
+                found = self._matches[section]
+                if section in SINGLE_SECTIONS and found:
+                    continue
+                if len(found) < self.max_items:
+                    buffer = _TextBuffer(self.section_budget)
+                    found.append(buffer)
+                    buffers.append(buffer)
+
+        if tag in CONTAINER_TEXT_TAGS:
+            for index in open_containers:
+                if not self._main_content_full(self._containers[index]):
+                    buffer = _TextBuffer(self.main_content_limit)
+                    self._containers[index].append(buffer)
+                    buffers.append(buffer)
+        if tag in FALLBACK_TEXT_TAGS and not self._main_content_full(self._fallback):
+            buffer = _TextBuffer(self.main_content_limit)
+            self._fallback.append(buffer)
+            buffers.append(buffer)
+
+        if tag in MAIN_CONTAINER_TAGS and class_matches(classes, MAIN_CONTAINER_PATTERN):
+            if self._container_count < MAX_MAIN_CONTAINERS:
+                self._containers.append([])
+                open_containers = open_containers + (self._container_count,)
+            self._container_count += 1
+
+        if tag in SKIPPED_TEXT_TAGS:
+            self._skip_depth += 1
+        self._stack.append((tag, buffers, open_containers))
+        if buffers:
+            self._refresh_active()
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag not in VOID_TAGS:
+            self._pop_to(tag)
+
+    def handle_data(self, data: str) -> None:
+        if self._skip_depth or not self._active:
+            return
+        for buffer in self._active:
+            buffer.append(data)
+
+    # -- Résultat -----------------------------------------------------------
+
+    @property
+    def done(self) -> bool:
+        """Indique que les sections nécessaires sont collectées"""
+        if self._title is not None and not self._title_closed:
+            return False
+        collected = sum(
+            buffer.size
+            for section in self.sections if section not in SINGLE_SECTIONS
+            for buffer in self._matches[section]
+        )
+        return collected >= self.section_budget
+
+    def record(self) -> Dict[str, Any]:
+        """Retourne un enregistrement au même format que extract_page_record"""
+        record_sections: Dict[str, Any] = {}
+        for section in self.sections:
+            texts = [buffer.text() for buffer in self._matches[section]]
+            if section in SINGLE_SECTIONS:
+                record_sections[section] = texts[0] if texts else ""
+            else:
+                record_sections[section] = texts
+
+        paragraphs = [buffer for container in self._containers for buffer in container]
+        if not self._container_count:
+            paragraphs = self._fallback
+        main_content = ""
+        for buffer in paragraphs:
+            text = buffer.text()
+            if len(text) > MIN_PARAGRAPH_LENGTH:
+                main_content += text + "\n"
+
+        description = self._description.strip() if self._description else "Description non trouvée"
+        return {
+            "title": self._title.text() if self._title is not None else "Titre non trouvé",
+            "description": description,
+            "sections": record_sections,
+            "main_content": main_content,
+        }
@@ -0,0 +1,198 @@
+"""
+Cache HTTP persistant pour les pages scrapées.
+Les réponses sont indexées par URL canonique et revalidées avec
+If-None-Match / If-Modified-Since une fois leur durée de vie écoulée.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from decouple import config
+
+from tools.disk_cache import DiskCache
+
+# Dossier de stockage du cache HTTP
+HTTP_CACHE_DIR = "http_cache"
+
+# En-têtes de réponse conservés avec le contenu
+STORED_HEADERS = ("ETag", "Last-Modified", "Content-Type", "Cache-Control", "Expires")
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalise une URL pour qu'une même page donne toujours la même clé:
+    schéma et hôte en minuscules, port par défaut retiré, fragment supprimé,
+    paramètres de requête triés.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def parse_domain_ttls(value: str) -> Dict[str, int]:
+    """Convertit 'parcoursup.fr=86400,univ-paris.fr=3600' en dictionnaire"""
+    ttls = {}
+    for item in value.split(","):
+        if "=" in item:
+            domain, ttl = item.split("=", 1)
+            ttls[domain.strip().lower()] = int(ttl)
+    return ttls
+
+
+class HttpCache:
+    """
+    Cache des réponses HTTP sur disque.
+    - Clé: empreinte de l'URL canonique
+    - Stocke le contenu, les en-têtes utiles et la date de récupération
+    - Durée de vie configurable par domaine
+    - Mode hors ligne: sert les entrées périmées sans contacter le site
+    """
+
+    def __init__(self, directory: str = HTTP_CACHE_DIR,
+                 default_ttl: int = 6 * 3600,
+                 domain_ttls: Optional[Dict[str, int]] = None,
+                 max_bytes: int = 200 * 1024 * 1024,
+                 offline: bool = False):
+        """
+        Initialise le cache HTTP.
+
+        Args:
+            directory: Dossier de stockage
+            default_ttl: Durée de fraîcheur par défaut (en secondes)
+            domain_ttls: Durées de fraîcheur par domaine (sous-domaines inclus)
+            max_bytes: Taille maximale du cache avant éviction LRU
+            offline: Si True, ne jamais contacter le réseau quand une entrée existe
+        """
+        self.default_ttl = default_ttl
+        self.domain_ttls = domain_ttls or {}
+        self.offline = offline
+        self.store = DiskCache(directory, max_bytes=max_bytes)
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(canonical_url(url).encode("utf-8")).hexdigest()
+
+    def ttl_for(self, url: str) -> int:
+        """Retourne la durée de fraîcheur applicable à l'URL"""
+        host = urlsplit(url).hostname or ""
+        best_match = None
+        for domain in self.domain_ttls:
+            if host == domain or host.endswith("." + domain):
+                if best_match is None or len(domain) > len(best_match):
+                    best_match = domain
+        return self.domain_ttls[best_match] if best_match else self.default_ttl
+
+    def lookup(self, url: str, with_body: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Cherche une réponse en cache.
+
+        Args:
+            url: URL recherchée
+            with_body: Si False, seules les métadonnées sont lues (body vaut None)
+
+        Returns:
+            dict or None: Entrée avec les clés 'meta' et 'body', ou None
+        """
+        if not with_body:
+            meta = self.store.get_meta(self._key(url))
+            return {"meta": meta, "body": None} if meta is not None else None
+        cached = self.store.get(self._key(url))
+        if cached is None:
+            return None
+        meta, body = cached
+        return {"meta": meta, "body": body}
+
+    def is_fresh(self, url: str, entry: Dict[str, Any]) -> bool:
+        """Indique si l'entrée peut être servie sans revalidation"""
+        age = time.time() - entry["meta"].get("fetched_at", 0)
+        return age < self.ttl_for(url)
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Construit les en-têtes de revalidation à partir d'une entrée"""
+        if not entry:
+            return {}
+        headers = {}
+        stored = entry["meta"].get("headers", {})
+        if stored.get("ETag"):
+            headers["If-None-Match"] = stored["ETag"]
+        if stored.get("Last-Modified"):
+            headers["If-Modified-Since"] = stored["Last-Modified"]
+        return headers
+
+    @staticmethod
+    def text(entry: Dict[str, Any]) -> str:
+        """Décode le contenu d'une entrée comme le ferait response.text"""
+        encoding = entry["meta"].get("encoding") or "utf-8"
+        return str(entry["body"], encoding, errors="replace")
+
+    def store_response(self, url: str, response) -> None:
+        """Enregistre une réponse 200 complète"""
+        meta = {
+            "url": canonical_url(url),
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+            "encoding": response.encoding or response.apparent_encoding,
+            "fetched_at": time.time(),
+        }
+        self.store.put(self._key(url), meta, response.content)
+
+    def open_body(self, url: str):
+        """Ouvre le contenu en cache d'une URL pour une lecture par morceaux"""
+        return self.store.open_body(self._key(url))
+
+    def spool_path(self) -> str:
+        """Chemin temporaire où écrire un contenu reçu en flux"""
+        return self.store.temp_path()
+
+    def store_spooled(self, url: str, response, encoding: str, path: str) -> None:
+        """Enregistre une réponse reçue en flux et écrite dans un fichier temporaire"""
+        meta = {
+            "url": canonical_url(url),
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+            "encoding": encoding,
+            "fetched_at": time.time(),
+        }
+        self.store.put_file(self._key(url), meta, path)
+
+    def mark_revalidated(self, url: str, entry: Dict[str, Any], response) -> None:
+        """Rafraîchit une entrée après une réponse 304, sans retélécharger le contenu"""
+        meta = dict(entry["meta"])
+        headers = dict(meta.get("headers", {}))
+        for name in ("ETag", "Last-Modified", "Cache-Control", "Expires"):
+            if name in response.headers:
+                headers[name] = response.headers[name]
+        meta["headers"] = headers
+        meta["fetched_at"] = time.time()
+        entry["meta"] = meta
+        self.store.update_meta(self._key(url), meta)
+
+
+_cache: Optional[HttpCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> Optional[HttpCache]:
+    """Retourne le cache HTTP partagé, ou None s'il est désactivé"""
+    global _cache
+    if not config("HTTP_CACHE_ENABLED", default=True, cast=bool):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache(
+                directory=config("HTTP_CACHE_DIR", default=HTTP_CACHE_DIR),
+                default_ttl=config("HTTP_CACHE_TTL", default=6 * 3600, cast=int),
+                domain_ttls=parse_domain_ttls(config("HTTP_CACHE_DOMAIN_TTLS", default="parcoursup.fr=86400")),
+                max_bytes=config("HTTP_CACHE_MAX_MB", default=200, cast=int) * 1024 * 1024,
+                offline=config("HTTP_CACHE_OFFLINE", default=False, cast=bool),
+            )
+        return _cache
@@ -0,0 +1,159 @@
+"""
+Client HTTP partagé pour les outils de scraping.
+Réutilise les connexions TCP/TLS (keep-alive) grâce à des pools par hôte,
+au lieu d'ouvrir une nouvelle connexion à chaque requête.
+"""
+
+import atexit
+import random
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from decouple import config
+
+# User agents pour simuler différents navigateurs
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36',
+]
+
+
+def _supported_encodings() -> str:
+    """Retourne les encodages de compression que urllib3 sait décoder"""
+    encodings = ["gzip", "deflate"]
+    try:
+        import brotli  # noqa: F401
+        encodings.append("br")
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            encodings.append("br")
+        except ImportError:
+            pass
+    return ", ".join(encodings)
+
+
+class HttpClient:
+    """
+    Client HTTP thread-safe avec pools de connexions par hôte.
+    - Une session requests par thread, toutes montées sur les mêmes adaptateurs
+      (les pools urllib3 sont partagés et thread-safe)
+    - En-têtes construits une seule fois pour toute la durée de vie du client
+    - Négociation gzip/brotli selon les décodeurs disponibles
+    - Utilisable comme gestionnaire de contexte pour libérer les connexions
+    """
+
+    def __init__(self,
+                 pool_connections: int = 10,
+                 pool_maxsize: int = 10,
+                 connect_timeout: float = 5.0,
+                 read_timeout: float = 10.0,
+                 headers: Optional[Dict[str, str]] = None):
+        """
+        Initialise le client HTTP.
+
+        Args:
+            pool_connections: Nombre d'hôtes distincts dont le pool est conservé
+            pool_maxsize: Nombre maximum de connexions gardées ouvertes par hôte
+            connect_timeout: Délai maximum (en secondes) pour établir la connexion
+            read_timeout: Délai maximum (en secondes) entre deux octets reçus
+            headers: En-têtes supplémentaires à envoyer avec chaque requête
+        """
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.headers = {
+            'User-Agent': random.choice(USER_AGENTS),
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'fr,fr-FR;q=0.8,en-US;q=0.5,en;q=0.3',
+            'Accept-Encoding': _supported_encodings(),
+            'Referer': 'https://www.google.com/',
+            'DNT': '1',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+        }
+        if headers:
+            self.headers.update(headers)
+
+        self._adapter = HTTPAdapter(pool_connections=pool_connections,
+                                    pool_maxsize=pool_maxsize)
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _get_session(self) -> requests.Session:
+        """Retourne la session du thread courant (créée à la première utilisation)"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Le client HTTP a été fermé")
+                session = requests.Session()
+                session.headers.update(self.headers)
+                session.mount("http://", self._adapter)
+                session.mount("https://", self._adapter)
+                self._sessions.append(session)
+            self._local.session = session
+        return session
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        """
+        Effectue une requête GET en réutilisant les connexions du pool.
+
+        Args:
+            url: URL à récupérer
+            **kwargs: Arguments supplémentaires transmis à requests
+
+        Returns:
+            requests.Response: La réponse HTTP
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        return self._get_session().get(url, **kwargs)
+
+    def close(self) -> None:
+        """Ferme toutes les sessions et les connexions ouvertes"""
+        with self._lock:
+            self._closed = True
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+            self._adapter.close()
+
+    def __enter__(self) -> "HttpClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Retourne le client HTTP partagé du processus (créé à la demande)"""
+    global _client
+    with _client_lock:
+        if _client is None or _client._closed:
+            _client = HttpClient(
+                pool_connections=config("HTTP_POOL_CONNECTIONS", default=10, cast=int),
+                pool_maxsize=config("HTTP_POOL_MAXSIZE", default=10, cast=int),
+                connect_timeout=config("HTTP_CONNECT_TIMEOUT", default=5.0, cast=float),
+                read_timeout=config("HTTP_READ_TIMEOUT", default=10.0, cast=float),
+            )
+        return _client
+
+
+def close_http_client() -> None:
+    """Ferme le client HTTP partagé s'il a été créé"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+atexit.register(close_http_client)
@@ -1,45 +1,70 @@
 import requests
 from bs4 import BeautifulSoup
+import codecs
 import re
 import time
 import random
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional
 import sys
 import os
 
+from decouple import config
+
 # Ajouter le répertoire parent au chemin pour importer quota_manager
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from quota_manager import quota_manager
+from tools.http_client import USER_AGENTS, get_http_client
+from tools.http_cache import HttpCache, get_http_cache
+from tools.extraction import (
+    StreamingPageExtractor,
+    extract_page_record,
+    format_establishment_specific,
+    format_parcoursup_specific,
+    format_scrape_result,
+    make_soup,
+)
+
+# Ingestion en flux: lecture par morceaux avec taille maximale et arrêt anticipé
+STREAMING_ENABLED = config("SCRAPER_STREAMING", default=False, cast=bool)
+STREAM_MAX_BYTES = config("SCRAPER_MAX_BYTES", default=2 * 1024 * 1024, cast=int)
+STREAM_CHUNK_SIZE = config("SCRAPER_CHUNK_SIZE", default=16 * 1024, cast=int)
+STREAM_SECTION_BUDGET = config("SCRAPER_SECTION_BUDGET", default=8000, cast=int)
 
-# User agents pour simuler différents navigateurs
-USER_AGENTS = [
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15',
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
-    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36',
-]
+_HEADER_CHARSET = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
 
 def get_random_user_agent():
     """Retourne un User-Agent aléatoire"""
     return random.choice(USER_AGENTS)
 
 def fetch_url_content(url: str) -> Optional[str]:
-    """Récupère le contenu d'une URL avec gestion d'erreur et retry"""
-    headers = {
-        'User-Agent': get_random_user_agent(),
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'fr,fr-FR;q=0.8,en-US;q=0.5,en;q=0.3',
-        'Referer': 'https://www.google.com/',
-        'DNT': '1',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-    }
+    """Récupère le contenu d'une URL avec cache, gestion d'erreur et retry"""
+    client = get_http_client()
+    cache = get_http_cache()
+    
+    # Servir depuis le cache si l'entrée est encore fraîche (ou en mode hors ligne)
+    entry = cache.lookup(url) if cache else None
+    if entry and (cache.offline or cache.is_fresh(url, entry)):
+        return cache.text(entry)
+    if cache and cache.offline:
+        print(f"Mode hors ligne: aucune copie en cache pour {url}")
+        return None
+    
+    # En-têtes de revalidation (If-None-Match / If-Modified-Since)
+    headers = HttpCache.conditional_headers(entry)
     
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            # Le client partagé réutilise les connexions ouvertes vers le même hôte
+            response = client.get(url, headers=headers)
+            if response.status_code == 304 and entry:
+                # Contenu inchangé: pas de nouveau téléchargement
+                cache.mark_revalidated(url, entry, response)
+                return cache.text(entry)
             response.raise_for_status()  # Lève une exception pour les codes d'erreur HTTP
+            if cache:
+                cache.store_response(url, response)
             return response.text
         except requests.exceptions.RequestException as e:
             print(f"Erreur lors de la tentative {attempt+1}/{max_retries}: {e}")
@@ -50,15 +75,209 @@ def fetch_url_content(url: str) -> Optional[str]:
                 time.sleep(wait_time)
             else:
                 print("Échec après plusieurs tentatives.")
+                if entry:
+                    # Site injoignable: servir la copie périmée plutôt que rien
+                    print("Utilisation de la copie en cache (périmée).")
+                    return cache.text(entry)
                 return None
 
-def clean_text(text: str) -> str:
-    """Nettoie le texte extrait"""
-    # Supprimer les espaces et sauts de ligne multiples
-    text = re.sub(r'\s+', ' ', text)
-    # Supprimer les caractères de contrôle
-    text = re.sub(r'[\x00-\x1F\x7F]', '', text)
-    return text.strip()
+def detect_charset(content_type: Optional[str], head: bytes) -> str:
+    """Détermine l'encodage une seule fois: en-tête HTTP, BOM, balise meta puis UTF-8"""
+    candidates = []
+    if content_type:
+        match = _HEADER_CHARSET.search(content_type)
+        if match:
+            candidates.append(match.group(1))
+    if head.startswith(codecs.BOM_UTF8):
+        candidates.append("utf-8-sig")
+    match = _META_CHARSET.search(head[:4096])
+    if match:
+        candidates.append(match.group(1).decode("ascii", errors="ignore"))
+    
+    for candidate in candidates:
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+class _ClosingChunks:
+    """
+    Itérateur de morceaux qui ferme sa ressource (fichier en cache, réponse HTTP)
+    à sa fermeture. Un générateur fermé ou abandonné avant son premier morceau
+    n'exécute jamais son `with`/`finally`: la ressource est donc fermée ici.
+    """
+    
+    def __init__(self, chunks: Iterator[str], resource):
+        self._chunks = chunks
+        self._resource = resource
+    
+    def __iter__(self) -> "_ClosingChunks":
+        return self
+    
+    def __next__(self) -> str:
+        return next(self._chunks)
+    
+    def close(self) -> None:
+        try:
+            self._chunks.close()
+        finally:
+            self._resource.close()
+    
+    def __del__(self):
+        self.close()
+
+def _iter_cached_body(handle, encoding: str, chunk_size: int, max_bytes: int) -> Iterator[str]:
+    """Relit un contenu en cache par morceaux"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    received = 0
+    with handle:
+        while received < max_bytes:
+            chunk = handle.read(min(chunk_size, max_bytes - received))
+            if not chunk:
+                break
+            received += len(chunk)
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+def _cached_chunks(handle, encoding: str, chunk_size: int, max_bytes: int) -> _ClosingChunks:
+    """Morceaux d'un contenu en cache; le fichier est fermé avec l'itérateur"""
+    return _ClosingChunks(_iter_cached_body(handle, encoding, chunk_size, max_bytes), handle)
+
+def _iter_response_body(url: str, response, cache: Optional[HttpCache],
+                        chunk_size: int, max_bytes: int) -> Iterator[str]:
+    """
+    Lit le corps d'une réponse par morceaux, dans la limite de max_bytes.
+    Le contenu n'est mis en cache (via un fichier temporaire) que s'il a été lu en entier.
+    """
+    spool_path = cache.spool_path() if cache else None
+    spool = open(spool_path, "wb") if spool_path else None
+    decoder = None
+    encoding = "utf-8"
+    received = 0
+    complete = False
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if decoder is None:
+                encoding = detect_charset(response.headers.get("Content-Type"), chunk)
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            if received + len(chunk) > max_bytes:
+                # Taille maximale atteinte: on garde le début et on s'arrête
+                text = decoder.decode(chunk[:max_bytes - received], final=True)
+                if text:
+                    yield text
+                break
+            received += len(chunk)
+            if spool:
+                spool.write(chunk)
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        else:
+            complete = True
+            if decoder is not None:
+                tail = decoder.decode(b"", final=True)
+                if tail:
+                    yield tail
+    finally:
+        response.close()
+        if spool:
+            spool.close()
+            if complete:
+                cache.store_spooled(url, response, encoding, spool_path)
+            else:
+                os.remove(spool_path)
+
+def stream_url_content(url: str, max_bytes: Optional[int] = None,
+                       chunk_size: Optional[int] = None) -> Optional[Iterator[str]]:
+    """
+    Ouvre une URL en flux et retourne un itérateur de morceaux de texte décodés.
+    Fermer l'itérateur avant la fin interrompt le téléchargement.
+    
+    Returns:
+        Iterator[str] or None: Morceaux de texte, ou None si l'URL est inaccessible
+    """
+    max_bytes = max_bytes or STREAM_MAX_BYTES
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    client = get_http_client()
+    cache = get_http_cache()
+    
+    entry = cache.lookup(url, with_body=False) if cache else None
+    if entry and (cache.offline or cache.is_fresh(url, entry)):
+        handle = cache.open_body(url)
+        if handle:
+            return _cached_chunks(handle, entry["meta"].get("encoding") or "utf-8", chunk_size, max_bytes)
+    if cache and cache.offline:
+        print(f"Mode hors ligne: aucune copie en cache pour {url}")
+        return None
+    
+    headers = HttpCache.conditional_headers(entry)
+    
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            response = client.get(url, headers=headers, stream=True)
+            if response.status_code == 304 and entry:
+                response.close()
+                cache.mark_revalidated(url, entry, response)
+                handle = cache.open_body(url)
+                if handle:
+                    return _cached_chunks(handle, entry["meta"].get("encoding") or "utf-8", chunk_size, max_bytes)
+                headers = {}
+                continue
+            response.raise_for_status()
+            return _ClosingChunks(_iter_response_body(url, response, cache, chunk_size, max_bytes), response)
+        except requests.exceptions.RequestException as e:
+            print(f"Erreur lors de la tentative {attempt+1}/{max_retries}: {e}")
+            if attempt < max_retries - 1:
+                wait_time = 2 ** attempt
+                print(f"Nouvelle tentative dans {wait_time} secondes...")
+                time.sleep(wait_time)
+            else:
+                print("Échec après plusieurs tentatives.")
+                handle = cache.open_body(url) if entry else None
+                if handle:
+                    print("Utilisation de la copie en cache (périmée).")
+                    return _cached_chunks(handle, entry["meta"].get("encoding") or "utf-8", chunk_size, max_bytes)
+                return None
+    return None
+
+def extract_record_streaming(url: str, profile: str) -> Optional[Dict[str, Any]]:
+    """
+    Extrait les sections d'une page sans la charger entièrement en mémoire.
+    Le téléchargement s'arrête dès que les sections utiles sont collectées.
+    """
+    chunks = stream_url_content(url)
+    if chunks is None:
+        return None
+    
+    extractor = StreamingPageExtractor(profile, section_budget=STREAM_SECTION_BUDGET)
+    try:
+        for text in chunks:
+            extractor.feed(text)
+            if extractor.done:
+                break
+    except requests.exceptions.RequestException as e:
+        print(f"Lecture interrompue, utilisation du contenu partiel: {e}")
+    finally:
+        chunks.close()
+    extractor.close()
+    return extractor.record()
+
+def load_page_record(url: str, profile: str) -> Optional[Dict[str, Any]]:
+    """Récupère une page et en extrait les sections (en flux si activé)"""
+    if STREAMING_ENABLED:
+        return extract_record_streaming(url, profile)
+    
+    html_content = fetch_url_content(url)
+    if not html_content:
+        return None
+    # Une seule passe sur le document pour toutes les sections
+    return extract_page_record(make_soup(html_content), profile)
 
 def extract_title(soup: BeautifulSoup) -> str:
     """Extrait le titre de la page"""
@@ -74,102 +293,15 @@ def extract_meta_description(soup: BeautifulSoup) -> str:
 
 def extract_main_content(soup: BeautifulSoup) -> str:
     """Extrait le contenu principal de la page"""
-    # Recherche des éléments qui contiennent généralement le contenu principal
-    main_content = ""
-    
-    # Chercher les conteneurs principaux
-    main_containers = soup.find_all(['main', 'article', 'div', 'section'], 
-                                    class_=re.compile(r'(content|main|article)'))
-    
-    if main_containers:
-        for container in main_containers[:3]:  # Prendre les 3 premiers conteneurs les plus pertinents
-            paragraphs = container.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'li'])
-            for p in paragraphs:
-                text = clean_text(p.get_text())
-                if len(text) > 20:  # Ignorer les textes trop courts
-                    main_content += text + "\n"
-    else:
-        # Fallback: prendre tous les paragraphes de la page
-        paragraphs = soup.find_all(['p', 'h1', 'h2', 'h3', 'h4'])
-        for p in paragraphs:
-            text = clean_text(p.get_text())
-            if len(text) > 20:
-                main_content += text + "\n"
-    
-    return main_content
+    return extract_page_record(soup, "parcoursup")["main_content"]
 
 def extract_parcoursup_specific(soup: BeautifulSoup) -> str:
     """Extrait des informations spécifiques à Parcoursup"""
-    parcoursup_info = ""
-    
-    # Extraire les informations sur le programme
-    program_name = ""
-    program_elements = soup.find_all(['h1', 'h2'], class_=re.compile(r'(title|heading)'))
-    if program_elements:
-        program_name = clean_text(program_elements[0].get_text())
-    
-    # Extraire les conditions d'admission
-    admission_info = ""
-    admission_elements = soup.find_all(['div', 'section'], 
-                                      class_=re.compile(r'(admission|requirements|condition)'))
-    if admission_elements:
-        for element in admission_elements:
-            admission_info += clean_text(element.get_text()) + "\n"
-    
-    # Extraire les compétences et connaissances attendues
-    skills_info = ""
-    skills_elements = soup.find_all(['div', 'section', 'ul'], 
-                                   class_=re.compile(r'(skills|competences|attendues)'))
-    if skills_elements:
-        for element in skills_elements:
-            skills_info += clean_text(element.get_text()) + "\n"
-    
-    # Compiler les informations
-    if program_name:
-        parcoursup_info += f"Program: {program_name}\n\n"
-    if admission_info:
-        parcoursup_info += f"Admission Requirements:\n{admission_info}\n"
-    if skills_info:
-        parcoursup_info += f"Expected Skills:\n{skills_info}\n"
-    
-    return parcoursup_info
+    return format_parcoursup_specific(extract_page_record(soup, "parcoursup"))
 
 def extract_establishment_specific(soup: BeautifulSoup) -> str:
     """Extrait des informations spécifiques à l'établissement"""
-    establishment_info = ""
-    
-    # Extraire le nom de l'établissement
-    institution_name = ""
-    name_elements = soup.find_all(['h1', 'h2', 'div'], 
-                                 class_=re.compile(r'(title|name|logo)'))
-    if name_elements:
-        institution_name = clean_text(name_elements[0].get_text())
-    
-    # Extraire la présentation/mission de l'établissement
-    mission_info = ""
-    mission_elements = soup.find_all(['div', 'section', 'article'], 
-                                    class_=re.compile(r'(about|mission|presentation)'))
-    if mission_elements:
-        for element in mission_elements:
-            mission_info += clean_text(element.get_text()) + "\n"
-    
-    # Extraire les valeurs ou la philosophie
-    values_info = ""
-    values_elements = soup.find_all(['div', 'section'], 
-                                   class_=re.compile(r'(values|philosophy|approach)'))
-    if values_elements:
-        for element in values_elements:
-            values_info += clean_text(element.get_text()) + "\n"
-    
-    # Compiler les informations
-    if institution_name:
-        establishment_info += f"Institution: {institution_name}\n\n"
-    if mission_info:
-        establishment_info += f"Mission:\n{mission_info}\n"
-    if values_info:
-        establishment_info += f"Values and Approach:\n{values_info}\n"
-    
-    return establishment_info
+    return format_establishment_specific(extract_page_record(soup, "etablissement"))
 
 def scrape_parcoursup(url: str) -> str:
     """
@@ -184,34 +316,13 @@ Pour une lettre de motivation plus précise, veuillez fournir une URL Parcoursup
         
 La lettre de motivation sera générée avec des informations génériques."""
     
-    html_content = fetch_url_content(url)
-    if not html_content:
+    record = load_page_record(url, "parcoursup")
+    if record is None:
         return "Impossible d'accéder à l'URL Parcoursup. Veuillez vérifier l'URL et réessayer."
     
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Extraire les informations de base
-    title = extract_title(soup)
-    description = extract_meta_description(soup)
-    
-    # Extraire les informations spécifiques à Parcoursup
-    parcoursup_specific = extract_parcoursup_specific(soup)
-    
-    # Extraire le contenu principal
-    main_content = extract_main_content(soup)
+    parcoursup_specific = format_parcoursup_specific(record)
     
-    # Compiler toutes les informations
-    result = f"Title: {title}\n\n"
-    if parcoursup_specific:
-        result += parcoursup_specific
-    else:
-        result += f"Description: {description}\n\n"
-    
-    # Ajouter le contenu principal si les informations spécifiques sont limitées
-    if len(parcoursup_specific) < 200 and main_content:
-        result += f"Additional Information:\n{main_content[:1000]}...\n"
-    
-    return result
+    return format_scrape_result(record, parcoursup_specific)
 
 def scrape_etablissement(url: str) -> str:
     """
@@ -226,31 +337,10 @@ Pour une lettre de motivation plus précise, veuillez fournir une URL valide.
         
 La lettre de motivation sera générée avec des informations génériques."""
     
-    html_content = fetch_url_content(url)
-    if not html_content:
+    record = load_page_record(url, "etablissement")
+    if record is None:
         return "Impossible d'accéder à l'URL de l'établissement. Veuillez vérifier l'URL et réessayer."
     
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Extraire les informations de base
-    title = extract_title(soup)
-    description = extract_meta_description(soup)
-    
-    # Extraire les informations spécifiques à l'établissement
-    establishment_specific = extract_establishment_specific(soup)
-    
-    # Extraire le contenu principal
-    main_content = extract_main_content(soup)
-    
-    # Compiler toutes les informations
-    result = f"Title: {title}\n\n"
-    if establishment_specific:
-        result += establishment_specific
-    else:
-        result += f"Description: {description}\n\n"
-    
-    # Ajouter le contenu principal si les informations spécifiques sont limitées
-    if len(establishment_specific) < 200 and main_content:
-        result += f"Additional Information:\n{main_content[:1000]}...\n"
+    establishment_specific = format_establishment_specific(record)
     
-    return result
+    return format_scrape_result(record, establishment_specific)
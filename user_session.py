@@ -1,22 +1,310 @@
 """
 Module de gestion des sessions utilisateur pour le générateur de lettres de motivation.
 Permet de sauvegarder et charger les informations des utilisateurs.
+
+Un index (manifeste) conserve les métadonnées de chaque session (nom, programme,
+établissement, date): lister les sessions ne lit que ce petit fichier, jamais
+les sessions elles-mêmes. Il est mis à jour à chaque sauvegarde ou suppression
+et peut être reconstruit avec `python user_session.py --rebuild-index`.
+
+Avec SESSION_BACKEND=sqlite, les sessions sont stockées dans une base SQLite
+(mode WAL, colonnes indexées) derrière les mêmes fonctions. Les sessions JSON
+existantes s'importent avec `python user_session.py --migrate-to-sqlite`.
+
+Les textes volumineux (informations du programme, lettres) sont stockés une
+seule fois dans le stockage partagé (blob_store) et référencés par empreinte;
+`python user_session.py --gc-blobs` supprime ceux qui ne sont plus référencés.
 """
 
 import os
+import sys
 import json
 import time
+import uuid
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 
+from decouple import config
+
+from blob_store import blob_store
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: le verrou entre processus n'est pas disponible, seul le verrou local s'applique
+    fcntl = None
+
 # Dossier pour stocker les sessions utilisateurs
 SESSION_DIR = "user_sessions"
 
+# Index des métadonnées des sessions (dans SESSION_DIR)
+MANIFEST_FILE = "_manifest.json"
+
+# Nombre de sessions affichées par page
+SESSION_PAGE_SIZE = 20
+
+# Sérialise les mises à jour de l'index dans le processus
+_manifest_lock = threading.Lock()
+
+# Stockage des sessions: 'json' (un fichier par session) ou 'sqlite'
+SESSION_BACKEND = config("SESSION_BACKEND", default="json").lower()
+SESSION_DB_PATH = config("SESSION_DB_PATH", default="user_sessions.db")
+
+def new_session_id() -> str:
+    """
+    Identifiant de session unique: horodatage (pour le tri) suivi d'un suffixe
+    aléatoire, pour que deux sauvegardes dans la même seconde ne se percutent pas.
+    """
+    return f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+def _format_date(value: Optional[str]) -> str:
+    """Date ISO affichée au format jj/mm/aaaa hh:mm"""
+    try:
+        return datetime.fromisoformat(value).strftime("%d/%m/%Y %H:%M")
+    except (TypeError, ValueError):
+        return value or "Date inconnue"
+
+class SQLiteSessionStore:
+    """
+    Sessions stockées dans une base SQLite unique (mode WAL).
+    - Métadonnées dans des colonnes indexées (utilisateur, programme, établissement, date)
+    - Données complètes de la session dans une colonne JSON
+    - Chaque écriture est une transaction: jamais de session à moitié enregistrée
+    """
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        username TEXT NOT NULL,
+        program TEXT NOT NULL,
+        institution TEXT NOT NULL,
+        status TEXT NOT NULL,
+        updated TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_username ON sessions (username COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS sessions_program ON sessions (program COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS sessions_institution ON sessions (institution COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated);
+    """
+    
+    COLUMNS = ("session_id", "username", "program", "institution", "status", "updated")
+    
+    def __init__(self, path: str = SESSION_DB_PATH, timeout: float = 30.0):
+        """
+        Args:
+            path: Chemin de la base
+            timeout: Délai maximum d'attente du verrou d'écriture (en secondes)
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connect().executescript(self.SCHEMA)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Connexion propre au thread courant"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    
+    @staticmethod
+    def _row(session_id: str, user_data: Dict[str, Any]) -> tuple:
+        entry = _index_entry(session_id, user_data)
+        return (session_id, entry["username"], entry["program"], entry["institution"], entry["status"],
+                entry["last_updated"] or "", json.dumps(user_data, ensure_ascii=False))
+    
+    def save(self, session_id: str, user_data: Dict[str, Any]) -> None:
+        """Enregistre (ou remplace) une session"""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         self._row(session_id, user_data))
+    
+    def save_many(self, sessions: Dict[str, Dict[str, Any]]) -> None:
+        """Enregistre un lot de sessions en une seule transaction"""
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             [self._row(session_id, data) for session_id, data in sessions.items()])
+    
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Données complètes d'une session (None si inconnue)"""
+        row = self._connect().execute("SELECT data FROM sessions WHERE session_id = ?",
+                                      (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def iter_data(self):
+        """Parcourt les données de toutes les sessions"""
+        for (data,) in self._connect().execute("SELECT data FROM sessions"):
+            yield json.loads(data)
+    
+    def delete(self, session_id: str) -> bool:
+        """Supprime une session; False si elle n'existait pas"""
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+    
+    @staticmethod
+    def _filters(username: Optional[str], program: Optional[str]) -> tuple:
+        clauses, params = [], []
+        for column, value in (("username", username), ("program", program)):
+            if value:
+                clauses.append(f"{column} LIKE ? ESCAPE '\\'")
+                escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                params.append(f"%{escaped}%")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+    
+    def count(self, username: Optional[str] = None, program: Optional[str] = None) -> int:
+        where, params = self._filters(username, program)
+        return self._connect().execute(f"SELECT COUNT(*) FROM sessions{where}", params).fetchone()[0]
+    
+    def list(self, offset: int = 0, limit: Optional[int] = None, username: Optional[str] = None,
+             program: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Métadonnées des sessions, la plus récemment mise à jour d'abord (même ordre que
+        l'index JSON, voir _session_order), sans lire les données complètes
+        """
+        where, params = self._filters(username, program)
+        rows = self._connect().execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM sessions{where} ORDER BY updated DESC, session_id DESC "
+            "LIMIT ? OFFSET ?",
+            params + [limit if limit is not None else -1, offset]).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+_session_store: Optional[SQLiteSessionStore] = None
+_session_store_lock = threading.Lock()
+
+def get_session_store() -> Optional[SQLiteSessionStore]:
+    """Base des sessions si SESSION_BACKEND=sqlite (ouverte à la première utilisation), sinon None"""
+    global _session_store
+    if SESSION_BACKEND != "sqlite":
+        return None
+    with _session_store_lock:
+        if _session_store is None:
+            _session_store = SQLiteSessionStore(SESSION_DB_PATH)
+    return _session_store
+
 def ensure_session_dir():
     """S'assure que le dossier de sessions existe"""
     if not os.path.exists(SESSION_DIR):
         os.makedirs(SESSION_DIR)
 
+def _manifest_path() -> str:
+    return os.path.join(SESSION_DIR, MANIFEST_FILE)
+
+def _is_session_file(filename: str) -> bool:
+    """Fichier de session (hors index et fichiers temporaires)"""
+    return filename.endswith('.json') and not filename.startswith('_')
+
+def _write_json_atomic(file_path: str, data: Any, indent: Optional[int] = None) -> None:
+    """Écrit un fichier JSON via un fichier temporaire renommé: jamais de fichier à moitié écrit"""
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, file_path)
+
+@contextmanager
+def _locked_manifest():
+    """Verrouille l'index (threads et, si possible, processus) pendant une lecture-modification-écriture"""
+    ensure_session_dir()
+    with _manifest_lock:
+        with open(os.path.join(SESSION_DIR, "_manifest.lock"), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _index_entry(session_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Métadonnées d'une session conservées dans l'index"""
+    return {
+        "session_id": session_id,
+        "username": (data.get("personal_info") or {}).get("name") or "Utilisateur inconnu",
+        "program": (data.get("program_info") or {}).get("name") or "Programme inconnu",
+        "institution": (data.get("institution_info") or {}).get("name") or "Établissement inconnu",
+        "last_updated": (data.get("metadata") or {}).get("last_updated"),
+        "status": data.get("status", "complete"),
+    }
+
+def _read_manifest() -> Optional[Dict[str, Dict[str, Any]]]:
+    """Lit l'index (None s'il est absent ou illisible)"""
+    try:
+        with open(_manifest_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)["sessions"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Index des sessions illisible, il sera reconstruit: {e}")
+        return None
+
+def _write_manifest(entries: Dict[str, Dict[str, Any]]) -> None:
+    _write_json_atomic(_manifest_path(), {"version": 1, "sessions": entries})
+
+def _update_manifest(session_id: str, entry: Optional[Dict[str, Any]]) -> None:
+    """Ajoute, remplace (entry) ou retire (None) une session de l'index"""
+    with _locked_manifest():
+        entries = _read_manifest()
+        if entries is None:
+            entries = _scan_sessions()
+        if entry is None:
+            entries.pop(session_id, None)
+        else:
+            entries[session_id] = entry
+        _write_manifest(entries)
+
+def _scan_sessions() -> Dict[str, Dict[str, Any]]:
+    """Lit toutes les sessions du dossier pour en extraire les métadonnées"""
+    entries = {}
+    for filename in os.listdir(SESSION_DIR):
+        if not _is_session_file(filename):
+            continue
+        session_id = filename[:-5]  # Enlever l'extension .json
+        try:
+            with open(os.path.join(SESSION_DIR, filename), 'r', encoding='utf-8') as f:
+                entries[session_id] = _index_entry(session_id, json.load(f))
+        except Exception as e:
+            print(f"Erreur lors de la lecture de {filename}: {str(e)}")
+    return entries
+
+def rebuild_manifest() -> int:
+    """
+    Reconstruit l'index à partir des fichiers de session.
+    
+    Returns:
+        int: Nombre de sessions indexées
+    """
+    with _locked_manifest():
+        entries = _scan_sessions()
+        _write_manifest(entries)
+    return len(entries)
+
+def _load_manifest() -> Dict[str, Dict[str, Any]]:
+    """Index des sessions, reconstruit s'il n'existe pas encore"""
+    ensure_session_dir()
+    entries = _read_manifest()
+    if entries is None:
+        rebuild_manifest()
+        entries = _read_manifest() or {}
+    return entries
+
 def save_user_profile(user_data: Dict[str, Any], session_id: Optional[str] = None) -> str:
     """
     Sauvegarde les données de l'utilisateur dans un fichier JSON.
@@ -28,12 +316,9 @@ def save_user_profile(user_data: Dict[str, Any], session_id: Optional[str] = Non
     Returns:
         str: Identifiant de la session
     """
-    ensure_session_dir()
-    
     # Générer un ID de session si non fourni
     if not session_id:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        session_id = f"session_{timestamp}"
+        session_id = new_session_id()
     
     # Ajouter les métadonnées
     if "metadata" not in user_data:
@@ -42,10 +327,19 @@ def save_user_profile(user_data: Dict[str, Any], session_id: Optional[str] = Non
     user_data["metadata"]["session_id"] = session_id
     user_data["metadata"]["last_updated"] = datetime.now().isoformat()
     
-    # Sauvegarder dans le fichier
+    # Les textes volumineux sont stockés à part, une fois par contenu
+    stored_data = blob_store.dehydrate(user_data)
+    
+    store = get_session_store()
+    if store is not None:
+        store.save(session_id, stored_data)
+        return session_id
+    
+    # Sauvegarder dans le fichier (remplacement atomique), puis mettre à jour l'index
+    ensure_session_dir()
     file_path = os.path.join(SESSION_DIR, f"{session_id}.json")
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(user_data, f, ensure_ascii=False, indent=2)
+    _write_json_atomic(file_path, stored_data, indent=2)
+    _update_manifest(session_id, _index_entry(session_id, user_data))
     
     return session_id
 
@@ -59,61 +353,98 @@ def load_user_profile(session_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         dict or None: Données utilisateur ou None si non trouvé
     """
-    file_path = os.path.join(SESSION_DIR, f"{session_id}.json")
-    
-    if not os.path.exists(file_path):
-        return None
-    
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        stored_data = _load_stored(session_id)
+        # Remplacer les références par les textes du stockage partagé
+        return blob_store.rehydrate(stored_data) if stored_data is not None else None
     except Exception as e:
         print(f"Erreur lors du chargement de la session {session_id}: {str(e)}")
         return None
 
-def get_available_sessions() -> List[Dict[str, Any]]:
+def _load_stored(session_id: str) -> Optional[Dict[str, Any]]:
+    """Session telle qu'enregistrée (textes volumineux sous forme de références)"""
+    store = get_session_store()
+    if store is not None:
+        return store.load(session_id)
+    
+    file_path = os.path.join(SESSION_DIR, f"{session_id}.json")
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _iter_stored_sessions():
+    """Parcourt toutes les sessions enregistrées, sans les réhydrater"""
+    store = get_session_store()
+    if store is not None:
+        yield from store.iter_data()
+        return
+    ensure_session_dir()
+    for filename in os.listdir(SESSION_DIR):
+        if _is_session_file(filename):
+            with open(os.path.join(SESSION_DIR, filename), 'r', encoding='utf-8') as f:
+                yield json.load(f)
+
+def collect_blob_garbage(grace_period: float = 3600.0) -> Dict[str, int]:
     """
-    Récupère la liste des sessions disponibles.
+    Supprime du stockage partagé les textes qu'aucune session ne référence.
+    
+    Args:
+        grace_period (float): Âge minimal (en secondes) d'un texte supprimé
+    
+    Returns:
+        dict: Nombre de textes conservés et supprimés, octets libérés
+    """
+    referenced = set()
+    for stored_data in _iter_stored_sessions():
+        referenced |= blob_store.references(stored_data)
+    return blob_store.collect_garbage(referenced, grace_period)
+
+def _session_order(entry: Dict[str, Any]) -> tuple:
+    """
+    Clé de tri des sessions, commune aux deux stockages: dernière mise à jour puis
+    identifiant (les sessions sans date viennent en dernier)
+    """
+    return entry.get("last_updated") or "", entry["session_id"]
+
+def _matching_entries(username: Optional[str] = None, program: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Entrées de l'index filtrées (recherche sans casse) et triées, la plus récemment mise à jour d'abord"""
+    entries = list(_load_manifest().values())
+    if username:
+        entries = [entry for entry in entries if username.lower() in entry["username"].lower()]
+    if program:
+        entries = [entry for entry in entries if program.lower() in entry["program"].lower()]
+    return sorted(entries, key=_session_order, reverse=True)
+
+def count_sessions(username: Optional[str] = None, program: Optional[str] = None) -> int:
+    """Nombre de sessions (éventuellement filtrées), d'après l'index"""
+    store = get_session_store()
+    if store is not None:
+        return store.count(username, program)
+    return len(_matching_entries(username, program))
+
+def get_available_sessions(offset: int = 0, limit: Optional[int] = None,
+                           username: Optional[str] = None, program: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Récupère la liste des sessions disponibles (lecture de l'index uniquement).
+    
+    Args:
+        offset (int): Nombre de sessions à ignorer (pagination)
+        limit (int, optional): Nombre maximum de sessions à retourner
+        username (str, optional): Ne garder que les sessions dont le nom contient ce texte
+        program (str, optional): Ne garder que les sessions dont le programme contient ce texte
     
     Returns:
         list: Liste des sessions disponibles avec leurs métadonnées
     """
-    ensure_session_dir()
+    store = get_session_store()
+    if store is not None:
+        return [dict(entry, last_updated=_format_date(entry.pop("updated")))
+                for entry in store.list(offset, limit, username, program)]
     
-    sessions = []
-    for filename in os.listdir(SESSION_DIR):
-        if filename.endswith('.json'):
-            try:
-                session_id = filename[:-5]  # Enlever l'extension .json
-                file_path = os.path.join(SESSION_DIR, filename)
-                
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                # Extraire les informations essentielles
-                metadata = data.get("metadata", {})
-                username = data.get("personal_info", {}).get("name", "Utilisateur inconnu")
-                last_updated = metadata.get("last_updated", "Date inconnue")
-                
-                if isinstance(last_updated, str):
-                    try:
-                        date_obj = datetime.fromisoformat(last_updated)
-                        last_updated = date_obj.strftime("%d/%m/%Y %H:%M")
-                    except:
-                        pass
-                
-                # Ajouter à la liste des sessions
-                sessions.append({
-                    "session_id": session_id,
-                    "username": username,
-                    "last_updated": last_updated,
-                    "program": data.get("program_info", {}).get("name", "Programme inconnu")
-                })
-            except Exception as e:
-                print(f"Erreur lors de la lecture de {filename}: {str(e)}")
-    
-    # Trier par date de mise à jour (la plus récente d'abord)
-    return sorted(sessions, key=lambda x: x["session_id"], reverse=True)
+    entries = _matching_entries(username, program)
+    page = entries[offset:offset + limit if limit is not None else None]
+    return [dict(entry, last_updated=_format_date(entry.get("last_updated"))) for entry in page]
 
 def delete_session(session_id: str) -> bool:
     """
@@ -125,6 +456,14 @@ def delete_session(session_id: str) -> bool:
     Returns:
         bool: True si la suppression a réussi, False sinon
     """
+    store = get_session_store()
+    if store is not None:
+        try:
+            return store.delete(session_id)
+        except Exception as e:
+            print(f"Erreur lors de la suppression de la session {session_id}: {str(e)}")
+            return False
+    
     file_path = os.path.join(SESSION_DIR, f"{session_id}.json")
     
     if not os.path.exists(file_path):
@@ -132,7 +471,94 @@ def delete_session(session_id: str) -> bool:
     
     try:
         os.remove(file_path)
+        _update_manifest(session_id, None)
         return True
     except Exception as e:
         print(f"Erreur lors de la suppression de la session {session_id}: {str(e)}")
         return False
+
+def migrate_to_sqlite(db_path: str = SESSION_DB_PATH, batch_size: int = 500) -> int:
+    """
+    Importe toutes les sessions JSON de SESSION_DIR dans une base SQLite
+    (par lots, une transaction par lot). Les fichiers JSON sont conservés.
+    
+    Returns:
+        int: Nombre de sessions importées
+    """
+    ensure_session_dir()
+    store = SQLiteSessionStore(db_path)
+    batch: Dict[str, Dict[str, Any]] = {}
+    imported = 0
+    for filename in sorted(os.listdir(SESSION_DIR)):
+        if not _is_session_file(filename):
+            continue
+        try:
+            with open(os.path.join(SESSION_DIR, filename), 'r', encoding='utf-8') as f:
+                batch[filename[:-5]] = blob_store.dehydrate(json.load(f))
+        except Exception as e:
+            print(f"Session ignorée ({filename}): {str(e)}")
+            continue
+        if len(batch) >= batch_size:
+            store.save_many(batch)
+            imported += len(batch)
+            batch = {}
+    if batch:
+        store.save_many(batch)
+        imported += len(batch)
+    return imported
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Outil en ligne de commande: liste des sessions et reconstruction de l'index"""
+    parser = argparse.ArgumentParser(description="Gestion des sessions utilisateur")
+    parser.add_argument("--rebuild-index", action="store_true",
+                        help="Reconstruire l'index à partir des fichiers de session")
+    parser.add_argument("--migrate-to-sqlite", action="store_true",
+                        help="Importer les sessions JSON dans la base SQLite (SESSION_DB_PATH)")
+    parser.add_argument("--db", default=SESSION_DB_PATH, help="Base SQLite cible de la migration")
+    parser.add_argument("--gc-blobs", action="store_true",
+                        help="Supprimer les textes stockés qu'aucune session ne référence plus")
+    parser.add_argument("--grace", type=float, default=3600.0,
+                        help="Âge minimal (en secondes) d'un texte supprimé par --gc-blobs")
+    parser.add_argument("--user", help="Filtrer par nom d'utilisateur")
+    parser.add_argument("--program", help="Filtrer par programme")
+    parser.add_argument("--page", type=int, default=1, help="Page à afficher")
+    parser.add_argument("--page-size", type=int, default=SESSION_PAGE_SIZE, help="Sessions par page")
+    args = parser.parse_args(argv)
+    
+    if args.gc_blobs:
+        result = collect_blob_garbage(args.grace)
+        usage = blob_store.disk_usage()
+        print(f"{result['removed']} texte(s) supprimé(s) ({result['freed_bytes']} octets libérés), "
+              f"{result['kept']} conservé(s).")
+        print(f"Stockage partagé: {usage['blobs']} texte(s), {usage['bytes']} octets.")
+        return 0
+    
+    if args.migrate_to_sqlite:
+        started = time.monotonic()
+        count = migrate_to_sqlite(args.db)
+        print(f"{count} session(s) importée(s) dans {args.db} en {time.monotonic() - started:.2f}s")
+        print("Activez la base avec SESSION_BACKEND=sqlite dans le fichier .env.")
+        return 0
+    
+    if args.rebuild_index:
+        if get_session_store() is not None:
+            print("L'index n'est utilisé qu'avec le stockage JSON (SESSION_BACKEND=json).")
+            return 1
+        ensure_session_dir()
+        started = time.monotonic()
+        count = rebuild_manifest()
+        print(f"Index reconstruit: {count} session(s) en {time.monotonic() - started:.2f}s")
+        return 0
+    
+    total = count_sessions(args.user, args.program)
+    page_size = max(1, args.page_size)
+    sessions = get_available_sessions((max(1, args.page) - 1) * page_size, page_size, args.user, args.program)
+    for session in sessions:
+        print(f"{session['session_id']}  {session['username']} - {session['program']} "
+              f"({session['last_updated']})")
+    pages = max(1, -(-total // page_size))
+    print(f"\n{total} session(s), page {min(max(1, args.page), pages)}/{pages}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())